@@ -1,12 +1,18 @@
 from libraries import *
-from classes import config, Position
-from kalman import KalmanFilter
+from classes import config, coint_config, TradeLedger
+from signals import decide, signal_paths, PairSignalEngine
+from profiling import StageProfiler
+from execution import execute_signals
+from metrics import RunningMetrics
 
 
 def get_portfolio_value(cash, longs, shorts, y, x):
     """
     Compute the current portfolio value by marking long and short positions to market.
 
+    Reference formula for lists of ``Position`` objects; ``TradeLedger.value``
+    keeps the same quantity incrementally.
+
     Parameters
     ----------
     cash : float
@@ -35,17 +41,45 @@ def get_portfolio_value(cash, longs, shorts, y, x):
     return value
 
 
-def backtest(data: pd.DataFrame, initial_cash=None):
+def backtest(data: pd.DataFrame, initial_cash=None, adf="statsmodels", cfg=config,
+             engine=None, backend="python", profile=False, execution=None):
     """
     Execute a Kalman-filter-based pairs trading backtest with dynamic hedge ratios,
     VECM smoothing, rolling cointegration checks, and realistic transaction costs.
 
+    Signals come from ``PairSignalEngine`` fed one bar at a time, exactly as
+    in live trading.
+
     Parameters
     ----------
     data : pd.DataFrame
         Two-asset price series ordered in time.
     initial_cash : float, optional
         Initial portfolio cash. If None, uses the value defined in config.
+    adf : str
+        Stationarity gate engine: "statsmodels" refits ``adfuller`` on every
+        bar, "rolling" uses the incremental ``RollingADF``.
+    cfg : config
+        Parameters for this run (the ``config`` class or an instance).
+    engine : PairSignalEngine, optional
+        Engine to continue from, carrying Kalman and window state over
+        from a previous run on the same pair.
+    backend : str
+        "python" runs ``PairSignalEngine`` and the accounting loop in the
+        interpreter; "numba" runs both as compiled kernels (see
+        ``kernels.py``), with the ADF gate computed as in ``RollingADF``
+        whatever ``adf`` says. Falls back to "python" with ``adf="rolling"``
+        and a warning when numba is not installed.
+    profile : bool
+        Record cumulative time and calls per stage (hedge-ratio filter,
+        VECM filter, rolling stats, stationarity check, decision, borrow,
+        exits, entries, MTM) and append the ``StageProfiler.report()``
+        DataFrame to the returned tuple. The numba backend reports only
+        "signals" and "accounting".
+    execution : ExecutionModel, optional
+        Route the trades through the event-driven ``ExecutionSimulator``
+        with this model's slippage, delay and partial fills (python backend
+        only). None fills every trade at the bar's close.
 
     Returns
     -------
@@ -58,185 +92,439 @@ def backtest(data: pd.DataFrame, initial_cash=None):
             n_sell : int,
             n_hold : int,
             n_closed_positions : int,
-            closed_positions : list,
+            closed_positions : TradeLedger,
             total_borrow_cost : float,
             total_commission_cost : float
         )
+        followed by the stage report when ``profile`` is set.
     """
-    data = data.copy()
-    cash = config.capital if initial_cash is None else initial_cash
-
-    COM = config.COM
-    INVEST = config.INVEST
-    ENTRY_Z = config.ENTRY_Z
-    EXIT_Z = config.EXIT_Z
-    STOP_Z = 3.5
-    BR_daily = config.BR / 252
-    WINDOW = config.TDays
+    y = np.ascontiguousarray(data.iloc[:, 0].to_numpy(dtype=np.float64))
+    x = np.ascontiguousarray(data.iloc[:, 1].to_numpy(dtype=np.float64))
+    return backtest_arrays(y, x, data.index, initial_cash, adf, cfg, engine, backend,
+                           profile, execution)
 
-    k_hr = KalmanFilter(n=2)
-    k_vecm = KalmanFilter(n=1)
 
-    longs, shorts = [], []
-    closed_positions = []
-    spread_history = []
-    equity = []
+def backtest_arrays(Y: np.ndarray, X: np.ndarray, dates, initial_cash=None,
+                    adf="statsmodels", cfg=config, engine=None, backend="python",
+                    profile=False, execution=None):
+    """
+    Array-native core of ``backtest`` operating on contiguous float64 prices.
 
-    buy = sell = hold = 0
-    total_borrow_cost = 0.0
-    total_commission_cost = 0.0
+    Parameters
+    ----------
+    Y : np.ndarray
+        Prices of the dependent asset.
+    X : np.ndarray
+        Prices of the hedge asset.
+    dates : array-like
+        Timestamps aligned with the prices (e.g. a DatetimeIndex).
+    initial_cash : float, optional
+        Initial portfolio cash. If None, uses the value defined in config.
+    adf : str
+        Stationarity gate engine, see ``backtest``.
+    cfg : config
+        Parameters for this run.
+    engine : PairSignalEngine, optional
+        Engine to continue from, see ``backtest``.
+    backend : str
+        "python" or "numba", see ``backtest``.
+    profile : bool
+        Append a per-stage timing report, see ``backtest``.
+    execution : ExecutionModel, optional
+        Fill model, see ``backtest``.
 
-    allow_entries = True
+    Returns
+    -------
+    tuple
+        Same as ``backtest``.
+    """
+    Y = np.ascontiguousarray(Y, dtype=np.float64)
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    if Y.shape != X.shape or Y.ndim != 1 or len(dates) != len(Y):
+        raise ValueError("Y, X and dates must be 1-D and of equal length")
+
+    prof = StageProfiler() if profile else None
+
+    numba, adf = _resolve_backend(backend, adf)
+    if numba:
+        if engine is not None:
+            raise ValueError("engine is only supported by the python backend")
+        if execution is not None:
+            raise ValueError("execution is only supported by the python backend")
+        if prof is not None:
+            t = prof.start()
+        beta, z, allow = numba_signal_paths(Y, X, cfg)
+        if prof is not None:
+            t = prof.add("signals", t)
+        result = numba_backtest_signals(Y, X, dates, beta, z, allow, initial_cash, cfg)
+        if prof is not None:
+            prof.add("accounting", t)
+    else:
+        beta, z, allow = signal_paths(Y, X, adf, cfg, engine, prof)
+        result = backtest_signals(Y, X, dates, beta, z, allow, initial_cash, cfg, prof,
+                                  execution)
+
+    return result if prof is None else (*result, prof.report())
+
+
+def backtest_stream(chunks, initial_cash=None, adf="rolling", cfg=config,
+                    backend="python", window=None):
+    """
+    Backtest a long (e.g. minute-bar) price history chunk by chunk, with
+    memory bounded by the chunk size.
 
-    for date, row in data.iterrows():
+    Each chunk continues the previous one exactly: the signal state
+    (``PairSignalEngine``, or the kernel state with ``backend="numba"``),
+    the cash and the open position carry over, so the trades and equity
+    match one ``backtest`` over the concatenated data. Instead of the full
+    equity curve, every bar's equity feeds a ``RunningMetrics`` and only
+    the last value of each chunk is kept. Borrow accrues and metrics
+    annualize with ``cfg.periods_per_year``.
 
-        y = row.iloc[0]
-        x = row.iloc[1]
+    Parameters
+    ----------
+    chunks : iterable of pd.DataFrame
+        Consecutive two-asset price chunks, e.g. from ``iter_chunks``.
+    initial_cash : float, optional
+        Initial portfolio cash. If None, uses the value defined in cfg.
+    adf : str
+        Stationarity gate engine of the python backend, see ``backtest``.
+    cfg : config
+        Parameters for this run.
+    backend : str
+        "python" or "numba", see ``backtest``.
+    window : int, optional
+        Trailing number of bars of the running metrics (None: all bars).
 
-        w_pred, P_pred = k_hr.predict()
-        k_hr.update(np.array([1, x]), y, w_pred, P_pred)
-        beta = k_hr.w_t[1]
+    Returns
+    -------
+    tuple
+        (
+            chunk_equity : pd.Series (equity at the last bar of each chunk),
+            final_cash : float,
+            win_rate : float,
+            n_buy : int,
+            n_sell : int,
+            n_hold : int,
+            n_closed_positions : int,
+            closed_positions : TradeLedger (bar numbers counted from the
+                first bar of the stream),
+            total_borrow_cost : float,
+            total_commission_cost : float,
+            running : RunningMetrics of the equity of every bar
+        )
+    """
+    numba, adf = _resolve_backend(backend, adf)
+    cash = cfg.capital if initial_cash is None else initial_cash
+    running = RunningMetrics(window, cfg.periods_per_year)
+    ends, marks = [], []
+    buy = sell = hold = 0
+    borrow = commission = 0.0
+    offset = 0
+
+    if numba:
+        import kernels
+        signal_state = kernels.signal_state(cfg.TDays)
+        trade_state = np.zeros(5)
+        closed = []
+    else:
+        engine = PairSignalEngine(cfg.TDays, adf, cfg)
+        ledger = TradeLedger()
+
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        Y = np.ascontiguousarray(chunk.iloc[:, 0].to_numpy(dtype=np.float64))
+        X = np.ascontiguousarray(chunk.iloc[:, 1].to_numpy(dtype=np.float64))
+
+        if numba:
+            beta, z, allow = numba_signal_paths(Y, X, cfg, signal_state)
+            (equity, cash, counts, costs, *trades, _) = kernels.trade_kernel(
+                Y, X, beta, z, allow, float(cash), float(cfg.COM), float(cfg.INVEST),
+                cfg.BR / cfg.periods_per_year, float(cfg.ENTRY_Z), float(cfg.EXIT_Z),
+                float(cfg.STOP_Z), trade_state, offset)
+            # copies: the slices would keep the kernel's chunk-sized buffers alive
+            closed.append([a.copy() for a in trades])
+            b, s, h, _ = counts.tolist()
+            borrow += float(costs[0])
+            commission += float(costs[1])
+        else:
+            beta, z, allow = signal_paths(Y, X, adf, cfg, engine)
+            (equity, cash, _, b, s, h, _, _, bc, cc) = backtest_signals(
+                Y, X, chunk.index, beta, z, allow, cash, cfg, ledger=ledger,
+                offset=offset)
+            equity = equity.to_numpy()
+            borrow += bc
+            commission += cc
+
+        buy, sell, hold = buy + b, sell + s, hold + h
+        running.extend(equity)
+        ends.append(chunk.index[-1])
+        marks.append(float(equity[-1]))
+        offset += len(Y)
+
+    if numba:
+        if closed:
+            ticker, side, vals, bars = (np.concatenate(p, axis=-1) for p in zip(*closed))
+        else:
+            ticker = side = np.zeros(0, dtype=np.int8)
+            vals, bars = np.zeros((4, 0)), np.zeros((2, 0), dtype=np.int64)
+        ledger = _kernel_ledger(None, ticker, side, vals, bars, trade_state)
 
-        spread = y - beta * x
+    n_closed = len(ledger)
+    win_rate = np.count_nonzero(ledger.profits > 0) / n_closed if n_closed else 0
 
-        wp, Pp = k_vecm.predict()
-        k_vecm.update(np.array([1]), spread, wp, Pp)
-        spr_hat = k_vecm.w_t[0]
-        spread_history.append(spr_hat)
+    return (
+        pd.Series(marks, index=pd.Index(ends), dtype=float),
+        float(cash),
+        win_rate,
+        buy,
+        sell,
+        hold,
+        n_closed,
+        ledger,
+        borrow,
+        commission,
+        running,
+    )
 
-        if len(spread_history) < WINDOW:
-            equity.append(get_portfolio_value(cash, longs, shorts, y, x))
-            continue
 
-        mu = np.mean(spread_history[-WINDOW:])
-        sd = np.std(spread_history[-WINDOW:])
-        sd = sd if sd > 0 else 1e-6
-        z = (spr_hat - mu) / sd
+def _resolve_backend(backend: str, adf: str) -> tuple:
+    """
+    Resolve the ``backend`` argument into (use numba, ADF gate engine).
 
-        recent = pd.Series(spread_history[-WINDOW:])
-        adf_stat, pvalue, *_ = adfuller(recent)
-        allow_entries = pvalue <= 0.05
+    When numba is missing the python backend runs instead with the
+    "rolling" gate, which is the one the numba kernels compute, so results
+    do not depend on whether numba is installed.
+    """
+    if backend not in ("python", "numba"):
+        raise ValueError("backend must be 'python' or 'numba'")
+    if backend == "python":
+        return False, adf
+    import kernels
+    if not kernels.HAVE_NUMBA:
+        warnings.warn("numba is not installed; using the python backend "
+                      "with adf='rolling'")
+        return False, "rolling"
+    return True, adf
+
+
+def numba_signal_paths(Y: np.ndarray, X: np.ndarray, cfg=config, state=None) -> tuple:
+    """
+    Compiled ``signal_paths`` with the ``RollingADF`` gate.
 
-        for p in shorts:
-            px = y if p.ticker == "Y" else x
-            daily_cost = p.n_shares * px * BR_daily
-            cash -= daily_cost
-            total_borrow_cost += daily_cost
+    Parameters
+    ----------
+    state : tuple, optional
+        ``kernels.signal_state(cfg.TDays)`` to continue from; advanced in
+        place, like the ``engine`` of ``signal_paths``.
 
-        if (longs or shorts) and abs(z) > STOP_Z:
+    Returns
+    -------
+    tuple
+        (beta, z, allow_entries) arrays; z is NaN during warm-up.
+    """
+    import kernels
+
+    window = cfg.TDays
+    maxlag = min(window // 2 - 2, int(np.ceil(12.0 * np.power(window / 100.0, 1 / 4.0))))
+    if state is None:
+        state = kernels.signal_state(window)
+    return kernels.signal_kernel(
+        np.ascontiguousarray(Y, dtype=np.float64), np.ascontiguousarray(X, dtype=np.float64),
+        window, maxlag, float(cfg.KF_Q), float(cfg.KF_R), float(coint_config.adf_alpha),
+        *kernels._tau_args(), *state)
+
+
+def _kernel_ledger(dates, ticker, side, vals, bars, state) -> TradeLedger:
+    """``TradeLedger`` of the closed trades and open position of ``trade_kernel``."""
+    ledger = TradeLedger.from_arrays(dates, ticker, side, vals[0], vals[1], vals[2],
+                                     bars[0], bars[1], vals[3])
+    lt, n, el, es, bar0 = state.tolist()
+    if n > 0:
+        lt, bar0 = int(lt), int(bar0)
+        ledger.open(lt, TradeLedger.LONG, n, el, bar0)
+        ledger.open(1 - lt, TradeLedger.SHORT, n, es, bar0)
+    return ledger
+
+
+def numba_backtest_signals(Y: np.ndarray, X: np.ndarray, dates, beta: np.ndarray,
+                           z: np.ndarray, allow: np.ndarray, initial_cash=None,
+                           cfg=config):
+    """
+    Compiled ``backtest_signals``; returns the same 10-tuple.
+    """
+    import kernels
+
+    cash = cfg.capital if initial_cash is None else initial_cash
+    (equity, cash, counts, costs, ticker, side, vals, bars,
+     state) = kernels.trade_kernel(
+        np.ascontiguousarray(Y, dtype=np.float64), np.ascontiguousarray(X, dtype=np.float64),
+        np.ascontiguousarray(beta, dtype=np.float64), np.ascontiguousarray(z, dtype=np.float64),
+        np.ascontiguousarray(allow, dtype=np.bool_), float(cash), float(cfg.COM),
+        float(cfg.INVEST), cfg.BR / cfg.periods_per_year, float(cfg.ENTRY_Z),
+        float(cfg.EXIT_Z), float(cfg.STOP_Z), np.zeros(5), 0)
+
+    ledger = _kernel_ledger(dates, ticker, side, vals, bars, state)
+    buy, sell, hold, n_closed = counts.tolist()
+    profits = ledger.profits
+    win_rate = np.count_nonzero(profits > 0) / n_closed if n_closed else 0
 
-            for p in longs[:]:
-                px = y if p.ticker == "Y" else x
-                com = p.n_shares * px * COM
-                pnl = (px - p.entry_price) * p.n_shares - com
+    return (
+        pd.Series(equity, index=dates[:len(equity)]),
+        float(cash),
+        win_rate,
+        buy,
+        sell,
+        hold,
+        n_closed,
+        ledger,
+        float(costs[0]),
+        float(costs[1]),
+    )
 
-                cash += (px * p.n_shares) - com
-                total_commission_cost += com
 
-                p.exit_price = px
-                p.profit = pnl
-                closed_positions.append(p)
-                longs.remove(p)
-                sell += 1
+def backtest_signals(Y: np.ndarray, X: np.ndarray, dates, beta: np.ndarray,
+                     z: np.ndarray, allow: np.ndarray, initial_cash=None,
+                     cfg=config, profiler=None, execution=None, ledger=None,
+                     offset=0):
+    """
+    Run the trading and accounting loop over precomputed signal paths.
 
-            for p in shorts[:]:
-                px = y if p.ticker == "Y" else x
-                com = p.n_shares * px * COM
-                pnl = (p.entry_price - px) * p.n_shares - com
+    The paths depend only on prices, ``TDays`` and the Kalman noise levels,
+    so parameter sweeps over thresholds and costs can reuse them.
 
-                cash += pnl
-                total_commission_cost += com
+    Parameters
+    ----------
+    Y, X : np.ndarray
+        Prices of the dependent and hedge assets.
+    dates : array-like
+        Timestamps aligned with the prices.
+    beta, z, allow : np.ndarray
+        Output of ``signal_paths`` (z is NaN during warm-up).
+    initial_cash : float, optional
+        Initial portfolio cash. If None, uses the value defined in cfg.
+    cfg : config
+        Thresholds and costs for this run.
+    profiler : StageProfiler, optional
+        Charges loop time to "borrow", "exits", "entries" and "mtm".
+    execution : ExecutionModel, optional
+        Delegate to ``execute_signals`` with this fill model.
+    ledger : TradeLedger, optional
+        Ledger to continue, with its open positions, when a series is run
+        in consecutive chunks (see ``backtest_stream``).
+    offset : int
+        Bar number of the first bar, for the ledger.
 
-                p.exit_price = px
-                p.profit = pnl
-                closed_positions.append(p)
-                shorts.remove(p)
-                sell += 1
+    Returns
+    -------
+    tuple
+        Same 10-tuple as ``backtest``; the counts and costs cover this call.
+    """
+    if execution is not None:
+        if ledger is not None or offset:
+            raise ValueError("execution does not support continuing a ledger")
+        return execute_signals(Y, X, dates, beta, z, allow, initial_cash, cfg,
+                               execution, profiler)
+
+    cash = cfg.capital if initial_cash is None else initial_cash
+
+    COM = cfg.COM
+    INVEST = cfg.INVEST
+    BR_bar = cfg.BR / cfg.periods_per_year
+
+    if ledger is None:
+        ledger = TradeLedger(dates)
+    Y_, X_ = TradeLedger.Y, TradeLedger.X
+    LONG, SHORT = TradeLedger.LONG, TradeLedger.SHORT
+    equity = []
 
-            equity.append(get_portfolio_value(cash, longs, shorts, y, x))
-            continue
+    buy = sell = hold = 0
+    total_borrow_cost = 0.0
+    total_commission_cost = 0.0
+    prof = profiler
 
-        if (longs or shorts) and abs(z) < EXIT_Z:
+    for i, (y, x, b, zt, ok) in enumerate(zip(Y.tolist(), X.tolist(), beta.tolist(),
+                                              z.tolist(), allow.tolist())):
+        prices = (y, x)
+        action = "WARMUP" if zt != zt else decide(zt, ok, ledger.n_open > 0, cfg)
 
-            for p in longs[:]:
-                px = y if p.ticker == "Y" else x
-                com = p.n_shares * px * COM
-                pnl = (px - p.entry_price) * p.n_shares - com
+        if prof is not None:
+            t = prof.start()
 
-                cash += (px * p.n_shares) - com
-                total_commission_cost += com
+        if action == "WARMUP":
+            equity.append(ledger.value(cash, prices))
+            if prof is not None:
+                prof.add("mtm", t)
+            continue
 
-                p.exit_price = px
-                p.profit = pnl
-                closed_positions.append(p)
-                longs.remove(p)
-                sell += 1
+        if ledger.n_open:
+            bar_cost = ledger.short_exposure(prices) * BR_bar
+            cash -= bar_cost
+            total_borrow_cost += bar_cost
+            if prof is not None:
+                t = prof.add("borrow", t)
 
-            for p in shorts[:]:
-                px = y if p.ticker == "Y" else x
-                com = p.n_shares * px * COM
-                pnl = (p.entry_price - px) * p.n_shares - com
+        if action == "STOP" or action == "EXIT":
 
-                cash += pnl
+            flows, coms = ledger.close_all(prices, offset + i, COM)
+            for flow, com in zip(flows.tolist(), coms.tolist()):
+                cash += flow
                 total_commission_cost += com
-
-                p.exit_price = px
-                p.profit = pnl
-                closed_positions.append(p)
-                shorts.remove(p)
                 sell += 1
+            if prof is not None:
+                t = prof.add("exits", t)
 
-            equity.append(get_portfolio_value(cash, longs, shorts, y, x))
-            continue
-
-        if allow_entries and not longs and not shorts:
+        elif action == "SHORT_SPREAD" or action == "LONG_SPREAD":
 
             capital_to_use = cash * INVEST
+            n = int(capital_to_use / (abs(y) + abs(b * x)))
 
-            if z > ENTRY_Z:
-                n = int(capital_to_use / (abs(y) + abs(beta * x)))
-                if n > 0:
-                    comY = n * y * COM
-                    comX = n * x * COM
-                    costX = n * x
+            if n > 0 and action == "SHORT_SPREAD":
+                comY = n * y * COM
+                comX = n * x * COM
+                costX = n * x
 
-                    if cash >= costX + comY:
-                        cash -= costX
-                        longs.append(Position(n, "X", x, "LONG", date))
+                if cash >= costX + comY:
+                    cash -= costX
+                    ledger.open(X_, LONG, n, x, offset + i)
 
-                        cash -= comY
-                        shorts.append(Position(n, "Y", y, "SHORT", date))
+                    cash -= comY
+                    ledger.open(Y_, SHORT, n, y, offset + i)
 
-                        total_commission_cost += (comY + comX)
-                        buy += 1
+                    total_commission_cost += (comY + comX)
+                    buy += 1
 
-            elif z < -ENTRY_Z:
-                n = int(capital_to_use / (abs(y) + abs(beta * x)))
-                if n > 0:
-                    comY = n * y * COM
-                    comX = n * x * COM
-                    costY = n * y
+            elif n > 0:
+                comY = n * y * COM
+                comX = n * x * COM
+                costY = n * y
 
-                    if cash >= costY + comX:
-                        cash -= costY
-                        longs.append(Position(n, "Y", y, "LONG", date))
+                if cash >= costY + comX:
+                    cash -= costY
+                    ledger.open(Y_, LONG, n, y, offset + i)
 
-                        cash -= comX
-                        shorts.append(Position(n, "X", x, "SHORT", date))
+                    cash -= comX
+                    ledger.open(X_, SHORT, n, x, offset + i)
 
-                        total_commission_cost += (comY + comX)
-                        buy += 1
+                    total_commission_cost += (comY + comX)
+                    buy += 1
 
-        else:
+            if prof is not None:
+                t = prof.add("entries", t)
+
+        elif action == "HOLD":
             hold += 1
 
-        equity.append(get_portfolio_value(cash, longs, shorts, y, x))
+        equity.append(ledger.value(cash, prices))
+        if prof is not None:
+            prof.add("mtm", t)
 
-    equity = pd.Series(equity, index=data.index[:len(equity)])
+    equity = pd.Series(equity, index=dates[:len(equity)])
 
     win_rate = (
-        sum(p.profit > 0 for p in closed_positions) / len(closed_positions)
-        if closed_positions else 0
+        np.count_nonzero(ledger.profits > 0) / len(ledger)
+        if len(ledger) else 0
     )
 
     return (
@@ -246,8 +534,8 @@ def backtest(data: pd.DataFrame, initial_cash=None):
         buy,
         sell,
         hold,
-        len(closed_positions),
-        closed_positions,
+        len(ledger),
+        ledger,
         total_borrow_cost,
         total_commission_cost,
     )
@@ -0,0 +1,331 @@
+"""
+Benchmarks for the backtest, Kalman and cointegration hot paths.
+
+Every case runs on deterministic synthetic prices (no network), reports a
+throughput (bars/s, updates/s, pairs/s, tickers/s) from the best of several
+timed repeats and the peak traced memory of one extra run, and the whole
+run is written to JSON so results can be diffed between commits:
+
+    python benchmarks.py --output bench.json
+    python benchmarks.py --compare base.json --output head.json
+
+It also measures the ``python -X importtime`` cost of the core modules in
+a fresh interpreter against ``IMPORT_BUDGET_S`` and fails when the budget
+is exceeded or a deferred dependency is loaded eagerly.
+"""
+from libraries import *
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from scipy.signal import lfilter
+from classes import config
+from kalman import KalmanFilter, BatchKalmanFilter
+from cointegration import select_pairs
+from backtesting import backtest
+from execution import ExecutionModel
+from data_processing import clean_data
+import kernels
+
+CORE_MODULES = ("kalman", "backtesting", "cointegration", "metrics")
+DEFERRED_MODULES = ("statsmodels", "matplotlib", "seaborn", "yfinance", "ta",
+                    "IPython", "numba")
+IMPORT_BUDGET_S = 1.0
+
+
+def synthetic_pair(n_bars: int = 1500, beta: float = 1.3, phi: float = 0.95,
+                   seed: int = 0) -> pd.DataFrame:
+    """
+    Cointegrated pair: X is a random walk and Y = 20 + beta * X + AR(1) noise.
+
+    Parameters
+    ----------
+    n_bars : int
+        Number of business days.
+    beta : float
+        Long-run hedge ratio.
+    phi : float
+        AR(1) coefficient of the spread (< 1 for mean reversion).
+    seed : int
+        Random seed.
+
+    Returns
+    -------
+    pd.DataFrame
+        Two columns ("Y", "X") on a business-day index.
+    """
+    rng = np.random.default_rng(seed)
+    x = 100 + np.cumsum(rng.normal(0, 1, n_bars))
+    spread = lfilter([1.0], [1.0, -phi], rng.normal(0, 1, n_bars))
+    idx = pd.bdate_range("2010-01-01", periods=n_bars)
+    return pd.DataFrame({"Y": 20 + beta * x + spread, "X": x}, index=idx)
+
+
+def synthetic_universe(n_assets: int = 20, n_bars: int = 1500, n_factors: int = 3,
+                       phi: float = 0.9, seed: int = 1) -> pd.DataFrame:
+    """
+    Universe of assets loading on a few random-walk factors plus AR(1)
+    noise, so assets sharing a factor are cointegrated.
+
+    Returns
+    -------
+    pd.DataFrame
+        ``n_assets`` columns ("A0", "A1", ...) on a business-day index.
+    """
+    rng = np.random.default_rng(seed)
+    factors = np.cumsum(rng.normal(0, 1, (n_bars, n_factors)), axis=0)
+    noise = lfilter([1.0], [1.0, -phi], rng.normal(0, 1, (n_bars, n_assets)), axis=0)
+    load = 1 + 0.1 * np.arange(n_assets)
+    prices = 100 + factors[:, np.arange(n_assets) % n_factors] * load + noise
+    idx = pd.bdate_range("2010-01-01", periods=n_bars)
+    return pd.DataFrame(prices, index=idx,
+                        columns=[f"A{i}" for i in range(n_assets)])
+
+
+def _synthetic_fetch(n_bars: int):
+    """``clean_data`` fetcher serving deterministic synthetic closes."""
+    def fetch(ticker, start, end):
+        seed = sum(map(ord, ticker))
+        rng = np.random.default_rng(seed)
+        idx = pd.bdate_range(end=pd.Timestamp(end).normalize(), periods=n_bars)
+        close = 100 + np.cumsum(rng.normal(0, 1, n_bars))
+        return pd.Series(close, index=idx, name=ticker)
+    return fetch
+
+
+def _cases(quick: bool) -> list:
+    """
+    Benchmark cases as (name, unit, items per call, callable).
+    """
+    scale = 4 if quick else 1
+    pair = synthetic_pair(1500 // scale)
+    universe = synthetic_universe(20 if not quick else 8, 1000 // scale)
+    bars = len(pair)
+    n_pairs = universe.shape[1] * (universe.shape[1] - 1) // 2
+
+    kf_updates = 20_000 // scale
+    xs = np.column_stack([np.ones(kf_updates), np.resize(pair["X"].to_numpy(), kf_updates)])
+    ys = np.resize(pair["Y"].to_numpy(), kf_updates)
+
+    def kalman_step():
+        kf = KalmanFilter(n=2, R=config.KF_R, Q=np.eye(2) * config.KF_Q)
+        for x, y in zip(xs.tolist(), ys.tolist()):
+            kf.step(x, y)
+
+    def kalman_update():
+        kf = KalmanFilter(n=2, R=config.KF_R, Q=np.eye(2) * config.KF_Q)
+        for x, y in zip(xs[:kf_updates // 10], ys[:kf_updates // 10].tolist()):
+            w_pred, P_pred = kf.predict()
+            kf.update(x, y, w_pred, P_pred)
+
+    batch_pairs = 256
+    batch_bars = 500 // scale
+    bx = np.ones((batch_pairs, 2))
+
+    def batch_kalman():
+        kf = BatchKalmanFilter(batch_pairs, 2, R=config.KF_R, Q=np.eye(2) * config.KF_Q)
+        for t in range(batch_bars):
+            bx[:, 1] = 100 + t
+            kf.step(bx, bx[:, 1] * 1.3)
+
+    tickers = [f"T{i}" for i in range(40 // scale)]
+    fetch = _synthetic_fetch(2500 // scale)
+
+    cases = [
+        ("backtest[adf=statsmodels]", "bars/s", bars // 3,
+         lambda: backtest(pair.iloc[:bars // 3])),
+        ("backtest[adf=rolling]", "bars/s", bars,
+         lambda: backtest(pair, adf="rolling")),
+        ("backtest[execution]", "bars/s", bars,
+         lambda: backtest(pair, adf="rolling",
+                          execution=ExecutionModel(slippage_bps=5, delay=1, fill_ratio=0.5))),
+        ("KalmanFilter.step", "updates/s", kf_updates, kalman_step),
+        ("KalmanFilter.predict+update", "updates/s", kf_updates // 10, kalman_update),
+        ("BatchKalmanFilter.step", "updates/s", batch_pairs * batch_bars, batch_kalman),
+        ("select_pairs", "pairs/s", n_pairs, lambda: select_pairs(universe, 0.0, 0.05)),
+        ("select_pairs[method=batch]", "pairs/s", n_pairs,
+         lambda: select_pairs(universe, 0.0, 0.05, method="batch")),
+        ("clean_data[post-processing]", "tickers/s", len(tickers),
+         lambda: clean_data(tickers, "10y", fetch=fetch, max_workers=1)),
+    ]
+    if kernels.HAVE_NUMBA:
+        cases.insert(2, ("backtest[backend=numba]", "bars/s", bars,
+                         lambda: backtest(pair, backend="numba")))
+    return cases
+
+
+def _time(fn, repeat: int) -> float:
+    """Best wall time of ``repeat`` calls after one warm-up call."""
+    fn()
+    best = np.inf
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _peak_memory(fn) -> float:
+    """Peak memory traced by ``tracemalloc`` during one call, in MiB."""
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 2 ** 20
+
+
+def import_time(modules=CORE_MODULES, repeat: int = 3) -> dict:
+    """
+    Import cost of ``modules`` in a fresh interpreter, from the cumulative
+    ``-X importtime`` figures of the top-level imports (best of ``repeat``).
+
+    Returns
+    -------
+    dict
+        {"seconds", "budget_s", "within_budget", "deferred_loaded"}
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    code = ("import sys; sys.path.insert(0, %r); import %s; "
+            "print(','.join(m for m in %r if m in sys.modules))"
+            % (here, ", ".join(modules), DEFERRED_MODULES))
+    best, loaded = np.inf, []
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                              capture_output=True, text=True, check=True)
+        total = 0
+        for line in proc.stderr.splitlines():
+            fields = line.split("|")
+            if len(fields) == 3 and fields[2].strip() in modules and \
+                    not fields[2].startswith("  "):
+                total += int(fields[1])
+        best = min(best, total / 1e6)
+        loaded = [m for m in proc.stdout.strip().split(",") if m]
+    return {
+        "seconds": best,
+        "budget_s": IMPORT_BUDGET_S,
+        "within_budget": best <= IMPORT_BUDGET_S and not loaded,
+        "deferred_loaded": loaded,
+    }
+
+
+def _metadata() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                                capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": dt.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "numba": kernels.HAVE_NUMBA,
+    }
+
+
+def run_benchmarks(repeat: int = 5, quick: bool = False, select=None) -> dict:
+    """
+    Run every benchmark case.
+
+    Parameters
+    ----------
+    repeat : int
+        Timed repeats per case; the best is reported.
+    quick : bool
+        Smaller inputs for a fast smoke run.
+    select : str, optional
+        Only run cases whose name contains this substring.
+
+    Returns
+    -------
+    dict
+        {"meta": {...}, "results": {name: {"unit", "items", "seconds",
+        "throughput", "peak_mib"}}, "imports": ``import_time()``}
+    """
+    results = {}
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for name, unit, items, fn in _cases(quick):
+            if select and select not in name:
+                continue
+            seconds = _time(fn, repeat)
+            results[name] = {
+                "unit": unit,
+                "items": items,
+                "seconds": seconds,
+                "throughput": items / seconds,
+                "peak_mib": _peak_memory(fn),
+            }
+    return {"meta": _metadata(), "results": results, "imports": import_time()}
+
+
+def compare(base: dict, head: dict, tolerance: float = 0.10) -> pd.DataFrame:
+    """
+    Throughput and memory ratios (head / base) for cases present in both
+    runs, flagging throughput drops beyond ``tolerance``.
+    """
+    rows = []
+    for name, new in head["results"].items():
+        old = base["results"].get(name)
+        if old is None:
+            continue
+        speed = new["throughput"] / old["throughput"]
+        rows.append({
+            "Benchmark": name,
+            "Unit": new["unit"],
+            "Base": old["throughput"],
+            "Head": new["throughput"],
+            "Speed Ratio": speed,
+            "Memory Ratio": new["peak_mib"] / old["peak_mib"] if old["peak_mib"] else np.nan,
+            "Regression": speed < 1 - tolerance,
+        })
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", default="bench.json", help="JSON file to write")
+    parser.add_argument("--compare", help="earlier JSON run to compare against")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="smaller inputs")
+    parser.add_argument("--select", help="substring filter on case names")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="throughput drop reported as a regression")
+    args = parser.parse_args(argv)
+
+    run = run_benchmarks(args.repeat, args.quick, args.select)
+    with open(args.output, "w") as f:
+        json.dump(run, f, indent=2)
+
+    for name, r in run["results"].items():
+        print(f"{name:<32} {r['throughput']:>14,.0f} {r['unit']:<10} "
+              f"{r['peak_mib']:>8.1f} MiB")
+    imports = run["imports"]
+    print(f"{'import[' + ','.join(CORE_MODULES) + ']':<32} {imports['seconds']:>14.3f} s "
+          f"(budget {imports['budget_s']:.1f} s)"
+          + (f", eagerly loaded: {imports['deferred_loaded']}"
+             if imports["deferred_loaded"] else ""))
+    failed = not imports["within_budget"]
+
+    if args.compare:
+        with open(args.compare) as f:
+            base = json.load(f)
+        table = compare(base, run, args.tolerance)
+        print()
+        print(table.to_string(index=False))
+        failed = failed or bool(table["Regression"].any())
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,15 @@ from libraries import *
 class config:
     """
     Global configuration parameters for capital usage, commissions,
-    borrow rates, and signal thresholds used in the trading engine.
+    borrow rates, signal thresholds, Kalman noise levels and the portfolio
+    gross-exposure cap (multiple of equity) used in the trading engine.
+    The class attributes are the defaults; instances (e.g.
+    ``config(ENTRY_Z=1.5)``) override them for a single run.
+
+    ``periods_per_year`` is the number of bars in a year of the data
+    (252 for daily bars, see ``periods_per_year()`` in data_processing for
+    intraday intervals); it drives annualized metrics and the per-bar
+    accrual of the annual borrow rate ``BR``.
     """
     capital: float = 1_000_000
     COM: float = 0.00125
@@ -13,7 +21,12 @@ class config:
     BR: float = 0.25 / 100
     ENTRY_Z: float = 1.0
     EXIT_Z: float = 0.5
+    STOP_Z: float = 3.5
     TDays: int = 20
+    KF_Q: float = 1e-3
+    KF_R: float = 1.0
+    GROSS_CAP: float = 2.0
+    periods_per_year: float = 252
 
 
 @dataclass
@@ -62,3 +75,294 @@ class Position:
     entry_date: any = None
     exit_date: any = None
     profit: float = 0.0
+
+
+@dataclass
+class Signal:
+    """
+    Output of the streaming signal engine for one bar.
+
+    Attributes
+    ----------
+    timestamp : any
+        Bar timestamp.
+    z : float
+        Z-score of the smoothed spread (NaN during warm-up).
+    beta : float
+        Dynamic hedge ratio.
+    spread : float
+        Kalman-smoothed spread.
+    allow_entries : bool
+        Rolling ADF gate on the spread window.
+    action : str
+        "WARMUP", "STOP", "EXIT", "LONG_SPREAD" (long Y / short X),
+        "SHORT_SPREAD" (short Y / long X), "WAIT" (flat, no trigger)
+        or "HOLD".
+    """
+    timestamp: any
+    z: float
+    beta: float
+    spread: float
+    allow_entries: bool
+    action: str
+
+
+class TradeLedger:
+    """
+    Struct-of-arrays trade ledger.
+
+    Open positions live in a small book that is compacted by swapping the
+    last row into the freed slot, so opening and closing are O(1); closed
+    trades are appended to preallocated arrays that grow geometrically.
+    Tickers and sides are stored as int8 codes and dates as bar numbers,
+    which keeps a closed trade at about 50 bytes instead of a ``Position``
+    object.
+
+    Portfolio value is kept incrementally: net long shares, short shares and
+    the average short entry price per ticker change only when a trade opens
+    or closes, so marking to market is a dot product per bar.
+
+    Iterating yields the closed trades as ``Position`` objects, and
+    ``to_frame`` exposes them as a DataFrame whose numeric block is a view
+    of the ledger.
+
+    Attributes
+    ----------
+    dates : array-like or None
+        Timestamps indexed by the bar numbers passed to ``open``/``close``.
+    n_open : int
+        Number of open positions.
+    """
+    TICKERS = ("Y", "X")
+    SIDES = ("LONG", "SHORT")
+    Y, X = 0, 1
+    LONG, SHORT = 0, 1
+    FIELDS = ("n_shares", "entry_price", "exit_price", "profit")
+
+    __slots__ = ("dates", "n_open", "_size", "_o_codes", "_o_vals", "_o_bar",
+                 "_codes", "_vals", "_bars", "_long", "_short", "_short_entry")
+
+    def __init__(self, dates=None, capacity=64):
+        self.dates = dates
+        self.n_open = 0
+        self._size = 0
+        self._o_codes = np.zeros((4, 2), dtype=np.int8)    # ticker, side
+        self._o_vals = np.zeros((4, 2))                     # n_shares, entry
+        self._o_bar = np.zeros(4, dtype=np.int64)
+        self._codes = np.zeros((2, capacity), dtype=np.int8)
+        self._vals = np.zeros((4, capacity))
+        self._bars = np.zeros((2, capacity), dtype=np.int64)
+        self._long = np.zeros(len(self.TICKERS))
+        self._short = np.zeros(len(self.TICKERS))
+        self._short_entry = np.zeros(len(self.TICKERS))
+
+    @classmethod
+    def from_arrays(cls, dates, ticker, side, n_shares, entry_price, exit_price,
+                    entry_bar, exit_bar, profit):
+        """
+        Build a ledger from closed-trade columns (e.g. the output of a
+        compiled backtest kernel).
+        """
+        k = len(profit)
+        ledger = cls(dates, capacity=max(k, 1))
+        ledger._codes[0, :k] = ticker
+        ledger._codes[1, :k] = side
+        ledger._vals[:, :k] = n_shares, entry_price, exit_price, profit
+        ledger._bars[:, :k] = entry_bar, exit_bar
+        ledger._size = k
+        return ledger
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        k = self._size
+        for tk, sd, n, entry, exit_, profit, t0, t1 in zip(
+                self._codes[0, :k].tolist(), self._codes[1, :k].tolist(),
+                *self._vals[:, :k].tolist(), *self._bars[:, :k].tolist()):
+            yield Position(n, self.TICKERS[tk], entry, exit_, self.SIDES[sd],
+                           self._date(t0), self._date(t1), profit)
+
+    def _date(self, t):
+        return t if self.dates is None else self.dates[t]
+
+    def open(self, ticker: int, side: int, n_shares: float, price: float, t: int) -> int:
+        """
+        Open a position and return its slot in the open book.
+        """
+        k = self.n_open
+        if k == len(self._o_bar):
+            self._o_codes = np.concatenate([self._o_codes, np.zeros_like(self._o_codes)])
+            self._o_vals = np.concatenate([self._o_vals, np.zeros_like(self._o_vals)])
+            self._o_bar = np.concatenate([self._o_bar, np.zeros_like(self._o_bar)])
+        self._o_codes[k] = ticker, side
+        self._o_vals[k] = n_shares, price
+        self._o_bar[k] = t
+        self.n_open = k + 1
+        self._book(ticker, side, n_shares, price)
+        return k
+
+    def _book(self, ticker: int, side: int, n_shares: float, price: float):
+        """Add shares bought or sold short at ``price`` to the net holdings."""
+        if side == self.LONG:
+            self._long[ticker] += n_shares
+        else:
+            held = self._short[ticker]
+            self._short_entry[ticker] = (
+                price if held == 0
+                else (self._short_entry[ticker] * held + price * n_shares) / (held + n_shares)
+            )
+            self._short[ticker] = held + n_shares
+
+    def find(self, ticker: int, side: int) -> int:
+        """Slot of the first open position on ``ticker``/``side``, or -1."""
+        for k in range(self.n_open):
+            if self._o_codes[k, 0] == ticker and self._o_codes[k, 1] == side:
+                return k
+        return -1
+
+    def open_legs(self) -> list:
+        """Open positions as (ticker, side, n_shares) tuples, in slot order."""
+        k = self.n_open
+        return list(zip(self._o_codes[:k, 0].tolist(), self._o_codes[:k, 1].tolist(),
+                        self._o_vals[:k, 0].tolist()))
+
+    def add(self, slot: int, n_shares: float, price: float):
+        """
+        Add shares to an open position; its entry price becomes the
+        share-weighted average (e.g. successive partial fills of one order).
+        """
+        ticker, side = self._o_codes[slot].tolist()
+        n, entry = self._o_vals[slot].tolist()
+        self._o_vals[slot] = n + n_shares, (entry * n + price * n_shares) / (n + n_shares)
+        self._book(ticker, side, n_shares, price)
+
+    def _reserve(self, size: int):
+        """Grow the closed-trade arrays (at least doubling) to hold ``size`` rows."""
+        cap = self._codes.shape[1]
+        if size <= cap:
+            return
+        grow = max(size - cap, cap, 64)
+        self._codes = np.concatenate([self._codes, np.zeros((2, grow), np.int8)], 1)
+        self._vals = np.concatenate([self._vals, np.zeros((4, grow))], 1)
+        self._bars = np.concatenate([self._bars, np.zeros((2, grow), np.int64)], 1)
+
+    def _record(self, slot: int, price: float, t: int, profit: float, n: float):
+        k = self._size
+        self._reserve(k + 1)
+        self._codes[:, k] = self._o_codes[slot]
+        self._vals[:, k] = n, self._o_vals[slot, 1], price, profit
+        self._bars[:, k] = self._o_bar[slot], t
+        self._size = k + 1
+
+    def close(self, slot: int, price: float, t: int, com_rate: float = 0.0,
+              n_shares=None) -> tuple:
+        """
+        Close one open position at ``price``; the last open position moves
+        into ``slot``. With ``n_shares`` smaller than the position only that
+        many shares are closed (recorded as a trade of that size) and the
+        rest stays open in ``slot``.
+
+        Returns
+        -------
+        tuple
+            (cash_flow, commission, profit)
+        """
+        ticker, side = self._o_codes[slot].tolist()
+        held, entry = self._o_vals[slot].tolist()
+        n = held if n_shares is None else min(n_shares, held)
+        com = n * price * com_rate
+        if side == self.LONG:
+            profit = (price - entry) * n - com
+            flow = price * n - com
+            self._long[ticker] -= n
+        else:
+            profit = (entry - price) * n - com
+            flow = profit
+            short = self._short[ticker]
+            left = short - n
+            # take this position's shares out of the average entry of the rest
+            self._short_entry[ticker] = (
+                0.0 if left <= 0
+                else (self._short_entry[ticker] * short - entry * n) / left
+            )
+            self._short[ticker] = max(left, 0.0)
+        self._record(slot, price, t, profit, n)
+
+        if n < held:
+            self._o_vals[slot, 0] = held - n
+            return flow, com, profit
+
+        last = self.n_open - 1
+        self._o_codes[slot] = self._o_codes[last]
+        self._o_vals[slot] = self._o_vals[last]
+        self._o_bar[slot] = self._o_bar[last]
+        self.n_open = last
+        return flow, com, profit
+
+    def close_all(self, prices, t: int, com_rate: float = 0.0) -> tuple:
+        """
+        Close every open position, longs first, at ``prices`` (indexed by
+        ticker code).
+
+        Returns
+        -------
+        tuple
+            (cash_flows, commissions) arrays in closing order.
+        """
+        k = self.n_open
+        codes, vals = self._o_codes[:k], self._o_vals[:k]
+        order = np.argsort(codes[:, 1], kind="stable")
+        px = np.asarray(prices, dtype=float)[codes[order, 0]]
+        n, entry = vals[order, 0], vals[order, 1]
+        long = codes[order, 1] == self.LONG
+        com = n * px * com_rate
+        profit = np.where(long, (px - entry) * n, (entry - px) * n) - com
+        flows = np.where(long, px * n - com, profit)
+
+        s = self._size
+        self._reserve(s + k)
+        self._codes[:, s:s + k] = codes[order].T
+        self._vals[:, s:s + k] = n, entry, px, profit
+        self._bars[0, s:s + k] = self._o_bar[:k][order]
+        self._bars[1, s:s + k] = t
+        self._size = s + k
+        self.n_open = 0
+        self._long[:] = 0.0
+        self._short[:] = 0.0
+        self._short_entry[:] = 0.0
+        return flows, com
+
+    def value(self, cash: float, prices) -> float:
+        """
+        Mark-to-market portfolio value: ``cash`` plus the market value of
+        open longs plus the open P&L of open shorts, ``(entry - px) * n``.
+        """
+        if self.n_open == 0:
+            return cash
+        px = np.asarray(prices, dtype=float)
+        return (cash + float(self._long @ px)
+                + float(np.sum((self._short_entry - px) * self._short)))
+
+    def short_exposure(self, prices) -> float:
+        """Market value of the open short positions."""
+        return float(self._short @ np.asarray(prices, dtype=float))
+
+    @property
+    def profits(self) -> np.ndarray:
+        """View of the realized profit of every closed trade."""
+        return self._vals[3, :self._size]
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Closed trades as a DataFrame with the ``Position`` columns. The
+        numeric columns are a view of the ledger, not a copy.
+        """
+        k = self._size
+        df = pd.DataFrame(self._vals[:, :k].T, columns=list(self.FIELDS), copy=False)
+        df.insert(1, "ticker", pd.Categorical.from_codes(self._codes[0, :k], self.TICKERS))
+        df.insert(4, "type_of_trade", pd.Categorical.from_codes(self._codes[1, :k], self.SIDES))
+        bars = self._bars[:, :k]
+        df.insert(5, "entry_date", bars[0] if self.dates is None else self.dates[bars[0]])
+        df.insert(6, "exit_date", bars[1] if self.dates is None else self.dates[bars[1]])
+        return df
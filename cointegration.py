@@ -1,7 +1,371 @@
 from libraries import *
+import math
+from functools import lru_cache
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
 from classes import coint_config
 
 
+# MacKinnon (1994, 2010) response-surface coefficients for one I(1) series
+# (the plain ADF test), as in statsmodels.tsa.adfvalues 0.14: (min, max,
+# star, small-p, large-p) per deterministic specification. Vendored so the
+# stationarity gate does not depend on statsmodels' private tables; the
+# scalings are applied as statsmodels does, so the values are bit-identical.
+_SMALL_SCALING = np.array([1, 1, 1e-2])
+_LARGE_SCALING = np.array([1, 1e-1, 1e-1, 1e-2])
+_TAU_N1 = {
+    "n": (-19.04, np.inf, -1.04,
+          [0.6344, 1.2378, 3.2496], [0.4797, 9.3557, -0.6999, 3.3066]),
+    "c": (-18.83, 2.74, -1.61,
+          [2.1659, 1.4412, 3.8269], [1.7339, 9.3202, -1.2745, -1.0368]),
+    "ct": (-16.18, 0.7, -2.89,
+           [3.2512, 1.6047, 4.9588], [2.5261, 6.1654, -3.7956, -6.0285]),
+    "ctt": (-17.17, 0.54, -3.21,
+            [4.0003, 1.658, 4.8288], [3.0778, 4.9529, -4.1477, -5.9359]),
+}
+
+
+@lru_cache(maxsize=None)
+def _tau_table(regression: str = "c", N: int = 1) -> tuple:
+    """
+    MacKinnon response-surface coefficients: (min, max, star, small-p
+    coefficients, large-p coefficients), polynomials in ascending powers
+    reversed for Horner evaluation. N > 1 reads statsmodels' tables.
+    """
+    if N == 1:
+        if regression not in _TAU_N1:
+            raise ValueError(f"regression must be one of {sorted(_TAU_N1)}")
+        lo, hi, star, small, large = _TAU_N1[regression]
+        small = np.asarray(small) * _SMALL_SCALING
+        large = np.asarray(large) * _LARGE_SCALING
+    else:
+        try:
+            from statsmodels.tsa.adfvalues import (
+                _tau_maxs, _tau_mins, _tau_stars, _tau_smallps, _tau_largeps
+            )
+        except ImportError as e:
+            raise ValueError(
+                "N > 1 needs the MacKinnon tables of statsmodels.tsa.adfvalues") from e
+        lo, hi, star = (_tau_mins[regression][N - 1], _tau_maxs[regression][N - 1],
+                        _tau_stars[regression][N - 1])
+        small, large = _tau_smallps[regression][N - 1], _tau_largeps[regression][N - 1]
+    return lo, hi, star, tuple(small[::-1]), tuple(large[::-1])
+
+
+def mackinnon_pvalue(stat, regression: str = "c", N: int = 1):
+    """
+    Vectorized MacKinnon (1994) approximate p-value for ADF-type statistics.
+
+    Uses the same response-surface coefficients as ``statsmodels``'
+    ``mackinnonp`` but accepts arrays of statistics.
+
+    Parameters
+    ----------
+    stat : float or np.ndarray
+        ADF t-statistic(s).
+    regression : str
+        Deterministic terms of the ADF regression ("c", "n", "ct", "ctt").
+    N : int
+        Number of I(1) series (1 for a plain ADF test).
+
+    Returns
+    -------
+    float or np.ndarray
+        Approximate p-value(s).
+    """
+    from scipy.special import ndtr
+
+    lo, hi, star, small, large = _tau_table(regression, N)
+    stat = np.asarray(stat, dtype=float)
+    p = ndtr(np.where(stat <= star, np.polyval(small, stat), np.polyval(large, stat)))
+    p = np.where(stat > hi, 1.0, p)
+    p = np.where(stat < lo, 0.0, p)
+    return float(p) if p.ndim == 0 else p
+
+
+def _mackinnon_scalar(stat):
+    """Scalar fast path of ``mackinnon_pvalue`` for regression "c", N=1."""
+    lo, hi, star, small, large = _tau_table()
+    if stat != stat:
+        return np.nan
+    if stat > hi:
+        return 1.0
+    if stat < lo:
+        return 0.0
+    z = 0.0
+    for coef in (small if stat <= star else large):
+        z = z * stat + coef
+    return 0.5 * math.erfc(-z / math.sqrt(2.0))
+
+
+class RollingADF:
+    """
+    Incremental ADF test (constant, AIC lag selection) over a sliding window.
+
+    Reproduces ``adfuller(window_values)`` on every bar, but keeps the
+    regression's cross-products of (1, lagged level, lagged differences,
+    difference) per candidate lag and slides them in O(1) per bar instead of
+    refitting. All lag models are ranked from a single Cholesky factor of the
+    common-sample moment matrix. The running sums are rebuilt exactly every
+    ``refresh`` bars to bound floating-point drift.
+
+    P-values agree with ``statsmodels.adfuller`` to about 1e-6 and
+    statistics to about 1e-7 (1e-10 once the window is well above the
+    largest lag), except for saturated fits (one residual degree of freedom
+    at the largest lag) where both are numerically fragile.
+
+    Attributes
+    ----------
+    window : int
+        Number of levels in each test window.
+    maxlag : int
+        Largest lag considered by the AIC search.
+    n_series : int or None
+        Number of series tested in parallel; None for a single scalar series.
+    """
+
+    def __init__(self, window, maxlag=None, autolag="AIC", n_series=None,
+                 refresh=252):
+        default = int(np.ceil(12.0 * np.power(window / 100.0, 1 / 4.0)))
+        default = min(window // 2 - 2, default)
+        if maxlag is None:
+            maxlag = default
+        if maxlag < 0 or maxlag > window // 2 - 2:
+            raise ValueError("maxlag must be between 0 and window // 2 - 2")
+        if autolag not in ("AIC", None):
+            raise ValueError("autolag must be 'AIC' or None")
+
+        self.window = window
+        self.maxlag = maxlag
+        self.autolag = autolag
+        self.n_series = n_series
+        self.refresh = refresh
+
+        n = 1 if n_series is None else n_series
+        m = maxlag + 3
+        self._m = m
+        self._count = 0
+        self._last = np.zeros(n)
+        self._row = np.zeros((n, m))
+        self._row[:, 0] = 1.0
+        self._outer = np.zeros((window, n, m, m))
+        self._S = np.zeros((maxlag + 1, n, m, m))
+        self._lags = np.arange(maxlag + 1)
+        self._idx = [np.array([0, *range(2, p + 2), 1, m - 1])
+                     for p in range(maxlag + 1)]
+
+    def push(self, value):
+        """
+        Append one observation and test the latest window.
+
+        Parameters
+        ----------
+        value : float or np.ndarray
+            New level (one per series when ``n_series`` is set).
+
+        Returns
+        -------
+        tuple
+            (adf_stat, pvalue), NaN until the window is full.
+        """
+        v = np.asarray(value, dtype=float).reshape(-1)
+        t = self._count
+        self._count += 1
+
+        if t == 0:
+            self._last[:] = v
+            return self._nan()
+
+        W, m, row = self.window, self._m, self._row
+        d = v - self._last
+        row[:, 1] = self._last
+        row[:, m - 1] = d
+        outer = row[:, :, None] * row[:, None, :]
+
+        self._S += outer
+        self._outer[t % W] = outer
+        out = t - W + 1 + self._lags
+        if out[0] >= 1:
+            np.subtract(self._S, self._outer.take(out % W, axis=0), out=self._S)
+        else:
+            keep = out >= 1
+            self._S[keep] -= self._outer[out[keep] % W]
+
+        row[:, 3:m - 1] = row[:, 2:m - 2]
+        if m > 3:
+            row[:, 2] = d
+        self._last[:] = v
+
+        if self._count < W:
+            return self._nan()
+        if self._count % self.refresh == 0:
+            self._rebuild()
+        return self._test()
+
+    def _nan(self):
+        if self.n_series is None:
+            return np.nan, np.nan
+        nan = np.full(self.n_series, np.nan)
+        return nan, nan.copy()
+
+    def _rebuild(self):
+        """Recompute the sliding sums exactly from the stored rows."""
+        W, t = self.window, self._count - 1
+        rows = self._outer[[(t - k) % W for k in range(W - 1)]]
+        csum = np.cumsum(rows, axis=0)
+        self._S = csum[W - 2 - self._lags]
+
+    def _test(self):
+        nobs = self.window - 1 - self._lags
+        stat = _adf_from_moments(self._S, nobs, self.autolag, self._idx)
+        if self.n_series is None:
+            return float(stat[0]), _mackinnon_scalar(float(stat[0]))
+        return stat, mackinnon_pvalue(stat)
+
+
+def _adf_from_moments(S, nobs, autolag="AIC", idx=None):
+    """
+    ADF t-statistics (constant, optional AIC lag search) from cross-products.
+
+    Parameters
+    ----------
+    S : np.ndarray
+        Shape (maxlag + 1, n, m, m). ``S[p]`` holds the cross-products of the
+        rows (1, level_{t-1}, diff_{t-1}, ..., diff_{t-maxlag}, diff_t) over
+        the sample used by the lag-p regression; ``S[maxlag]`` is the common
+        sample of the lag search.
+    nobs : np.ndarray
+        Sample size behind each ``S[p]``.
+    autolag : str or None
+        "AIC" to select the lag as ``adfuller`` does, None for ``maxlag``.
+    idx : list, optional
+        Precomputed column orders that put the level last for each lag.
+
+    Returns
+    -------
+    np.ndarray
+        ADF statistic per series, NaN where the regression is singular.
+    """
+    maxlag = S.shape[0] - 1
+    n, m = S.shape[1], S.shape[2]
+    if idx is None:
+        idx = [np.array([0, *range(2, p + 2), 1, m - 1]) for p in range(maxlag + 1)]
+
+    if autolag is None:
+        best = np.full(n, maxlag)
+    else:
+        A = S[maxlag]
+        try:
+            c = np.linalg.cholesky(A)[:, m - 1, :m - 1]
+        except np.linalg.LinAlgError:
+            c = np.full((n, m - 1), np.nan)
+        ssr = A[:, m - 1, m - 1][:, None] - np.cumsum(c * c, axis=1)
+        nc = nobs[maxlag]
+        k = np.arange(2, m)
+        aic = (nc * np.log(np.maximum(ssr[:, 1:], 1e-300))
+               + nc * (np.log(2 * np.pi) - np.log(nc) + 1) + 2 * k)
+        best = np.argmin(np.where(np.isnan(aic), np.inf, aic), axis=1)
+
+    stat = np.full(n, np.nan)
+    for p in (best[:1] if n == 1 else np.unique(best)):
+        sel = slice(None) if n == 1 else np.flatnonzero(best == p)
+        A = S[p][sel][:, idx[p][:, None], idx[p]]
+        try:
+            L = np.linalg.cholesky(A)
+        except np.linalg.LinAlgError:
+            continue
+        k = p + 2
+        stat[sel] = L[:, k, k - 1] * np.sqrt(nobs[p] - k) / L[:, k, k]
+    return stat
+
+
+def engle_granger_batch(prices: pd.DataFrame, pairs=None, maxlag: int = 1,
+                        autolag="AIC") -> pd.DataFrame:
+    """
+    Vectorized Engle–Granger screen for many pairs at once.
+
+    Hedge ratios come from the covariance matrix of the levels. The residual
+    ADF regressions (constant, lags up to ``maxlag``) are assembled for every
+    pair from one moment matrix of the centered, lagged level and
+    difference columns, then solved with batched Cholesky factorizations.
+    Equivalent to ``OLS`` followed by ``adfuller(resid, maxlag=maxlag)``
+    on each pair.
+
+    Parameters
+    ----------
+    prices : pd.DataFrame
+        Aligned price matrix without missing values.
+    pairs : list of tuple, optional
+        (asset1, asset2) pairs, asset1 regressed on asset2. Defaults to
+        every combination of columns.
+    maxlag : int
+        Largest lag of differences in the ADF regression.
+    autolag : str or None
+        "AIC" to select the lag per pair, None to always use ``maxlag``.
+
+    Returns
+    -------
+    pd.DataFrame
+        Asset1, Asset2, Beta, Intercept, ADF_stat, ADF_pvalue.
+    """
+    values = prices.to_numpy(dtype=np.float64)
+    if np.isnan(values).any():
+        raise ValueError("prices must not contain missing values")
+    columns = list(prices.columns)
+    if pairs is None:
+        pairs = list(combinations(columns, 2))
+    pos = {c: i for i, c in enumerate(columns)}
+    ia = np.array([pos[a] for a, _ in pairs], dtype=int)
+    ib = np.array([pos[b] for _, b in pairs], dtype=int)
+
+    T, N = values.shape
+    cov = np.cov(values, rowvar=False).reshape(N, N)
+    beta = cov[ia, ib] / cov[ib, ib]
+    mean = values.mean(axis=0)
+    intercept = mean[ia] - beta * mean[ib]
+
+    # per-column regressors of row t: level_{t-1}, diff_{t-1..t-maxlag}, diff_t
+    diff = np.vstack([np.zeros((1, N)), np.diff(values, axis=0)])
+    blocks = [values[:-1]] + [np.vstack([np.zeros((j, N)), diff[:-j]])[1:]
+                              for j in range(1, maxlag + 1)] + [diff[1:]]
+    U = np.hstack(blocks)
+    U -= U[maxlag:].mean(axis=0)
+    common = U[maxlag:]
+    G = common.T @ common
+
+    m = maxlag + 3
+    K = len(pairs)
+    cols_a = np.arange(m - 1)[None, :] * N + ia[:, None]
+    cols_b = np.arange(m - 1)[None, :] * N + ib[:, None]
+    M = np.empty((K, m, m))
+    M[:, 1:, 1:] = (G[cols_a[:, :, None], cols_a[:, None, :]]
+                    - beta[:, None, None] * (G[cols_a[:, :, None], cols_b[:, None, :]]
+                                             + G[cols_b[:, :, None], cols_a[:, None, :]])
+                    + (beta ** 2)[:, None, None] * G[cols_b[:, :, None], cols_b[:, None, :]])
+    M[:, 0, 1:] = M[:, 1:, 0] = 0.0
+    M[:, 0, 0] = T - 1 - maxlag
+
+    # regressions with p < maxlag also use rows p+1..maxlag
+    S = np.empty((maxlag + 1, K, m, m))
+    S[maxlag] = M
+    for p in range(maxlag - 1, -1, -1):
+        z = np.empty((K, m))
+        z[:, 0] = 1.0
+        z[:, 1:] = U[p][cols_a] - beta[:, None] * U[p][cols_b]
+        S[p] = S[p + 1] + z[:, :, None] * z[:, None, :]
+    nobs = T - 1 - np.arange(maxlag + 1)
+
+    stat = _adf_from_moments(S, nobs, autolag)
+    return pd.DataFrame({
+        'Asset1': [a for a, _ in pairs],
+        'Asset2': [b for _, b in pairs],
+        'Beta': beta,
+        'Intercept': intercept,
+        'ADF_stat': stat,
+        'ADF_pvalue': mackinnon_pvalue(stat),
+    })
+
+
 def correlation(data: pd.DataFrame, window=coint_config.window):
     """
     Compute smoothed rolling correlation between two price series.
@@ -23,6 +387,18 @@ def correlation(data: pd.DataFrame, window=coint_config.window):
     return corr.rolling(window).mean()
 
 
+def _complete_rows(data):
+    """
+    Rows of a two-asset DataFrame or (T, 2) array without missing values;
+    an array without gaps is returned as is.
+    """
+    if isinstance(data, pd.DataFrame):
+        return data.dropna()
+    data = np.asarray(data, dtype=np.float64)
+    ok = ~np.isnan(data).any(axis=1)
+    return data if ok.all() else data[ok]
+
+
 def OLS(data: pd.DataFrame):
     """
     Perform Engle–Granger OLS regression to estimate the hedge ratio,
@@ -30,18 +406,22 @@ def OLS(data: pd.DataFrame):
 
     Parameters
     ----------
-    data : pd.DataFrame
-        Two-asset price series.
+    data : pd.DataFrame or np.ndarray
+        Two-asset price series (a (T, 2) array gives array residuals).
 
     Returns
     -------
     tuple
         (residuals, adf_pvalue, residual_mean)
     """
-    data = data.copy().dropna()
+    data = _complete_rows(data)
 
-    y = data.iloc[:, 0]
-    x = sm.add_constant(data.iloc[:, 1])
+    if isinstance(data, pd.DataFrame):
+        y = data.iloc[:, 0]
+        x = sm.add_constant(data.iloc[:, 1])
+    else:
+        y = data[:, 0]
+        x = sm.add_constant(data[:, 1])
 
     model = sm.OLS(y, x).fit()
     resid = model.resid
@@ -61,7 +441,7 @@ def johansen_test(data: pd.DataFrame,
 
     Parameters
     ----------
-    data : pd.DataFrame
+    data : pd.DataFrame or np.ndarray
         Two-asset price data.
     det_order : int
         Deterministic trend specification.
@@ -77,8 +457,7 @@ def johansen_test(data: pd.DataFrame,
             'trace_stat': float
         }
     """
-    data = data.copy().dropna()
-    res = coint_johansen(data, det_order, k_ar_diff)
+    res = coint_johansen(_complete_rows(data), det_order, k_ar_diff)
 
     return {
         'eigenvectors': res.evec[:, 0],
@@ -87,66 +466,274 @@ def johansen_test(data: pd.DataFrame,
     }
 
 
+def johansen_batch(prices: pd.DataFrame, pairs=None,
+                   det_order=coint_config.det_order,
+                   k_ar_diff=coint_config.k_ar_diff) -> dict:
+    """
+    Vectorized bivariate Johansen trace test for many pairs at once.
+
+    Builds the centered moment matrix of the differences, lagged differences
+    and lagged levels of every column once, gathers each pair's block,
+    partials out the lagged differences and solves the 2x2 eigenproblem in
+    closed form. Equivalent to ``johansen_test`` on each pair; eigenvectors
+    follow ``coint_johansen``'s normalization (v' S_kk v = 1, first
+    component positive).
+
+    Parameters
+    ----------
+    prices : pd.DataFrame
+        Aligned price matrix without missing values.
+    pairs : list of tuple, optional
+        (asset1, asset2) pairs. Defaults to every combination of columns.
+    det_order : int
+        Deterministic trend specification (-1 none, 0 constant).
+    k_ar_diff : int
+        Johansen VAR lag order.
+
+    Returns
+    -------
+    dict
+        {
+            'eigenvectors': np.ndarray (n_pairs, 2),
+            'eigenvalues': np.ndarray (n_pairs, 2),
+            'critical_values': np.ndarray,
+            'trace_stat': np.ndarray (n_pairs,)
+        }
+    """
+    if det_order not in (-1, 0):
+        raise ValueError("johansen_batch supports det_order -1 or 0")
+    values = prices.to_numpy(dtype=np.float64)
+    if np.isnan(values).any():
+        raise ValueError("prices must not contain missing values")
+    columns = list(prices.columns)
+    if pairs is None:
+        pairs = list(combinations(columns, 2))
+    pos = {c: i for i, c in enumerate(columns)}
+    ia = np.array([pos[a] for a, _ in pairs], dtype=int)
+    ib = np.array([pos[b] for _, b in pairs], dtype=int)
+
+    T, N = values.shape
+    k = k_ar_diff
+    n = T - 1 - k
+    diff = np.diff(values, axis=0)
+    blocks = ([diff[k:]] + [diff[k - j:T - 1 - j] for j in range(1, k + 1)]
+              + [values[1:T - k]])
+    U = np.hstack(blocks)
+    if det_order == 0:
+        U -= U.mean(axis=0)
+    G = U.T @ U / n
+
+    # variables per pair: [dy, dx, lagged diffs..., y_lag, x_lag]
+    cols = np.stack([np.arange(k + 2) * N + ia[:, None],
+                     np.arange(k + 2) * N + ib[:, None]], axis=2).reshape(len(pairs), -1)
+    C = G[cols[:, :, None], cols[:, None, :]]
+    d, z, lv = slice(0, 2), slice(2, 2 * k + 2), slice(2 * k + 2, 2 * k + 4)
+
+    if k > 0:
+        beta = np.linalg.solve(C[:, z, z], C[:, z, :])
+        C = C - C[:, :, z] @ beta
+    s00, skk, sk0 = C[:, d, d], C[:, lv, lv], C[:, lv, d]
+
+    sig = sk0 @ np.linalg.solve(s00, np.swapaxes(sk0, 1, 2))
+    M = np.linalg.solve(skk, sig)
+    half_tr = (M[:, 0, 0] + M[:, 1, 1]) / 2
+    det = M[:, 0, 0] * M[:, 1, 1] - M[:, 0, 1] * M[:, 1, 0]
+    root = np.sqrt(np.maximum(half_tr ** 2 - det, 0.0))
+    lam1 = half_tr + root
+    lam2 = np.where(lam1 != 0, det / np.where(lam1 != 0, lam1, 1.0), half_tr - root)
+
+    v_a = np.stack([M[:, 0, 1], lam1 - M[:, 0, 0]], axis=1)
+    v_b = np.stack([lam1 - M[:, 1, 1], M[:, 1, 0]], axis=1)
+    use_a = (v_a ** 2).sum(axis=1) >= (v_b ** 2).sum(axis=1)
+    v = np.where(use_a[:, None], v_a, v_b)
+    v /= np.sqrt(np.einsum('pi,pij,pj->p', v, skk, v))[:, None]
+    v *= np.where(v[:, 0] < 0, -1.0, 1.0)[:, None]
+
+    trace = -n * (np.log(1 - lam1) + np.log(1 - lam2))
+    from statsmodels.tsa.coint_tables import c_sjt
+
+    crit = np.array([c_sjt(2, det_order)[1], c_sjt(1, det_order)[1]])
+
+    return {
+        'eigenvectors': v,
+        'eigenvalues': np.stack([lam1, lam2], axis=1),
+        'critical_values': crit,
+        'trace_stat': trace
+    }
+
+
+_SHARED_PRICES = {}
+
+
+def _attach_prices(name: str, shape: tuple):
+    """
+    Process-pool initializer: map the shared price matrix into this worker.
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    _SHARED_PRICES['shm'] = shm
+    _SHARED_PRICES['values'] = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+
+
+def _attach_store(store):
+    """
+    Process-pool initializer: memory-map a ``PriceStore`` in this worker.
+    """
+    _SHARED_PRICES['values'] = store.values
+
+
+def _pair_stats(y: np.ndarray, x: np.ndarray, a, b, corr: float, adf_alpha: float) -> dict:
+    """
+    Engle–Granger and Johansen statistics for one candidate pair, from
+    column views of the price matrix; only the pair's (T, 2) working array
+    is materialized.
+
+    Returns
+    -------
+    dict
+        One row of the ``select_pairs`` results table.
+    """
+    data_pair = _complete_rows(np.column_stack((y, x)))
+    resid, adf_p, _ = OLS(data_pair)
+    joh = johansen_test(data_pair)
+    return _stats_row(a, b, corr, adf_p, adf_alpha, joh['eigenvectors'],
+                      joh['trace_stat'], joh['critical_values'][0])
+
+
+def _stats_row(a, b, corr: float, adf_p: float, adf_alpha: float, eig,
+               joh_trace: float, joh_crit: float) -> dict:
+    """
+    One row of the ``select_pairs`` results table from the Engle–Granger
+    p-value and the leading Johansen eigenvector and trace statistic.
+    """
+    beta1, beta2 = float(eig[0]), float(eig[1])
+
+    beta1_norm = beta1 / beta2 if beta2 != 0 else np.nan
+    beta2_norm = 1.0
+
+    joh_trace = float(joh_trace)
+    joh_crit = float(joh_crit)
+    johansen_ok = joh_trace > joh_crit
+
+    return {
+        'Asset1': a,
+        'Asset2': b,
+        'Correlation': float(corr),
+        'ADF_pvalue': float(adf_p),
+        'ADF_Cointegrated': bool(adf_p < adf_alpha),
+        'Johansen_stat': joh_trace,
+        'Johansen_crit_95': joh_crit,
+        'Johansen_Cointegrated': johansen_ok,
+        'Eigenvector_1': beta1,
+        'Eigenvector_2': beta2,
+        'Beta1_norm': beta1_norm,
+        'Beta2_norm': beta2_norm,
+        'Johansen_strength': joh_trace - joh_crit
+    }
+
+
+def _screen_chunk(tasks: list, adf_alpha: float) -> list:
+    """
+    Worker task: evaluate a chunk of (i, j, a, b, corr) candidates against
+    the shared price matrix.
+    """
+    values = _SHARED_PRICES['values']
+    return [
+        _pair_stats(values[:, i], values[:, j], a, b, corr, adf_alpha)
+        for i, j, a, b, corr in tasks
+    ]
+
+
+def _screen_batch(prices, candidates: list, adf_alpha: float) -> list:
+    """
+    Vectorized screen of the candidates: ``engle_granger_batch`` over all of
+    them at once, then ``johansen_batch`` over the pairs that pass the ADF
+    cutoff (the others cannot be selected). Uses the rows where every
+    candidate asset has a price.
+    """
+    assets = list(dict.fromkeys(c for _, _, a, b, _ in candidates for c in (a, b)))
+    frame = prices[assets] if isinstance(prices, pd.DataFrame) else prices.frame(assets)
+    frame = frame.dropna()
+    eg = engle_granger_batch(frame, [(a, b) for _, _, a, b, _ in candidates])
+
+    keep = np.flatnonzero(eg['ADF_pvalue'].to_numpy() < adf_alpha)
+    if not len(keep):
+        return []
+    passed = [candidates[k] for k in keep]
+    joh = johansen_batch(frame, [(a, b) for _, _, a, b, _ in passed])
+    crit = joh['critical_values'][0]
+    return [
+        _stats_row(a, b, corr, adf_p, adf_alpha, eig, trace, crit)
+        for (_, _, a, b, corr), adf_p, eig, trace in zip(
+            passed, eg['ADF_pvalue'].to_numpy()[keep].tolist(),
+            joh['eigenvectors'], joh['trace_stat'].tolist())
+    ]
+
+
 def select_pairs(prices: pd.DataFrame,
                  corr_threshold: float = 0.7,
-                 adf_alpha: float = 0.05):
+                 adf_alpha: float = 0.05,
+                 n_jobs: int = 1,
+                 method: str = "exact"):
     """
     Evaluate all asset pairs and select those satisfying correlation,
     Engle–Granger, and Johansen cointegration requirements.
 
     Parameters
     ----------
-    prices : pd.DataFrame
-        Historical price matrix.
+    prices : pd.DataFrame or PriceStore
+        Historical price matrix. With a ``PriceStore`` the correlations are
+        computed block by block from the memory map and every pair test
+        reads zero-copy column views, so neither the parent nor the workers
+        hold the universe in memory.
     corr_threshold : float
         Minimum acceptable correlation.
     adf_alpha : float
         Maximum ADF p-value allowed.
+    n_jobs : int
+        Worker processes for the pair tests (-1 uses every core). Workers
+        read the price matrix from shared memory (or map the store); the
+        ranking is identical to the serial run.
+    method : str
+        "exact" runs ``OLS`` (``adfuller`` with its default lag search) and
+        ``johansen_test`` on every candidate. "batch" screens all
+        candidates at once with ``engle_granger_batch`` (ADF with at most
+        one lagged difference) and ``johansen_batch`` on the rows where all
+        candidate assets are present, for large universes; ``n_jobs`` is
+        not used.
 
     Returns
     -------
     pd.DataFrame
         Ranked table of cointegrated pairs and statistics.
     """
-    results = []
-    corr_matrix = prices.corr()
-
-    for a, b in combinations(prices.columns, 2):
-
-        corr = corr_matrix.loc[a, b]
-        if pd.isna(corr) or corr < corr_threshold:
-            continue
-
-        data_pair = prices[[a, b]].dropna()
-
-        resid, adf_p, _ = OLS(data_pair)
-        joh = johansen_test(data_pair)
-
-        eig = joh['eigenvectors']
-        beta1, beta2 = float(eig[0]), float(eig[1])
-
-        beta1_norm = beta1 / beta2 if beta2 != 0 else np.nan
-        beta2_norm = 1.0
-
-        joh_trace = float(joh['trace_stat'])
-        joh_crit = float(joh['critical_values'][0])
-        johansen_ok = joh_trace > joh_crit
-
-        results.append({
-            'Asset1': a,
-            'Asset2': b,
-            'Correlation': float(corr),
-            'ADF_pvalue': adf_p,
-            'ADF_Cointegrated': adf_p < adf_alpha,
-            'Johansen_stat': joh_trace,
-            'Johansen_crit_95': joh_crit,
-            'Johansen_Cointegrated': johansen_ok,
-            'Eigenvector_1': beta1,
-            'Eigenvector_2': beta2,
-            'Beta1_norm': beta1_norm,
-            'Beta2_norm': beta2_norm,
-            'Johansen_strength': joh_trace - joh_crit
-        })
+    columns = list(prices.columns)
+    if isinstance(prices, pd.DataFrame):
+        corr_matrix = prices.corr().to_numpy()
+        candidates = []
+        for i, j in combinations(range(len(columns)), 2):
+            corr = corr_matrix[i, j]
+            if pd.isna(corr) or corr < corr_threshold:
+                continue
+            candidates.append((i, j, columns[i], columns[j], corr))
+    else:
+        candidates = [(i, j, columns[i], columns[j], corr)
+                      for i, j, corr in prices.correlated_pairs(corr_threshold)]
+
+    if method not in ("exact", "batch"):
+        raise ValueError("method must be 'exact' or 'batch'")
+
+    n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+    if method == "batch":
+        results = _screen_batch(prices, candidates, adf_alpha) if candidates else []
+    elif n_jobs <= 1 or len(candidates) < 2:
+        values = prices.to_numpy(dtype=np.float64) \
+            if isinstance(prices, pd.DataFrame) else prices.values
+        results = [
+            _pair_stats(values[:, i], values[:, j], a, b, corr, adf_alpha)
+            for i, j, a, b, corr in candidates
+        ]
+    else:
+        results = _screen_parallel(prices, candidates, adf_alpha, n_jobs)
 
     df = pd.DataFrame(results)
     if df.empty:
@@ -171,6 +758,34 @@ def select_pairs(prices: pd.DataFrame,
     return selected
 
 
+def _screen_parallel(prices, candidates: list, adf_alpha: float, n_jobs: int) -> list:
+    """
+    Spread candidate chunks over a process pool sharing one copy of the
+    price matrix: a shared-memory block for a DataFrame, the memory-mapped
+    file for a ``PriceStore``. Chunks are returned in submission order.
+    """
+    size = -(-len(candidates) // (n_jobs * 4))
+    chunks = [candidates[k:k + size] for k in range(0, len(candidates), size)]
+
+    def screen(initializer, initargs):
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=initializer,
+                                 initargs=initargs) as pool:
+            parts = pool.map(_screen_chunk, chunks, [adf_alpha] * len(chunks))
+            return [row for part in parts for row in part]
+
+    if not isinstance(prices, pd.DataFrame):
+        return screen(_attach_store, (prices,))
+
+    values = prices.to_numpy(dtype=np.float64)
+    shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+    try:
+        np.ndarray(values.shape, dtype=np.float64, buffer=shm.buf)[:] = values
+        return screen(_attach_prices, (shm.name, values.shape))
+    finally:
+        shm.close()
+        shm.unlink()
+
+
 def selected_pair(data: pd.DataFrame, asset1: str, asset2: str) -> pd.DataFrame:
     """
     Extract a clean two-asset price series for a chosen pair.
@@ -1,9 +1,220 @@
 from libraries import *
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
 
-def clean_data(activos, intervalo: str = "15y") -> pd.DataFrame:
+TRADING_DAYS = 252
+TRADING_HOURS = 6.5
+
+
+def periods_per_year(interval: str = "1d") -> float:
+    """
+    Number of bars in a trading year for a bar interval in Yahoo notation
+    ("1m", "5m", "1h", "1d", "1wk", "1mo", ...), assuming 252 sessions of
+    6.5 hours. Use it as ``config(periods_per_year=...)`` for intraday data.
+
+    Returns
+    -------
+    float
+        Bars per year (252 for "1d", 98,280 for "1m").
     """
-    Download and preprocess daily closing prices for one or multiple tickers.
+    m = re.match(r"^\s*(\d+)\s*(m|h|d|wk|mo)\s*$", interval.lower())
+    if not m:
+        raise ValueError(
+            "Interval must follow the format '<int><unit>' with units in {m,h,d,wk,mo}")
+    n, u = int(m.group(1)), m.group(2)
+    per_year = {
+        "m": TRADING_DAYS * TRADING_HOURS * 60,
+        "h": TRADING_DAYS * TRADING_HOURS,
+        "d": TRADING_DAYS,
+        "wk": 52,
+        "mo": 12,
+    }[u]
+    return per_year / n
+
+
+def _download_close(ticker: str, start, end, interval: str = "1d") -> pd.Series:
+    """
+    Download closing prices for one ticker from Yahoo Finance.
+
+    Uses ``Ticker.history`` rather than ``yf.download`` because the latter
+    keeps module-level state and is not safe to call from several threads.
+
+    Parameters
+    ----------
+    ticker : str
+        Ticker to fetch.
+    start, end : datetime.date
+        Date range, end exclusive.
+    interval : str
+        Bar size ("1d", "1h", "1m", ...). Yahoo only serves the last 60
+        days of intraday bars (7 days for "1m").
+
+    Returns
+    -------
+    pd.Series
+        Closing prices named after the ticker (empty if unavailable).
+    """
+    df = yf.Ticker(ticker).history(
+        start=start,
+        end=end,
+        interval=interval,
+        actions=False,
+        auto_adjust=False,
+        raise_errors=True
+    )
+    if df is None or df.empty:
+        return pd.Series(dtype=float, name=ticker)
+
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = df.columns.get_level_values(0)
+    df.index = df.index.tz_localize(None)
+
+    if "Close" not in df.columns or df["Close"].isna().all():
+        if "Adj Close" in df.columns:
+            df["Close"] = df["Adj Close"]
+        elif all(c in df.columns for c in ["Open", "High", "Low"]):
+            df["Close"] = df[["Open", "High", "Low"]].mean(axis=1)
+
+    return df["Close"].dropna().rename(ticker)
+
+
+class PriceCache:
+    """
+    On-disk cache of closes per ticker with incremental refresh.
+
+    Each ticker is stored as ``<TICKER>.csv`` (``<TICKER>_<interval>.csv``
+    for bars other than "1d") together with a ``.json`` sidecar recording
+    the date range already requested.
+    Later calls only fetch the part of the range that is not covered (the
+    tail is refetched from the last cached bar, which may have been partial)
+    and otherwise read from disk. Fetches that return no data are neither
+    saved nor counted as covered, so they are retried on the next call.
+
+    Attributes
+    ----------
+    path : str
+        Cache directory.
+    fetch : callable
+        ``fetch(ticker, start, end) -> pd.Series`` of closes, end exclusive.
+        Defaults to Yahoo Finance; pass a local stand-in for offline runs.
+    interval : str
+        Bar size of the cached series.
+    """
+
+    def __init__(self, path: str = ".cache/prices", fetch=None, interval: str = "1d"):
+        self.path = path
+        self.interval = interval
+        if fetch is None:
+            fetch = partial(_download_close, interval=interval)
+        self.fetch = fetch
+        os.makedirs(path, exist_ok=True)
+
+    def get(self, ticker: str, start, end) -> pd.Series:
+        """
+        Closing prices for ``ticker`` in [start, end), fetching only what is
+        missing from the cache.
+
+        Returns
+        -------
+        pd.Series
+            Closing prices named after the ticker.
+        """
+        data, covered = self._load(ticker)
+        if data is None:
+            data = self.fetch(ticker, start, end)
+            if data is None or data.empty:
+                # nothing is cached, so a later call fetches again
+                return pd.Series(dtype=float, name=ticker)
+            lo, hi = start, end
+            changed = True
+        else:
+            lo, hi = covered
+            changed = False
+            parts = [data]
+            if start < lo:
+                head = self.fetch(ticker, start, lo)
+                if head is not None and not head.empty:
+                    parts.insert(0, head)
+                    lo, changed = start, True
+            if end > hi:
+                tail_start = data.index[-1].date() if len(data) else hi
+                tail = self.fetch(ticker, tail_start, end)
+                if tail is not None and not tail.empty:
+                    parts.append(tail)
+                    hi, changed = end, True
+            if changed:
+                data = pd.concat([p for p in parts if not p.empty])
+                data = data[~data.index.duplicated(keep="last")].sort_index()
+
+        if changed:
+            self._save(ticker, data, lo, hi)
+
+        mask = (data.index >= pd.Timestamp(start)) & (data.index < pd.Timestamp(end))
+        return data[mask].rename(ticker)
+
+    def _files(self, ticker: str) -> tuple[str, str]:
+        name = ticker if self.interval == "1d" else f"{ticker}_{self.interval}"
+        base = os.path.join(self.path, name)
+        return base + ".csv", base + ".json"
+
+    def _load(self, ticker: str):
+        csv_path, meta_path = self._files(ticker)
+        if not (os.path.exists(csv_path) and os.path.exists(meta_path)):
+            return None, None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        data = pd.read_csv(csv_path, index_col=0, parse_dates=True).iloc[:, 0]
+        covered = (dt.date.fromisoformat(meta["start"]),
+                   dt.date.fromisoformat(meta["end"]))
+        return data, covered
+
+    def _save(self, ticker: str, data: pd.Series, start, end):
+        csv_path, meta_path = self._files(ticker)
+        data.rename_axis("Date").rename("Close").to_csv(csv_path)
+        with open(meta_path, "w") as f:
+            json.dump({"start": start.isoformat(), "end": end.isoformat()}, f)
+
+
+def _fetch_with_retry(fetch, ticker: str, start, end,
+                      retries: int, backoff: float) -> tuple:
+    """
+    Call ``fetch`` until it returns data, sleeping ``backoff * 2**attempt``
+    seconds between attempts.
+
+    Returns
+    -------
+    tuple
+        (closing prices, empty if every attempt failed;
+         reason of the last failure, None on success)
+    """
+    reason = "no data"
+    for attempt in range(retries + 1):
+        try:
+            close = fetch(ticker, start, end)
+            if close is not None and not close.empty:
+                return close, None
+            reason = "no data"
+        except Exception as e:
+            reason = f"{type(e).__name__}: {e}"
+        if attempt < retries:
+            time.sleep(backoff * 2 ** attempt)
+    return pd.Series(dtype=float, name=ticker), reason
+
+
+def clean_data(activos, intervalo: str = "15y", cache: PriceCache = None,
+               fetch=None, max_workers: int = 8, retries: int = 2,
+               backoff: float = 0.5, interval: str = "1d") -> pd.DataFrame:
+    """
+    Download and preprocess closing prices for one or multiple tickers.
+
+    Tickers are fetched concurrently on a bounded thread pool, each with its
+    own retry and exponential backoff. Tickers that return no data are
+    skipped and reported with a warning and in ``attrs["skipped"]``, a dict
+    mapping each to the reason of its last failed attempt (the exception,
+    or "no data").
 
     Parameters
     ----------
@@ -11,6 +222,22 @@ def clean_data(activos, intervalo: str = "15y") -> pd.DataFrame:
         Tickers to fetch.
     intervalo : str
         Time range in compact notation (e.g., "10y", "6m").
+    cache : PriceCache, optional
+        Serve prices from a local cache, fetching only missing ranges.
+    fetch : callable, optional
+        ``fetch(ticker, start, end) -> pd.Series`` used when no cache is
+        given. Defaults to Yahoo Finance.
+    max_workers : int
+        Maximum concurrent downloads.
+    retries : int
+        Extra attempts per ticker after a failure or empty result.
+    backoff : float
+        Base delay in seconds between attempts.
+    interval : str
+        Bar size ("1d", "1h", "1m", ...). A custom ``fetch`` is called with
+        ``interval=`` for bars other than "1d", and a ``cache`` must hold
+        the same interval. Annualize the results with
+        ``periods_per_year(interval)``.
 
     Returns
     -------
@@ -33,40 +260,39 @@ def clean_data(activos, intervalo: str = "15y") -> pd.DataFrame:
     start = dt.date.today() - relativedelta(**{delta: int(n)})
     end = dt.date.today() + dt.timedelta(days=1)
 
-    datos_validos = {}
-    for t in tickers:
-        df = yf.download(
-            t,
-            start=start,
-            end=end,
-            interval="1d",
-            progress=False,
-            auto_adjust=False
-        )
-        if df is None or df.empty:
-            continue
-
-        if isinstance(df.columns, pd.MultiIndex):
-            df.columns = df.columns.get_level_values(0)
-
-        if "Close" not in df.columns or df["Close"].isna().all():
-            if "Adj Close" in df.columns:
-                df["Close"] = df["Adj Close"]
-            elif all(c in df.columns for c in ["Open", "High", "Low"]):
-                df["Close"] = df[["Open", "High", "Low"]].mean(axis=1)
-
-        df = df[["Close"]].dropna()
-        if not df.empty:
-            df = df.rename(columns={"Close": t})
-            datos_validos[t] = df
+    if cache is not None:
+        if cache.interval != interval:
+            raise ValueError(f"cache holds {cache.interval!r} bars, not {interval!r}")
+        fetch = cache.get
+    elif fetch is None:
+        fetch = partial(_download_close, interval=interval)
+    elif interval != "1d":
+        fetch = partial(fetch, interval=interval)
+
+    results = []
+    if tickers:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(tickers))) as pool:
+            results = list(pool.map(
+                lambda t: _fetch_with_retry(fetch, t, start, end, retries, backoff),
+                tickers))
+
+    datos_validos = [c.rename(t) for t, (c, _) in zip(tickers, results) if not c.empty]
+    skipped = {t: reason for t, (c, reason) in zip(tickers, results) if c.empty}
+    if skipped:
+        warnings.warn("No data downloaded for: " + ", ".join(
+            f"{t} ({reason})" for t, reason in skipped.items()))
 
     if not datos_validos:
-        return pd.DataFrame()
+        combined = pd.DataFrame()
+        combined.attrs["skipped"] = skipped
+        return combined
 
-    combined = pd.concat(datos_validos.values(), axis=1)
+    combined = pd.concat(datos_validos, axis=1)
     combined.index.name = "Date"
     combined.sort_index(inplace=True)
-    return combined.dropna(how="any")
+    combined = combined.dropna(how="any")
+    combined.attrs["skipped"] = skipped
+    return combined
 
 
 def dataset_split(data: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
@@ -92,3 +318,87 @@ def dataset_split(data: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame, pd.Da
     val_data = data[train_size + test_size:]
 
     return train_data, test_data, val_data
+
+
+def walk_forward_splits(data: pd.DataFrame, train_size: int, test_size: int,
+                        anchored: bool = False, step: int = None) -> list:
+    """
+    Generate chronological walk-forward folds.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Full price matrix.
+    train_size : int
+        Bars in each training window (the first window when anchored).
+    test_size : int
+        Bars in each out-of-sample window.
+    anchored : bool
+        If True every training window starts at the first bar (expanding);
+        otherwise it rolls forward with the test window.
+    step : int, optional
+        Bars between consecutive folds. Defaults to ``test_size``, so test
+        windows tile the sample without overlap.
+
+    Returns
+    -------
+    list
+        [(train, test), ...] in chronological order.
+    """
+    if train_size <= 0 or test_size <= 0:
+        raise ValueError("train_size and test_size must be positive")
+    step = test_size if step is None else step
+
+    folds = []
+    start = 0
+    while start + train_size + test_size <= len(data):
+        train_start = 0 if anchored else start
+        train = data[train_start:start + train_size]
+        test = data[start + train_size:start + train_size + test_size]
+        folds.append((train, test))
+        start += step
+    return folds
+
+
+def iter_chunks(source, chunksize: int = 1_000_000, columns=None):
+    """
+    Yield a price history in consecutive chunks of at most ``chunksize``
+    bars, so intraday histories of tens of millions of rows can be
+    processed (e.g. by ``backtest_stream``) with memory bounded by the
+    chunk size.
+
+    Parameters
+    ----------
+    source : str, pd.DataFrame or iterable
+        Path to a CSV file with the timestamps in its first column (read
+        lazily with ``pd.read_csv(chunksize=...)``), a DataFrame (sliced
+        into views) or an iterable of DataFrames (passed through).
+    chunksize : int
+        Maximum bars per chunk.
+    columns : list, optional
+        Columns to keep, in order (e.g. the two legs of a pair).
+
+    Yields
+    ------
+    pd.DataFrame
+        Chunks in chronological order, rows with missing prices dropped.
+    """
+    if chunksize <= 0:
+        raise ValueError("chunksize must be positive")
+
+    if isinstance(source, (str, os.PathLike)):
+        header = pd.read_csv(source, nrows=0).columns
+        keep = list(header[1:]) if columns is None else list(columns)
+        reader = pd.read_csv(source, index_col=0, parse_dates=True, chunksize=chunksize,
+                             usecols=[header[0], *keep],
+                             dtype=dict.fromkeys(keep, np.float64))
+        with reader:
+            for chunk in reader:
+                yield chunk[keep].dropna(how="any")
+    elif isinstance(source, pd.DataFrame):
+        data = source if columns is None else source[list(columns)]
+        for start in range(0, len(data), chunksize):
+            yield data.iloc[start:start + chunksize].dropna(how="any")
+    else:
+        for chunk in source:
+            yield chunk if columns is None else chunk[list(columns)]
@@ -0,0 +1,323 @@
+from libraries import *
+import heapq
+import math
+from classes import config, TradeLedger
+from signals import decide
+
+BUY, SELL = 1, -1
+OPEN, CLOSE = 0, 1
+
+
+@dataclass
+class ExecutionModel:
+    """
+    Fill model of the execution layer: per-leg slippage, partial fills and
+    an order-to-fill delay.
+
+    Commission (``cfg.COM``) is charged on every fill, including the long
+    leg of an entry, which the close-price loop of ``backtest_signals``
+    never debits; with ``COM > 0`` a frictionless model therefore ends with
+    less cash than ``execution=None``, and the two agree exactly only at
+    ``COM = 0``.
+
+    ``ExecutionSimulator`` only calls ``fill_price`` and ``fill_quantity``,
+    so other models (spread- or volume-dependent costs, random fills) are
+    subclasses overriding them.
+
+    Attributes
+    ----------
+    slippage_bps : float
+        Adverse price move of every fill in basis points: buys fill at
+        ``px * (1 + s)`` and sells at ``px * (1 - s)``.
+    delay : int
+        Bars between the order and its first fill; 0 fills on the signal
+        bar, as the close-price loop of ``backtest_signals`` does.
+    fill_ratio : float
+        Largest fraction of an order's quantity filled per bar (at least
+        one share); the rest is carried to the next bar. 1 fills at once.
+    """
+    slippage_bps: float = 0.0
+    delay: int = 0
+    fill_ratio: float = 1.0
+
+    def __post_init__(self):
+        if self.slippage_bps < 0:
+            raise ValueError("slippage_bps must be non-negative")
+        if self.delay < 0 or int(self.delay) != self.delay:
+            raise ValueError("delay must be a non-negative number of bars")
+        if not 0 < self.fill_ratio <= 1:
+            raise ValueError("fill_ratio must be in (0, 1]")
+
+    def fill_price(self, price: float, side: int) -> float:
+        """Price paid (``side`` = BUY) or received (SELL) for ``price``."""
+        return price * (1.0 + side * self.slippage_bps * 1e-4)
+
+    def fill_quantity(self, quantity: float, remaining: float) -> float:
+        """Shares filled this bar for an order of ``quantity`` shares."""
+        if self.fill_ratio >= 1:
+            return remaining
+        return min(remaining, max(1.0, math.floor(quantity * self.fill_ratio)))
+
+
+class Order:
+    """
+    Working order of the execution layer.
+
+    Attributes
+    ----------
+    ticker : int
+        ``TradeLedger`` ticker code.
+    side : int
+        BUY or SELL.
+    action : int
+        OPEN a position or CLOSE one.
+    quantity : float
+        Shares ordered.
+    remaining : float
+        Shares not filled yet (0 once filled or cancelled).
+    bar : int
+        Bar at which the order was submitted.
+    """
+    __slots__ = ("ticker", "side", "action", "quantity", "remaining", "bar")
+
+    def __init__(self, ticker, side, action, quantity, bar):
+        self.ticker = ticker
+        self.side = side
+        self.action = action
+        self.quantity = quantity
+        self.remaining = quantity
+        self.bar = bar
+
+
+class ExecutionSimulator:
+    """
+    Event queue turning orders into fills against a ``TradeLedger``.
+
+    ``submit`` schedules an order at its due bar (submission bar plus
+    ``model.delay``) in a heap keyed by (bar, sequence); ``process`` pops
+    the orders due at the current bar and fills them at that bar's prices
+    through the model, requeueing the unfilled rest of a partial fill for
+    the next bar. Cancelled orders are dropped lazily when popped.
+
+    Every fill, commission and slippage moves ``cash`` here, so a strategy
+    loop only submits and cancels orders.
+
+    Attributes
+    ----------
+    ledger : TradeLedger
+        Positions and closed trades.
+    model : ExecutionModel
+        Fill prices and quantities.
+    com_rate : float
+        Commission per unit of traded value.
+    cash : float
+        Cash balance.
+    commission : float
+        Commissions paid.
+    slippage : float
+        Value lost to slippage against the bar prices.
+    n_fills : int
+        Number of fills.
+    """
+    __slots__ = ("ledger", "model", "com_rate", "cash", "commission", "slippage",
+                 "n_fills", "_queue", "_seq")
+
+    def __init__(self, ledger, cash: float, model=None, com_rate: float = 0.0):
+        self.ledger = ledger
+        self.model = ExecutionModel() if model is None else model
+        self.com_rate = com_rate
+        self.cash = cash
+        self.commission = 0.0
+        self.slippage = 0.0
+        self.n_fills = 0
+        self._queue = []
+        self._seq = 0
+
+    def _push(self, bar: int, order: Order):
+        heapq.heappush(self._queue, (bar, self._seq, order))
+        self._seq += 1
+
+    def submit(self, ticker: int, side: int, action: int, quantity: float,
+               t: int) -> Order:
+        """Queue an order placed at bar ``t``."""
+        order = Order(ticker, side, action, quantity, t)
+        self._push(t + self.model.delay, order)
+        return order
+
+    def pending(self, action=None) -> bool:
+        """Whether any order (of ``action``, if given) is still working."""
+        if not self._queue:
+            return False
+        return any(o.remaining > 0 and (action is None or o.action == action)
+                   for _, _, o in self._queue)
+
+    def cancel(self, action=None) -> int:
+        """Cancel the working orders (of ``action``, if given); returns how many."""
+        n = 0
+        for _, _, o in self._queue:
+            if o.remaining > 0 and (action is None or o.action == action):
+                o.remaining = 0.0
+                n += 1
+        return n
+
+    def process(self, t: int, prices):
+        """Fill the orders due at bar ``t`` at ``prices`` (indexed by ticker code)."""
+        queue = self._queue
+        while queue and queue[0][0] <= t:
+            _, _, order = heapq.heappop(queue)
+            if order.remaining > 0:
+                self._fill(order, t, prices[order.ticker])
+                if order.remaining > 0:
+                    self._push(t + 1, order)
+
+    def _fill(self, order: Order, t: int, price: float):
+        ledger = self.ledger
+        n = self.model.fill_quantity(order.quantity, order.remaining)
+        px = self.model.fill_price(price, order.side)
+
+        if order.action == OPEN:
+            side = TradeLedger.LONG if order.side == BUY else TradeLedger.SHORT
+            slot = ledger.find(order.ticker, side)
+            if slot < 0:
+                ledger.open(order.ticker, side, n, px, t)
+            else:
+                ledger.add(slot, n, px)
+            com = n * px * self.com_rate
+            self.cash -= (n * px if side == TradeLedger.LONG else 0.0) + com
+        else:
+            side = TradeLedger.SHORT if order.side == BUY else TradeLedger.LONG
+            slot = ledger.find(order.ticker, side)
+            if slot < 0:
+                order.remaining = 0.0
+                return
+            flow, com, _ = ledger.close(slot, px, t, self.com_rate, n)
+            self.cash += flow
+
+        order.remaining -= n
+        self.commission += com
+        self.slippage += abs(px - price) * n
+        self.n_fills += 1
+
+
+def execute_signals(Y: np.ndarray, X: np.ndarray, dates, beta: np.ndarray,
+                    z: np.ndarray, allow: np.ndarray, initial_cash=None,
+                    cfg=config, model=None, profiler=None):
+    """
+    ``backtest_signals`` with the trades routed through an
+    ``ExecutionSimulator``.
+
+    The signals are unchanged: ``decide`` on each bar, sized with
+    ``cfg.INVEST`` of the current cash and the same cash check, but an
+    entry submits one BUY and one SELL order of ``n`` shares and an exit
+    cancels working entry orders and submits orders closing every open
+    leg. A spread counts as in position while its entry orders work, and
+    borrow accrues on the filled short shares.
+
+    The costs differ: every fill pays commission, including the long leg
+    of an entry, which ``backtest_signals`` does not charge. Results match
+    ``backtest_signals`` exactly only with ``cfg.COM = 0`` and a
+    frictionless model (no slippage or delay, full fills).
+
+    Parameters
+    ----------
+    Y, X, dates, beta, z, allow, initial_cash, cfg :
+        As in ``backtest_signals``.
+    model : ExecutionModel, optional
+        Slippage, delay and partial fills (default: immediate full fills at
+        the bar prices).
+    profiler : StageProfiler, optional
+        Charges loop time to "borrow", "orders", "fills" and "mtm".
+
+    Returns
+    -------
+    tuple
+        Same 10-tuple as ``backtest``; ``n_sell`` counts the leg orders
+        sent to close positions.
+    """
+    cash = cfg.capital if initial_cash is None else initial_cash
+    COM = cfg.COM
+    INVEST = cfg.INVEST
+    BR_bar = cfg.BR / cfg.periods_per_year
+
+    ledger = TradeLedger(dates)
+    sim = ExecutionSimulator(ledger, cash, model, COM)
+    Y_, X_ = TradeLedger.Y, TradeLedger.X
+    equity = []
+
+    buy = sell = hold = 0
+    total_borrow_cost = 0.0
+    prof = profiler
+
+    for i, (y, x, b, zt, ok) in enumerate(zip(Y.tolist(), X.tolist(), beta.tolist(),
+                                              z.tolist(), allow.tolist())):
+        prices = (y, x)
+        if prof is not None:
+            t = prof.start()
+
+        if zt != zt:
+            sim.process(i, prices)
+            equity.append(ledger.value(sim.cash, prices))
+            if prof is not None:
+                prof.add("mtm", t)
+            continue
+
+        working = sim.pending(OPEN)
+        action = decide(zt, ok, ledger.n_open > 0 or working, cfg)
+
+        if ledger.n_open:
+            bar_cost = ledger.short_exposure(prices) * BR_bar
+            sim.cash -= bar_cost
+            total_borrow_cost += bar_cost
+            if prof is not None:
+                t = prof.add("borrow", t)
+
+        if action == "STOP" or action == "EXIT":
+            if not sim.pending(CLOSE):
+                if working:
+                    sim.cancel(OPEN)
+                for ticker, side, n in ledger.open_legs():
+                    sim.submit(ticker, SELL if side == TradeLedger.LONG else BUY,
+                               CLOSE, n, i)
+                    sell += 1
+
+        elif action == "SHORT_SPREAD" or action == "LONG_SPREAD":
+            n = int(sim.cash * INVEST / (abs(y) + abs(b * x)))
+            if n > 0:
+                long_, short = (X_, Y_) if action == "SHORT_SPREAD" else (Y_, X_)
+                if sim.cash >= n * prices[long_] + n * prices[short] * COM:
+                    sim.submit(long_, BUY, OPEN, n, i)
+                    sim.submit(short, SELL, OPEN, n, i)
+                    buy += 1
+
+        elif action == "HOLD":
+            hold += 1
+
+        if prof is not None:
+            t = prof.add("orders", t)
+
+        sim.process(i, prices)
+        if prof is not None:
+            t = prof.add("fills", t)
+
+        equity.append(ledger.value(sim.cash, prices))
+        if prof is not None:
+            prof.add("mtm", t)
+
+    equity = pd.Series(equity, index=dates[:len(equity)])
+    win_rate = (
+        np.count_nonzero(ledger.profits > 0) / len(ledger)
+        if len(ledger) else 0
+    )
+
+    return (
+        equity,
+        sim.cash,
+        win_rate,
+        buy,
+        sell,
+        hold,
+        len(ledger),
+        ledger,
+        total_borrow_cost,
+        sim.commission,
+    )
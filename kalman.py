@@ -1,4 +1,5 @@
-from libraries import np
+import math
+import numpy as np
 
 
 class KalmanFilter:
@@ -19,15 +20,20 @@ class KalmanFilter:
         Current covariance estimate.
     w_t : np.ndarray
         Current state vector.
+    joseph : bool
+        Use the Joseph-form covariance update (I-KH)P(I-KH)' + KRK'.
     """
 
-    def __init__(self, n, R=1.0, F=None, Q=None, P0=None, w0=None):
+    def __init__(self, n, R=1.0, F=None, Q=None, P0=None, w0=None, joseph=False):
         self.n = n
         self.R = R
         self.F = np.eye(n) if F is None else F
         self.Q = np.eye(n)*1e-3 if Q is None else Q
-        self.P_t = np.eye(n)*1e-2 if P0 is None else P0
-        self.w_t = np.zeros(n) if w0 is None else w0
+        self.P_t = np.eye(n)*1e-2 if P0 is None else np.array(P0, dtype=float)
+        self.w_t = np.zeros(n) if w0 is None else np.array(w0, dtype=float)
+        self.joseph = joseph
+        self._identity_F = F is None or np.array_equal(F, np.eye(n))
+        self._q = np.asarray(self.Q, dtype=float).ravel().tolist()
 
     def predict(self):
         """
@@ -38,6 +44,8 @@ class KalmanFilter:
         tuple
             (predicted_state, predicted_covariance)
         """
+        if self._identity_F:
+            return self.w_t.copy(), self.P_t + self.Q
         w_pred = self.F @ self.w_t
         P_pred = self.F @ self.P_t @ self.F.T + self.Q
         return w_pred, P_pred
@@ -62,16 +70,297 @@ class KalmanFilter:
         tuple
             (updated_state, updated_covariance)
         """
-        H = x.reshape(1, -1)
-        S = H @ P_pred @ H.T + self.R
-        K = P_pred @ H.T @ np.linalg.inv(S)
-        innovation = (y - H @ w_pred).item()
-        w_upd = w_pred + (K.flatten() * innovation)
-        P_upd = (np.eye(self.n) - K @ H) @ P_pred
+        if self.n <= 2:
+            w_upd = np.array(w_pred, dtype=float)
+            P_upd = np.array(P_pred, dtype=float)
+            self._scalar_update(np.ravel(x).tolist(), y, w_upd, P_upd)
+        else:
+            H = x.reshape(1, -1)
+            S = H @ P_pred @ H.T + self.R
+            K = P_pred @ H.T @ np.linalg.inv(S)
+            innovation = (y - H @ w_pred).item()
+            w_upd = w_pred + (K.flatten() * innovation)
+            A = np.eye(self.n) - K @ H
+            P_upd = A @ P_pred
+            if self.joseph:
+                P_upd = P_upd @ A.T + self.R * (K @ K.T)
         self.w_t = w_upd
         self.P_t = P_upd
         return w_upd, P_upd
 
+    def step(self, x, y):
+        """
+        Predict and update in one call, in place.
+
+        For n <= 2 with identity F this uses closed-form scalar arithmetic and
+        writes into ``w_t`` and ``P_t`` without allocating arrays; other
+        configurations fall back to ``predict`` + ``update``.
+
+        Parameters
+        ----------
+        x : sequence of float
+            Observation vector.
+        y : float
+            Observed value.
+
+        Returns
+        -------
+        np.ndarray
+            Updated state ``w_t`` (the live array, mutated on the next step).
+        """
+        if self.n > 2 or not self._identity_F:
+            w_pred, P_pred = self.predict()
+            return self.update(np.asarray(x, dtype=float), y, w_pred, P_pred)[0]
+        P = self.P_t
+        if self.n == 1:
+            P[0, 0] += self._q[0]
+        else:
+            q00, q01, q10, q11 = self._q
+            P[0, 0] += q00
+            P[0, 1] += q01
+            P[1, 0] += q10
+            P[1, 1] += q11
+        self._scalar_update(x, y, self.w_t, P)
+        return self.w_t
+
+    def _scalar_update(self, x, y, w, P):
+        """Closed-form measurement update of ``w`` and ``P`` in place for n <= 2."""
+        R = self.R
+        if self.n == 1:
+            x0 = x[0]
+            p = P[0, 0]
+            s = x0 * p * x0 + R
+            k = p * x0 * (1.0 / s)
+            w[0] = w[0] + k * (y - x0 * w[0])
+            a = 1.0 - k * x0
+            P[0, 0] = a * p * a + R * k * k if self.joseph else a * p
+            return
+
+        x0, x1 = x[0], x[1]
+        p00, p01, p10, p11 = P[0, 0], P[0, 1], P[1, 0], P[1, 1]
+        w0, w1 = w[0], w[1]
+
+        s = (x0 * p00 + x1 * p10) * x0 + (x0 * p01 + x1 * p11) * x1 + R
+        inv_s = 1.0 / s
+        k0 = (p00 * x0 + p01 * x1) * inv_s
+        k1 = (p10 * x0 + p11 * x1) * inv_s
+        e = y - (x0 * w0 + x1 * w1)
+        w[0] = w0 + k0 * e
+        w[1] = w1 + k1 * e
+
+        a00 = 1.0 - k0 * x0
+        a01 = -k0 * x1
+        a10 = -k1 * x0
+        a11 = 1.0 - k1 * x1
+        m00 = a00 * p00 + a01 * p10
+        m01 = a00 * p01 + a01 * p11
+        m10 = a10 * p00 + a11 * p10
+        m11 = a10 * p01 + a11 * p11
+        if self.joseph:
+            rk0, rk1 = R * k0, R * k1
+            P[0, 0] = m00 * a00 + m01 * a01 + rk0 * k0
+            P[0, 1] = m00 * a10 + m01 * a11 + rk0 * k1
+            P[1, 0] = m10 * a00 + m11 * a01 + rk1 * k0
+            P[1, 1] = m10 * a10 + m11 * a11 + rk1 * k1
+        else:
+            P[0, 0] = m00
+            P[0, 1] = m01
+            P[1, 0] = m10
+            P[1, 1] = m11
+
+
+class BatchKalmanFilter:
+    """
+    Vectorized Kalman Filter advancing many independent pairs in lockstep.
+
+    Every pair shares the model structure of ``KalmanFilter`` (scalar
+    observation y = x·w + v), but holds its own state and covariance, so one
+    call advances all pairs with a handful of array operations.
+
+    Attributes
+    ----------
+    n_pairs : int
+        Number of filters stacked along the first axis.
+    n : int
+        Dimensionality of each state vector.
+    R : float or np.ndarray
+        Observation noise variance, scalar or one per pair.
+    F : np.ndarray
+        Transition matrix, shared (n, n) or per pair (n_pairs, n, n).
+    Q : np.ndarray
+        Process noise covariance, shared (n, n) or per pair (n_pairs, n, n).
+    P_t : np.ndarray
+        Current covariances, shape (n_pairs, n, n).
+    w_t : np.ndarray
+        Current states, shape (n_pairs, n).
+    joseph : bool
+        Use the Joseph-form covariance update.
+    """
+
+    def __init__(self, n_pairs, n, R=1.0, F=None, Q=None, P0=None, w0=None,
+                 joseph=False):
+        self.n_pairs = n_pairs
+        self.n = n
+        self.R = np.broadcast_to(np.asarray(R, dtype=float), (n_pairs,))
+        self.F = np.eye(n) if F is None else np.asarray(F, dtype=float)
+        self.Q = np.eye(n)*1e-3 if Q is None else np.asarray(Q, dtype=float)
+        P0 = np.eye(n)*1e-2 if P0 is None else P0
+        w0 = np.zeros(n) if w0 is None else w0
+        self.P_t = np.array(np.broadcast_to(P0, (n_pairs, n, n)), dtype=float)
+        self.w_t = np.array(np.broadcast_to(w0, (n_pairs, n)), dtype=float)
+        self.joseph = joseph
+        self._identity_F = F is None or bool(np.all(self.F == np.eye(n)))
+        self._eye = np.eye(n)
+
+    def predict(self):
+        """
+        Perform the prediction step for all pairs.
+
+        Returns
+        -------
+        tuple
+            (predicted_states, predicted_covariances)
+        """
+        if self._identity_F:
+            return self.w_t.copy(), self.P_t + self.Q
+        w_pred = (self.F @ self.w_t[:, :, None])[:, :, 0]
+        P_pred = self.F @ self.P_t @ np.swapaxes(self.F, -1, -2) + self.Q
+        return w_pred, P_pred
+
+    def update(self, x, y, w_pred, P_pred):
+        """
+        Update all pairs with one observation each.
+
+        Parameters
+        ----------
+        x : np.ndarray
+            Observation vectors, shape (n_pairs, n).
+        y : np.ndarray
+            Observed values, shape (n_pairs,).
+        w_pred : np.ndarray
+            Predicted states.
+        P_pred : np.ndarray
+            Predicted covariances.
+
+        Returns
+        -------
+        tuple
+            (updated_states, updated_covariances)
+        """
+        H = np.asarray(x, dtype=float)
+        PH = np.einsum('pij,pj->pi', P_pred, H)
+        S = np.einsum('pi,pi->p', PH, H) + self.R
+        K = PH * (1.0 / S)[:, None]
+        innovation = np.asarray(y, dtype=float) - np.einsum('pi,pi->p', H, w_pred)
+        w_upd = w_pred + K * innovation[:, None]
+        A = self._eye - K[:, :, None] * H[:, None, :]
+        P_upd = A @ P_pred
+        if self.joseph:
+            P_upd = (P_upd @ np.swapaxes(A, 1, 2)
+                     + self.R[:, None, None] * K[:, :, None] * K[:, None, :])
+        self.w_t = w_upd
+        self.P_t = P_upd
+        return w_upd, P_upd
+
+    def step(self, x, y):
+        """
+        Predict and update all pairs in one call.
+
+        Returns
+        -------
+        np.ndarray
+            Updated states, shape (n_pairs, n).
+        """
+        w_pred, P_pred = self.predict()
+        return self.update(x, y, w_pred, P_pred)[0]
+
+
+class RollingWindow:
+    """
+    Fixed-size ring buffer with O(1) rolling mean, standard deviation and
+    z-score.
+
+    Values are written twice into a buffer of length 2 * size, so the last
+    ``size`` observations are always available as one contiguous,
+    chronologically ordered view without copying. The mean and sum of
+    squared deviations are slid with Welford's update and resynchronized
+    exactly from the buffer every ``refresh`` pushes to bound drift.
+
+    Attributes
+    ----------
+    size : int
+        Window length.
+    count : int
+        Number of observations pushed so far.
+    refresh : int
+        Pushes between exact resynchronizations of the running moments
+        (defaults to ``size``, i.e. amortized O(1)).
+    """
+
+    def __init__(self, size, refresh=None):
+        self.size = size
+        self.count = 0
+        self.refresh = size if refresh is None else refresh
+        self._pos = 0
+        self._buf = np.zeros(2 * size)
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def push(self, value):
+        """Append one observation, evicting the oldest once full."""
+        value = float(value)
+        i = self._pos
+        if self.count < self.size:
+            n = self.count + 1
+            delta = value - self._mean
+            self._mean += delta / n
+            self._m2 += delta * (value - self._mean)
+        else:
+            old = self._buf[i]
+            mean = self._mean + (value - old) / self.size
+            self._m2 += (value - old) * (value - mean + old - self._mean)
+            self._mean = mean
+
+        self._buf[i] = value
+        self._buf[i + self.size] = value
+        self._pos = i + 1 if i + 1 < self.size else 0
+        self.count += 1
+
+        if self.count % self.refresh == 0:
+            recent = self.values
+            self._mean = float(np.mean(recent))
+            self._m2 = float(np.sum((recent - self._mean) ** 2))
+
+    @property
+    def full(self):
+        """True once ``size`` observations have been pushed."""
+        return self.count >= self.size
+
+    @property
+    def values(self):
+        """Chronological view of the last min(count, size) observations."""
+        end = self._pos + self.size
+        return self._buf[end - min(self.count, self.size):end]
+
+    def mean(self):
+        """Mean of the window."""
+        return self._mean
+
+    def std(self):
+        """Population standard deviation of the window (as ``np.std``)."""
+        n = min(self.count, self.size)
+        return math.sqrt(max(self._m2, 0.0) / n) if n else 0.0
+
+    def zscore(self, value=None, floor=1e-8):
+        """
+        Z-score of ``value`` (default: the latest observation) against the
+        window, using ``floor`` when the deviation is zero.
+        """
+        if value is None:
+            value = self._buf[self._pos + self.size - 1]
+        sd = self.std()
+        return (value - self._mean) / (sd if sd > 0 else floor)
+
 
 def compute_spread(y, x, beta):
     """
@@ -91,16 +380,23 @@ def compute_zscore(series, window):
 
     Parameters
     ----------
-    series : list or np.ndarray
-        Time series values.
+    series : list, np.ndarray or RollingWindow
+        Time series values. A ``RollingWindow`` is answered in O(1) from
+        its running moments.
     window : int
-        Rolling window size.
+        Rolling window size; must equal ``series.size`` for a
+        ``RollingWindow``.
 
     Returns
     -------
     float or None
         Z-score if enough data points are available, otherwise None.
     """
+    if isinstance(series, RollingWindow):
+        if window != series.size:
+            raise ValueError(
+                f"window ({window}) must match the RollingWindow size ({series.size})")
+        return series.zscore() if series.full else None
     if len(series) < window:
         return None
     mu = np.mean(series[-window:])
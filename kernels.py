@@ -0,0 +1,364 @@
+import math
+from libraries import np
+from cointegration import _tau_table
+
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+        """Stand-in for ``numba.njit`` that leaves the function interpreted."""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda f: f
+
+
+def _tau_args() -> tuple:
+    """MacKinnon coefficients for regression "c" as kernel arguments."""
+    lo, hi, star, small, large = _tau_table()
+    return (float(lo), float(hi), float(star),
+            np.array(small, dtype=np.float64), np.array(large, dtype=np.float64))
+
+
+def signal_state(window: int) -> tuple:
+    """
+    Fresh ``signal_kernel`` state: the filter/window scalars (w0, w1, p00,
+    p01, p10, p11, v, pv, pos, count, mean, m2) and the doubled ring buffer.
+    """
+    state = np.zeros(12)
+    state[2] = state[5] = state[7] = 0.01
+    return state, np.zeros(2 * window)
+
+
+@njit(cache=True)
+def _cholesky(A, L, k):
+    """In-place Cholesky of the leading k x k block of ``A``; False if not PD."""
+    for j in range(k):
+        s = A[j, j]
+        for i in range(j):
+            s -= L[j, i] * L[j, i]
+        if not s > 0.0:
+            return False
+        d = math.sqrt(s)
+        L[j, j] = d
+        for r in range(j + 1, k):
+            s = A[r, j]
+            for i in range(j):
+                s -= L[r, i] * L[j, i]
+            L[r, j] = s / d
+    return True
+
+
+@njit(cache=True)
+def _adf_pvalue(v, maxlag, S, A, L, row, lo, hi, star, small, large):
+    """
+    ADF (constant, AIC lag search) p-value of the levels ``v``, computed
+    from the cross-products of the regression rows like ``RollingADF``.
+    """
+    W = v.shape[0]
+    m = maxlag + 3
+
+    for a in range(m):
+        for b in range(m):
+            A[a, b] = 0.0
+    for t in range(W - 1, 0, -1):
+        row[0] = 1.0
+        row[1] = v[t - 1]
+        for j in range(1, maxlag + 1):
+            row[1 + j] = v[t - j] - v[t - j - 1] if t - j >= 1 else 0.0
+        row[m - 1] = v[t] - v[t - 1]
+        for a in range(m):
+            for b in range(a + 1):
+                A[a, b] += row[a] * row[b]
+        if t <= maxlag + 1:
+            for a in range(m):
+                for b in range(a + 1):
+                    S[t - 1, a, b] = A[a, b]
+                    S[t - 1, b, a] = A[a, b]
+
+    # AIC search on the common sample from one factor of S[maxlag]
+    if not _cholesky(S[maxlag], L, m):
+        return np.nan
+    nc = W - 1.0 - maxlag
+    const = nc * (math.log(2.0 * math.pi) - math.log(nc) + 1.0)
+    ssr = S[maxlag, m - 1, m - 1] - L[m - 1, 0] * L[m - 1, 0]
+    best, best_aic = 0, np.inf
+    for p in range(maxlag + 1):
+        ssr -= L[m - 1, p + 1] * L[m - 1, p + 1]
+        aic = nc * math.log(max(ssr, 1e-300)) + const + 2.0 * (p + 2)
+        if aic < best_aic:
+            best, best_aic = p, aic
+
+    # t-statistic of the level with the selected lag on its own sample
+    k = best + 2
+    idx = np.empty(k + 2, dtype=np.int64)
+    idx[0] = 0
+    for j in range(best):
+        idx[1 + j] = 2 + j
+    idx[k - 1] = 1
+    idx[k] = m - 1
+    for a in range(k + 1):
+        for b in range(k + 1):
+            A[a, b] = S[best, idx[a], idx[b]]
+    if not _cholesky(A, L, k + 1):
+        return np.nan
+    stat = L[k, k - 1] * math.sqrt(W - 1.0 - best - k) / L[k, k]
+
+    if stat > hi:
+        return 1.0
+    if stat < lo:
+        return 0.0
+    coefs = small if stat <= star else large
+    z = 0.0
+    for c in coefs:
+        z = z * stat + c
+    return 0.5 * math.erfc(-z / math.sqrt(2.0))
+
+
+@njit(cache=True)
+def signal_kernel(Y, X, window, maxlag, q, r, adf_alpha, lo, hi, star, small, large,
+                  state, buf):
+    """
+    Compiled equivalent of ``signal_paths``: hedge-ratio and spread Kalman
+    filters, rolling z-score and ADF gate over the last ``window`` spreads.
+
+    ``state`` and ``buf`` (see ``signal_state``) hold the filters and the
+    window; they are read at the start and updated in place, so a long
+    series can be processed in consecutive chunks.
+
+    Returns
+    -------
+    tuple
+        (beta, z, allow_entries) arrays; z is NaN during warm-up.
+    """
+    T = Y.shape[0]
+    beta_out = np.empty(T)
+    z_out = np.full(T, np.nan)
+    allow = np.zeros(T, dtype=np.bool_)
+
+    w0, w1, p00, p01, p10, p11, v, pv = (state[0], state[1], state[2], state[3],
+                                         state[4], state[5], state[6], state[7])
+    pos = int(state[8])
+    count = int(state[9])
+    mean = state[10]
+    m2 = state[11]
+
+    m = maxlag + 3
+    S = np.zeros((maxlag + 1, m, m))
+    A = np.zeros((m, m))
+    L = np.zeros((m, m))
+    row = np.zeros(m)
+
+    for t in range(T):
+        y = Y[t]
+        x0, x1 = 1.0, X[t]
+
+        # hedge ratio filter, as KalmanFilter._scalar_update with n=2
+        p00 += q
+        p11 += q
+        s = (x0 * p00 + x1 * p10) * x0 + (x0 * p01 + x1 * p11) * x1 + r
+        inv_s = 1.0 / s
+        k0 = (p00 * x0 + p01 * x1) * inv_s
+        k1 = (p10 * x0 + p11 * x1) * inv_s
+        e = y - (x0 * w0 + x1 * w1)
+        w0 = w0 + k0 * e
+        w1 = w1 + k1 * e
+        a00 = 1.0 - k0 * x0
+        a01 = -k0 * x1
+        a10 = -k1 * x0
+        a11 = 1.0 - k1 * x1
+        n00 = a00 * p00 + a01 * p10
+        n01 = a00 * p01 + a01 * p11
+        n10 = a10 * p00 + a11 * p10
+        n11 = a10 * p01 + a11 * p11
+        p00, p01, p10, p11 = n00, n01, n10, n11
+
+        beta = w1
+        beta_out[t] = beta
+        spread = y - beta * x1
+
+        # spread filter, n=1
+        pv += q
+        sv = x0 * pv * x0 + r
+        kv = pv * x0 * (1.0 / sv)
+        v = v + kv * (spread - x0 * v)
+        av = 1.0 - kv * x0
+        pv = av * pv
+
+        # RollingWindow.push
+        i = pos
+        if count < window:
+            nn = count + 1
+            delta = v - mean
+            mean += delta / nn
+            m2 += delta * (v - mean)
+        else:
+            old = buf[i]
+            new_mean = mean + (v - old) / window
+            m2 += (v - old) * (v - new_mean + old - mean)
+            mean = new_mean
+        buf[i] = v
+        buf[i + window] = v
+        pos = i + 1 if i + 1 < window else 0
+        count += 1
+        if count % window == 0:
+            recent = buf[pos:pos + window]
+            mean = np.mean(recent)
+            m2 = np.sum((recent - mean) ** 2)
+
+        if count < window:
+            continue
+
+        sd = math.sqrt(max(m2, 0.0) / window)
+        z_out[t] = (v - mean) / (sd if sd > 0 else 1e-6)
+        pvalue = _adf_pvalue(buf[pos:pos + window], maxlag, S, A, L, row,
+                             lo, hi, star, small, large)
+        allow[t] = pvalue <= adf_alpha
+
+    state[0], state[1], state[2], state[3] = w0, w1, p00, p01
+    state[4], state[5], state[6], state[7] = p10, p11, v, pv
+    state[8], state[9], state[10], state[11] = pos, count, mean, m2
+    return beta_out, z_out, allow
+
+
+@njit(cache=True)
+def trade_kernel(Y, X, beta, z, allow, cash, COM, INVEST, BR_bar,
+                 ENTRY_Z, EXIT_Z, STOP_Z, state, offset):
+    """
+    Compiled equivalent of the ``backtest_signals`` loop.
+
+    Ticker codes follow ``TradeLedger`` (0 = Y, 1 = X); a spread position is
+    one long leg and one short leg of ``n`` shares each. The open position
+    is read from ``state`` and written back to it, and bar numbers are
+    shifted by ``offset``, so consecutive chunks continue one backtest.
+
+    Returns
+    -------
+    tuple
+        (equity, cash, counts[buy, sell, hold, n_closed], costs[borrow,
+         commission], closed-leg arrays (ticker, side, n_shares, entry_price,
+         exit_price, entry_bar, exit_bar, profit), open-position state
+         (long ticker, n_shares, long entry, short entry, entry bar, or
+         n_shares = 0 when flat; the ``state`` array itself))
+    """
+    T = Y.shape[0]
+    equity = np.empty(T)
+    c_ticker = np.empty(2 * T, dtype=np.int8)
+    c_side = np.empty(2 * T, dtype=np.int8)
+    c_vals = np.empty((4, 2 * T))
+    c_bars = np.empty((2, 2 * T), dtype=np.int64)
+
+    buy = sell = hold = 0
+    n_closed = 0
+    borrow = 0.0
+    commission = 0.0
+
+    lt = int(state[0])         # ticker code of the long leg
+    n = state[1]               # shares per leg, 0 when flat
+    el = state[2]              # long entry price
+    es = state[3]              # short entry price
+    bar0 = int(state[4])
+
+    for t in range(T):
+        y = Y[t]
+        x = X[t]
+        zt = z[t]
+        pl = y if lt == 0 else x
+        ps = x if lt == 0 else y
+
+        if zt != zt:
+            equity[t] = cash + n * pl + (es - ps) * n if n > 0 else cash
+            continue
+
+        in_pos = n > 0
+        if in_pos and abs(zt) > STOP_Z:
+            action = 0                      # STOP
+        elif in_pos and abs(zt) < EXIT_Z:
+            action = 1                      # EXIT
+        elif allow[t] and not in_pos:
+            if zt > ENTRY_Z:
+                action = 2                  # SHORT_SPREAD
+            elif zt < -ENTRY_Z:
+                action = 3                  # LONG_SPREAD
+            else:
+                action = 4                  # WAIT
+        else:
+            action = 5                      # HOLD
+
+        if in_pos:
+            bar_cost = n * ps * BR_bar
+            cash -= bar_cost
+            borrow += bar_cost
+
+        if action <= 1:
+            com = n * pl * COM
+            profit = (pl - el) * n - com
+            cash += pl * n - com
+            commission += com
+            c_ticker[n_closed] = lt
+            c_side[n_closed] = 0
+            c_vals[0, n_closed] = n
+            c_vals[1, n_closed] = el
+            c_vals[2, n_closed] = pl
+            c_vals[3, n_closed] = profit
+            c_bars[0, n_closed] = bar0
+            c_bars[1, n_closed] = offset + t
+            n_closed += 1
+
+            com = n * ps * COM
+            profit = (es - ps) * n - com
+            cash += profit
+            commission += com
+            c_ticker[n_closed] = 1 - lt
+            c_side[n_closed] = 1
+            c_vals[0, n_closed] = n
+            c_vals[1, n_closed] = es
+            c_vals[2, n_closed] = ps
+            c_vals[3, n_closed] = profit
+            c_bars[0, n_closed] = bar0
+            c_bars[1, n_closed] = offset + t
+            n_closed += 1
+
+            sell += 2
+            n = 0.0
+
+        elif action == 2 or action == 3:
+            capital_to_use = cash * INVEST
+            shares = float(int(capital_to_use / (abs(y) + abs(beta[t] * x))))
+
+            if shares > 0:
+                comY = shares * y * COM
+                comX = shares * x * COM
+                if action == 2:
+                    cost, com_short = shares * x, comY
+                else:
+                    cost, com_short = shares * y, comX
+
+                if cash >= cost + com_short:
+                    cash -= cost
+                    cash -= com_short
+                    commission += (comY + comX)
+                    buy += 1
+                    n = shares
+                    lt = 1 if action == 2 else 0
+                    el = x if action == 2 else y
+                    es = y if action == 2 else x
+                    bar0 = offset + t
+
+        elif action == 5:
+            hold += 1
+
+        if n > 0:
+            pl = y if lt == 0 else x
+            ps = x if lt == 0 else y
+            equity[t] = cash + n * pl + (es - ps) * n
+        else:
+            equity[t] = cash
+
+    counts = np.array([buy, sell, hold, n_closed])
+    costs = np.array([borrow, commission])
+    state[0], state[1], state[2], state[3], state[4] = lt, n, el, es, bar0
+    return (equity, cash, counts, costs, c_ticker[:n_closed], c_side[:n_closed],
+            c_vals[:, :n_closed], c_bars[:, :n_closed], state)
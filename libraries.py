@@ -2,25 +2,13 @@
 import os
 import warnings
 import re, datetime as dt
+import importlib
 from dataclasses import dataclass
 
-# --- Third-party libraries: Data analysis ---
-import ta
+# --- Third-party libraries: Data analysis (core) ---
 import numpy as np
 import pandas as pd
-import scipy as sp
-import yfinance as yf
-import statsmodels.api as sm
-from statsmodels.tsa.stattools import adfuller
-from statsmodels.tsa.vector_ar.vecm import coint_johansen
-
-# --- Third-party libraries: Visualization ---
-import seaborn as sns
-import matplotlib.pyplot as plt
-import matplotlib.ticker as mtick
-from matplotlib.dates import relativedelta
-from IPython.display import display
-
+from dateutil.relativedelta import relativedelta
 
 # --- Type hints ---
 from typing import List
@@ -28,18 +16,6 @@ from itertools import combinations
 
 np.random.seed(42)
 
-plt.rcParams['figure.facecolor'] = 'lightgrey'
-plt.rcParams['figure.figsize'] = (12, 6)
-plt.rcParams['axes.grid'] = True
-plt.rcParams['grid.alpha'] = 0.5
-plt.rcParams['grid.linestyle'] = '--'
-plt.rcParams['axes.titleweight'] = 'bold'
-plt.rcParams['axes.titlesize'] = 16
-plt.rcParams['axes.labelsize'] = 12
-plt.rcParams['legend.frameon'] = True
-plt.rcParams['legend.facecolor'] = 'white'
-plt.rcParams['legend.edgecolor'] = 'black'
-
 # =============================
 # COLORS
 # =============================
@@ -48,7 +24,104 @@ BLUE_LIGHT  = "#5A78A1"
 BLUE_SOFT   = "#A9BBD6"
 RED_SOFT    = "#EA6767"
 
-sns.set_style("whitegrid")
+colors = ["cornflowerblue", "indianred", "darkseagreen", "plum", "dimgray"]
+
+
+# =============================
+# DEFERRED IMPORTS
+# =============================
+# Downloading, statistics and plotting packages cost seconds of import time
+# and hundreds of MB, so they are bound to placeholders that import the real
+# module on first attribute access. A worker that only runs the Kalman
+# filters or the backtest never loads them.
+
+_plotting_ready = False
+
+
+def _setup_plotting():
+    """Global plot style, applied the first time plt or sns is used."""
+    global _plotting_ready
+    if _plotting_ready:
+        return
+    _plotting_ready = True
+
+    import matplotlib.pyplot as _plt
+    import seaborn as _sns
+
+    _plt.rcParams['figure.facecolor'] = 'lightgrey'
+    _plt.rcParams['figure.figsize'] = (12, 6)
+    _plt.rcParams['axes.grid'] = True
+    _plt.rcParams['grid.alpha'] = 0.5
+    _plt.rcParams['grid.linestyle'] = '--'
+    _plt.rcParams['axes.titleweight'] = 'bold'
+    _plt.rcParams['axes.titlesize'] = 16
+    _plt.rcParams['axes.labelsize'] = 12
+    _plt.rcParams['legend.frameon'] = True
+    _plt.rcParams['legend.facecolor'] = 'white'
+    _plt.rcParams['legend.edgecolor'] = 'black'
+
+    _sns.set_style("whitegrid")
+
+
+class _LazyModule:
+    """
+    Placeholder for a module that is imported on first attribute access.
+
+    Attributes
+    ----------
+    name : str
+        Dotted module name.
+    setup : callable or None
+        Called once after the first import.
+    """
+    __slots__ = ("name", "setup", "_module")
+
+    def __init__(self, name, setup=None):
+        self.name = name
+        self.setup = setup
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            module = importlib.import_module(self.name)
+            if self.setup is not None:
+                self.setup()
+            self._module = module
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self.name}' ({state})>"
+
+
+# --- Third-party libraries: Data analysis (deferred) ---
+ta = _LazyModule("ta")
+sp = _LazyModule("scipy")
+yf = _LazyModule("yfinance")
+sm = _LazyModule("statsmodels.api")
+
+# --- Third-party libraries: Visualization (deferred) ---
+sns = _LazyModule("seaborn", _setup_plotting)
+plt = _LazyModule("matplotlib.pyplot", _setup_plotting)
+mtick = _LazyModule("matplotlib.ticker")
+
+
+def adfuller(*args, **kwargs):
+    """``statsmodels.tsa.stattools.adfuller``, imported on first call."""
+    from statsmodels.tsa.stattools import adfuller as _adfuller
+    return _adfuller(*args, **kwargs)
+
+
+def coint_johansen(*args, **kwargs):
+    """``statsmodels.tsa.vector_ar.vecm.coint_johansen``, imported on first call."""
+    from statsmodels.tsa.vector_ar.vecm import coint_johansen as _coint_johansen
+    return _coint_johansen(*args, **kwargs)
 
 
-colors = ["cornflowerblue", "indianred", "darkseagreen", "plum", "dimgray"]
\ No newline at end of file
+def display(*args, **kwargs):
+    """``IPython.display.display``, imported on first call."""
+    from IPython.display import display as _display
+    return _display(*args, **kwargs)
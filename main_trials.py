@@ -1,4 +1,4 @@
-from data_processing import clean_data, dataset_split
+from data_processing import PriceCache, clean_data, dataset_split
 from cointegration import select_pairs
 
 tickers = [
@@ -16,7 +16,7 @@ def cointegration():
     Load historical prices, extract the training portion, and compute
     cointegration statistics for all ticker combinations.
     """
-    data_pairs = clean_data(tickers, intervalo="15y")
+    data_pairs = clean_data(tickers, intervalo="15y", cache=PriceCache())
     train, _, _ = dataset_split(data_pairs)
     pairs = select_pairs(train, corr_threshold=0.6, adf_alpha=0.05)
     print("======== SELECTED PAIRS ========")
@@ -1,13 +1,27 @@
 from libraries import *
+import math
+from collections import deque
+from classes import config
+
+
+def _periods(periods_per_year) -> float:
+    """Bars per year, defaulting to ``config.periods_per_year``."""
+    return config.periods_per_year if periods_per_year is None else periods_per_year
 
 
 class Metrics:
     """
     Collection of financial performance metrics for portfolio evaluation.
+
+    Returns are per bar and annualized with ``periods_per_year`` bars
+    (``config.periods_per_year`` by default, 252 for daily data).
+
+    Each method recomputes the returns of its input; ``metrics`` and
+    ``metrics_batch`` evaluate all of them in a single pass.
     """
 
     @staticmethod
-    def sharpe(data: pd.Series) -> float:
+    def sharpe(data: pd.Series, periods_per_year=None) -> float:
         """
         Compute annualized Sharpe ratio.
 
@@ -23,12 +37,13 @@ class Metrics:
             return 0.0
         mean_ret = returns.mean()
         std_ret = returns.std()
-        annual_mean = mean_ret * np.sqrt(252)
-        annual_std = std_ret * np.sqrt(252)
+        ppy = _periods(periods_per_year)
+        annual_mean = mean_ret * np.sqrt(ppy)
+        annual_std = std_ret * np.sqrt(ppy)
         return annual_mean / annual_std
 
     @staticmethod
-    def sortino(data: pd.Series) -> float:
+    def sortino(data: pd.Series, periods_per_year=None) -> float:
         """
         Compute annualized Sortino ratio.
 
@@ -43,8 +58,9 @@ class Metrics:
         downside = returns[returns < 0]
         if downside.std() == 0:
             return 0.0
-        annual_mean = returns.mean() * np.sqrt(252)
-        annual_downside = downside.std() * np.sqrt(252)
+        ppy = _periods(periods_per_year)
+        annual_mean = returns.mean() * np.sqrt(ppy)
+        annual_downside = downside.std() * np.sqrt(ppy)
         return annual_mean / annual_downside
 
     @staticmethod
@@ -64,7 +80,7 @@ class Metrics:
         return abs(drawdown.min())
 
     @staticmethod
-    def calmar(data: pd.Series) -> float:
+    def calmar(data: pd.Series, periods_per_year=None) -> float:
         """
         Compute the Calmar ratio (annual return / max drawdown).
 
@@ -76,14 +92,14 @@ class Metrics:
         if data is None or data.empty:
             return 0.0
         returns = data.pct_change().dropna()
-        annual_return = (1 + returns.mean()) ** 252 - 1
+        annual_return = (1 + returns.mean()) ** _periods(periods_per_year) - 1
         mdd = Metrics.max_drawdown(data)
         return annual_return / mdd if mdd > 0 else 0.0
 
     @staticmethod
     def win_rate(data: pd.Series) -> float:
         """
-        Compute the percentage of positive daily returns.
+        Compute the percentage of positive returns.
 
         Returns
         -------
@@ -96,42 +112,384 @@ class Metrics:
         return (returns > 0).mean()
 
 
-def metrics(series):
+METRIC_NAMES = ("Sharpe Ratio", "Sortino Ratio", "Maximum Drawdown",
+                "Calmar Ratio", "Win Rate")
+
+
+def metrics_batch(equity, periods_per_year=None) -> pd.DataFrame:
+    """
+    Compute every ``Metrics`` ratio for many equity curves in one pass.
+
+    Returns, their mean and sample deviation, the downside moments and the
+    running maximum are computed once per curve with array operations over
+    all curves, using the same definitions as the ``Metrics`` methods
+    (``pct_change`` returns, ddof=1 deviations).
+
+    Parameters
+    ----------
+    equity : np.ndarray, pd.Series or pd.DataFrame
+        Equity curves in columns, shape (T, n_curves), or a single curve.
+        NaN entries (e.g. padding of shorter curves) are ignored.
+    periods_per_year : float or array-like, optional
+        Bars per year, one value or one per curve. Defaults to
+        ``config.periods_per_year``.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per curve (indexed by the DataFrame columns if given) with
+        the ``metrics()`` keys as columns.
+    """
+    index = equity.columns if isinstance(equity, pd.DataFrame) else None
+    E = np.asarray(equity, dtype=float)
+    if E.ndim == 1:
+        E = E[:, None]
+    T, K = E.shape
+    if T == 0:
+        return pd.DataFrame(0.0, index=index if index is not None else range(K),
+                            columns=list(METRIC_NAMES))
+
+    # curves in rows so that reductions run over contiguous memory
+    E = np.ascontiguousarray(E.T)
+    ppy = np.asarray(_periods(periods_per_year), dtype=float)
+    root = np.sqrt(ppy)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        R = E[:, 1:] / E[:, :-1] - 1.0
+        valid = ~np.isnan(R)
+        n = valid.sum(axis=1)
+        Rv = np.where(valid, R, 0.0)
+        mean = Rv.sum(axis=1) / n
+        var = np.where(valid, R - mean[:, None], 0.0)
+        var = (var * var).sum(axis=1) / (n - 1)
+        std = np.sqrt(np.where(n > 1, var, np.nan))
+        sharpe = np.where(std == 0, 0.0, (mean * root) / (std * root))
+
+        down = valid & (R < 0)
+        n_down = down.sum(axis=1)
+        mean_down = np.where(down, R, 0.0).sum(axis=1) / n_down
+        var_down = np.where(down, R - mean_down[:, None], 0.0)
+        var_down = (var_down * var_down).sum(axis=1) / (n_down - 1)
+        std_down = np.sqrt(np.where(n_down > 1, var_down, np.nan))
+        sortino = np.where(std_down == 0, 0.0, (mean * root) / (std_down * root))
+
+        peak = np.fmax.accumulate(E, axis=1)
+        drawdown = np.where(np.isnan(E), np.inf, (E - peak) / peak)
+        mdd = np.abs(drawdown.min(axis=1))
+        mdd = np.where(np.isinf(mdd), np.nan, mdd)
+
+        annual_return = (1 + mean) ** ppy - 1
+        calmar = np.where(mdd > 0, annual_return / mdd, 0.0)
+
+        win_rate = (valid & (R > 0)).sum(axis=1) / n
+
+    return pd.DataFrame(
+        dict(zip(METRIC_NAMES, (sharpe, sortino, mdd, calmar, win_rate))),
+        index=index,
+    )
+
+
+def metrics(series, periods_per_year=None):
     """
-    Compute a set of portfolio evaluation metrics for a given equity curve.
+    Compute a set of portfolio evaluation metrics for a given equity curve,
+    annualized with ``periods_per_year`` bars (``config.periods_per_year``
+    by default).
 
     Returns
     -------
     dict
         Metrics summary.
     """
-    return {
-        "Sharpe Ratio": Metrics.sharpe(series),
-        "Sortino Ratio": Metrics.sortino(series),
-        "Maximum Drawdown": Metrics.max_drawdown(series),
-        "Calmar Ratio": Metrics.calmar(series),
-        "Win Rate": Metrics.win_rate(series),
-    }
+    if series is None or len(series) == 0:
+        return dict.fromkeys(METRIC_NAMES, 0.0)
+    row = metrics_batch(np.asarray(series, dtype=float), periods_per_year).iloc[0]
+    return {name: float(row[name]) for name in METRIC_NAMES}
+
+
+def _merge_moments(n: int, mean: float, m2: float, x: np.ndarray) -> tuple:
+    """Combine (count, mean, sum of squared deviations) with the values ``x``."""
+    k = len(x)
+    if not k:
+        return n, mean, m2
+    mean_x = float(x.mean())
+    m2_x = float(np.sum((x - mean_x) ** 2))
+    total = n + k
+    delta = mean_x - mean
+    return total, mean + delta * k / total, m2 + m2_x + delta * delta * n * k / total
+
+
+class RunningMetrics:
+    """
+    Online counterpart of ``metrics`` for an equity curve that grows one
+    bar at a time.
+
+    Every ``update`` is O(1): the mean and sum of squared deviations of the
+    returns and of the losing returns are kept with Welford's update, along
+    with the count of winning returns and the running peak and drawdown.
+    With ``window`` the statistics cover only the last ``window`` returns
+    (``window + 1`` equity values), as ``metrics`` would on that tail: the
+    oldest return is removed from the moments as a new one arrives, the
+    moments are resynchronized exactly from the buffer every ``window``
+    updates (as in ``RollingWindow``), the trailing peak is kept in a
+    monotonic deque and the maximum drawdown of the window is evaluated
+    from the buffer when requested.
+
+    Attributes
+    ----------
+    window : int or None
+        Number of trailing returns covered, or None for the whole history.
+    periods_per_year : float
+        Bars per year used to annualize.
+    count : int
+        Number of equity values received.
+    """
+    __slots__ = ("window", "periods_per_year", "count", "_last", "_n", "_mean", "_m2",
+                 "_n_down", "_mean_down", "_m2_down", "_wins",
+                 "_peak", "_mdd", "_peaks", "_rets", "_rpos", "_eqs", "_epos")
+
+    def __init__(self, window=None, periods_per_year=None):
+        if window is not None and window < 1:
+            raise ValueError("window must be a positive number of returns")
+        self.window = window
+        self.periods_per_year = _periods(periods_per_year)
+        self.count = 0
+        self._last = None
+        self._n = self._n_down = self._wins = 0
+        self._mean = self._m2 = self._mean_down = self._m2_down = 0.0
+        self._peak = -np.inf
+        self._mdd = 0.0
+        if window is not None:
+            self._peaks = deque()
+            self._rets = np.zeros(2 * window)
+            self._eqs = np.zeros(2 * (window + 1))
+            self._rpos = self._epos = 0
+
+    def _add(self, r: float):
+        self._n += 1
+        delta = r - self._mean
+        self._mean += delta / self._n
+        self._m2 += delta * (r - self._mean)
+        if r < 0:
+            self._n_down += 1
+            delta = r - self._mean_down
+            self._mean_down += delta / self._n_down
+            self._m2_down += delta * (r - self._mean_down)
+        elif r > 0:
+            self._wins += 1
+
+    def _remove(self, r: float):
+        n = self._n - 1
+        mean = self._mean + (self._mean - r) / n if n else 0.0
+        self._m2 = self._m2 - (r - self._mean) * (r - mean) if n else 0.0
+        self._mean, self._n = mean, n
+        if r < 0:
+            n = self._n_down - 1
+            mean = self._mean_down + (self._mean_down - r) / n if n else 0.0
+            self._m2_down = self._m2_down - (r - self._mean_down) * (r - mean) if n else 0.0
+            self._mean_down, self._n_down = mean, n
+        elif r > 0:
+            self._wins -= 1
+        if not self._wins and not self._n_down:
+            # only zero returns left: the moments are exactly zero
+            self._mean = self._m2 = 0.0
+
+    def _resync(self):
+        """Recompute the window moments exactly from the return buffer."""
+        rets = self.returns
+        self._n = len(rets)
+        self._mean = float(rets.mean()) if len(rets) else 0.0
+        self._m2 = float(np.sum((rets - self._mean) ** 2))
+        down = rets[rets < 0]
+        self._n_down = len(down)
+        self._mean_down = float(down.mean()) if len(down) else 0.0
+        self._m2_down = float(np.sum((down - self._mean_down) ** 2))
+        self._wins = int(np.count_nonzero(rets > 0))
+
+    def update(self, value: float):
+        """
+        Append the equity value of a new bar (NaN values are ignored).
+        """
+        value = float(value)
+        if value != value:
+            return
+        W = self.window
+
+        if self._last is not None:
+            r = value / self._last - 1.0
+            if W is not None:
+                i = self._rpos
+                if self._n == W:
+                    self._remove(self._rets[i])
+                self._rets[i] = r
+                self._rets[i + W] = r
+                self._rpos = i + 1 if i + 1 < W else 0
+            self._add(r)
+        self._last = value
+        self.count += 1
+
+        if W is None:
+            self._peak = max(self._peak, value)
+            self._mdd = max(self._mdd, (self._peak - value) / self._peak)
+            return
+
+        i, size = self._epos, W + 1
+        self._eqs[i] = value
+        self._eqs[i + size] = value
+        self._epos = i + 1 if i + 1 < size else 0
+
+        # monotonic deque of (bar, value): the front is the trailing peak
+        peaks = self._peaks
+        while peaks and peaks[-1][1] <= value:
+            peaks.pop()
+        peaks.append((self.count, value))
+        while peaks[0][0] <= self.count - size:
+            peaks.popleft()
+
+        if self.count % W == 0:
+            self._resync()
+
+    def extend(self, values):
+        """
+        Append many equity values at once (NaN values are ignored).
+
+        Over the whole history the chunk's moments are computed with array
+        operations and merged into the running ones (Chan et al.'s pairwise
+        update), so a chunk costs O(len) numpy work instead of a Python loop;
+        in window mode the values go through ``update`` one by one.
+        """
+        v = np.asarray(values, dtype=float)
+        v = v[~np.isnan(v)]
+        if self.window is not None:
+            for value in v.tolist():
+                self.update(value)
+            return
+        if not len(v):
+            return
+
+        prev = v[:-1] if self._last is None else np.concatenate(([self._last], v[:-1]))
+        r = v[len(v) - len(prev):] / prev - 1.0
+        down = r[r < 0]
+        self._n, self._mean, self._m2 = _merge_moments(self._n, self._mean, self._m2, r)
+        self._n_down, self._mean_down, self._m2_down = _merge_moments(
+            self._n_down, self._mean_down, self._m2_down, down)
+        self._wins += int(np.count_nonzero(r > 0))
+
+        peak = np.maximum.accumulate(np.concatenate(([self._peak], v)))[1:]
+        self._mdd = max(self._mdd, float(((peak - v) / peak).max()))
+        self._peak = float(peak[-1])
+        self._last = float(v[-1])
+        self.count += len(v)
+
+    @property
+    def returns(self) -> np.ndarray:
+        """Chronological view of the returns in the window (window mode)."""
+        end = self._rpos + self.window
+        return self._rets[end - self._n:end] if self._n else self._rets[:0]
+
+    @property
+    def equity(self) -> np.ndarray:
+        """Chronological view of the equity values in the window (window mode)."""
+        size = self.window + 1
+        end = self._epos + size
+        return self._eqs[end - min(self.count, size):end]
+
+    @property
+    def peak(self) -> float:
+        """Highest equity value seen (in the window, if any)."""
+        if self.window is not None:
+            return self._peaks[0][1] if self._peaks else np.nan
+        return self._peak if self.count else np.nan
+
+    def drawdown(self) -> float:
+        """Current drawdown from the running peak, as a positive value."""
+        if not self.count:
+            return 0.0
+        return (self.peak - self._last) / self.peak
+
+    def sharpe(self) -> float:
+        """Annualized Sharpe ratio, as ``Metrics.sharpe``."""
+        if not self.count:
+            return 0.0
+        std = math.sqrt(max(self._m2, 0.0) / (self._n - 1)) if self._n > 1 else np.nan
+        if std == 0:
+            return 0.0
+        root = np.sqrt(self.periods_per_year)
+        return (self._mean * root) / (std * root)
+
+    def sortino(self) -> float:
+        """Annualized Sortino ratio, as ``Metrics.sortino``."""
+        if not self.count:
+            return 0.0
+        n = self._n_down
+        std = math.sqrt(max(self._m2_down, 0.0) / (n - 1)) if n > 1 else np.nan
+        if std == 0:
+            return 0.0
+        mean = self._mean if self._n else np.nan
+        root = np.sqrt(self.periods_per_year)
+        return (mean * root) / (std * root)
+
+    def max_drawdown(self) -> float:
+        """
+        Maximum drawdown, as ``Metrics.max_drawdown``. O(1) over the whole
+        history, O(window) in window mode.
+        """
+        if not self.count:
+            return 0.0
+        if self.window is None:
+            return self._mdd
+        eq = self.equity
+        peak = np.maximum.accumulate(eq)
+        return float(abs(((eq - peak) / peak).min()))
+
+    def calmar(self) -> float:
+        """Calmar ratio, as ``Metrics.calmar``."""
+        if not self.count:
+            return 0.0
+        mdd = self.max_drawdown()
+        mean = self._mean if self._n else np.nan
+        return ((1 + mean) ** self.periods_per_year - 1) / mdd if mdd > 0 else 0.0
+
+    def win_rate(self) -> float:
+        """Share of positive returns, as ``Metrics.win_rate``."""
+        if not self.count:
+            return 0.0
+        return self._wins / self._n if self._n else np.nan
+
+    def to_dict(self) -> dict:
+        """
+        Current values under the ``metrics()`` keys.
+        """
+        return {
+            "Sharpe Ratio": self.sharpe(),
+            "Sortino Ratio": self.sortino(),
+            "Maximum Drawdown": self.max_drawdown(),
+            "Calmar Ratio": self.calmar(),
+            "Win Rate": self.win_rate(),
+        }
 
 
 def trade_stadistics(positions, buy, sell, hold, total_borrow, total_comm):
     """
-    Compute aggregated trading statistics from a list of closed positions.
+    Compute aggregated trading statistics from closed positions, given as a
+    ``TradeLedger`` or a list of ``Position`` objects.
 
     Returns
     -------
     dict
         Summary including counts, average wins/losses, and total costs.
     """
-    profits = [p.profit for p in positions]
-    wins = [p for p in profits if p > 0]
-    losses = [p for p in profits if p < 0]
+    if hasattr(positions, "to_frame"):
+        profits = positions.to_frame()["profit"].to_numpy()
+    else:
+        profits = np.array([p.profit for p in positions], dtype=float)
+    wins = profits[profits > 0]
+    losses = profits[profits < 0]
     return {
-        "# Trades": len(positions),
+        "# Trades": len(profits),
         "Operations": {"buy": buy, "sell": sell, "hold": hold},
-        "Avg Win": np.mean(wins) if wins else 0,
-        "Avg Loss": np.mean(losses) if losses else 0,
-        "Profit": sum(profits),
+        "Avg Win": wins.mean() if len(wins) else 0,
+        "Avg Loss": losses.mean() if len(losses) else 0,
+        "Profit": profits.sum(),
         "Total Borrow Cost": total_borrow,
         "Total Comission Cost": total_comm,
     }
@@ -0,0 +1,223 @@
+from libraries import *
+from classes import config, coint_config
+from kalman import BatchKalmanFilter
+from cointegration import RollingADF
+
+
+def _pair_list(pairs) -> list:
+    """
+    Normalize ``select_pairs`` output or an iterable of tuples to
+    [(asset1, asset2), ...].
+    """
+    if isinstance(pairs, pd.DataFrame):
+        return list(zip(pairs['Asset1'], pairs['Asset2']))
+    return [tuple(p) for p in pairs]
+
+
+def _marks(side, n, eY, eX, y, x) -> np.ndarray:
+    """
+    Per-pair contribution to portfolio value: long leg at market plus the
+    open P&L of the short leg (shorts are not credited to cash on entry).
+    """
+    return np.where(side == 1, n * y + n * (eX - x),
+                    np.where(side == -1, n * x + n * (eY - y), 0.0))
+
+
+def backtest_portfolio(prices: pd.DataFrame, pairs, initial_cash=None, cfg=config):
+    """
+    Backtest several pairs from a single capital pool.
+
+    All pairs are stepped together on the common date index: the hedge-ratio
+    and spread Kalman filters, the z-score window and the rolling ADF gate
+    hold one row of state per pair, and every bar is processed with array
+    operations over all pairs, so the cost per bar grows with the number of
+    pairs only through NumPy.
+
+    Signals and position accounting follow ``backtest`` pair by pair. New
+    entries share the pool: ``cfg.INVEST`` of the current equity is split
+    equally across open and newly triggered positions, each entry's gross
+    notional is limited so that the book stays within ``cfg.GROSS_CAP`` times
+    equity, and entries that cash cannot fund are dropped, weakest |z|
+    first. With a single pair and no binding cap this reproduces
+    ``backtest(..., adf="rolling")``.
+
+    Parameters
+    ----------
+    prices : pd.DataFrame
+        Price matrix containing every asset in ``pairs``.
+    pairs : pd.DataFrame or list
+        Output of ``select_pairs`` (Asset1 is traded as Y, Asset2 as X), or
+        a list of (asset1, asset2) tuples.
+    initial_cash : float, optional
+        Initial portfolio cash. If None, uses the value defined in cfg.
+    cfg : config
+        Thresholds, costs, Kalman noise levels and exposure cap.
+
+    Returns
+    -------
+    tuple
+        (
+            equity_curve : pd.Series,
+            attribution : pd.DataFrame (one row per pair),
+            pair_pnl : pd.DataFrame (cumulative P&L per pair and date),
+            trades : pd.DataFrame (one row per closed round trip)
+        )
+    """
+    pair_list = _pair_list(pairs)
+    if not pair_list:
+        raise ValueError("pairs must contain at least one pair")
+    assets = list(dict.fromkeys(a for p in pair_list for a in p))
+    data = prices[assets].dropna()
+    dates = data.index
+    col = {a: k for k, a in enumerate(assets)}
+    values = data.to_numpy(dtype=np.float64)
+    Yp = np.ascontiguousarray(values[:, [col[a] for a, _ in pair_list]])
+    Xp = np.ascontiguousarray(values[:, [col[b] for _, b in pair_list]])
+    T, P = Yp.shape
+
+    W = cfg.TDays
+    COM = cfg.COM
+    BR_bar = cfg.BR / cfg.periods_per_year
+
+    k_hr = BatchKalmanFilter(P, 2, R=cfg.KF_R, Q=np.eye(2) * cfg.KF_Q)
+    k_vecm = BatchKalmanFilter(P, 1, R=cfg.KF_R, Q=np.eye(1) * cfg.KF_Q)
+    gate = RollingADF(W, n_series=P)
+    H = np.ones((P, 2))
+    ones = np.ones((P, 1))
+    window = np.zeros((W, P))
+
+    cash = cfg.capital if initial_cash is None else initial_cash
+    side = np.zeros(P, dtype=np.int8)        # 1 long spread, -1 short spread
+    n = np.zeros(P)
+    eY = np.zeros(P)
+    eX = np.zeros(P)
+    entry_t = np.zeros(P, dtype=np.int64)
+    basis = np.zeros(P)                      # cost of the long leg
+    realized = np.zeros(P)
+    borrow = np.zeros(P)
+    commission = np.zeros(P)
+    round_trips = np.zeros(P, dtype=np.int64)
+    wins = np.zeros(P, dtype=np.int64)
+
+    equity = np.empty(T)
+    pnl = np.empty((T, P))
+    closed = []
+
+    for t in range(T):
+        y = Yp[t]
+        x = Xp[t]
+
+        H[:, 1] = x
+        beta = k_hr.step(H, y)[:, 1]
+        spr = k_vecm.step(ones, y - beta * x)[:, 0]
+        window[t % W] = spr
+        _, pvalue = gate.push(spr)
+
+        if t + 1 >= W:
+            sd = window.std(axis=0)
+            z = (spr - window.mean(axis=0)) / np.where(sd > 0, sd, 1e-6)
+            allow = pvalue <= coint_config.adf_alpha
+            in_pos = side != 0
+            absz = np.abs(z)
+
+            short_notional = n * np.where(side == 1, x, y)
+            cost = short_notional * BR_bar
+            cash -= cost.sum()
+            borrow += cost
+            realized -= cost
+
+            close = in_pos & ((absz > cfg.STOP_Z) | (absz < cfg.EXIT_Z))
+            if close.any():
+                ci = np.flatnonzero(close)
+                s, m = side[ci], n[ci]
+                pl = np.where(s == 1, y[ci], x[ci])
+                ps = np.where(s == 1, x[ci], y[ci])
+                el = np.where(s == 1, eY[ci], eX[ci])
+                es = np.where(s == 1, eX[ci], eY[ci])
+                com_l = m * pl * COM
+                com_s = m * ps * COM
+                profit_l = (pl - el) * m - com_l
+                profit_s = (es - ps) * m - com_s
+
+                cash += float(np.sum(pl * m - com_l + profit_s))
+                realized[ci] += profit_l + profit_s
+                commission[ci] += com_l + com_s
+                round_trips[ci] += 1
+                wins[ci] += (profit_l > 0).astype(np.int64) + (profit_s > 0)
+                closed.append((ci, s, entry_t[ci], np.full(len(ci), t), m,
+                               profit_l + profit_s))
+
+                side[ci] = 0
+                n[ci] = 0.0
+                basis[ci] = 0.0
+
+            # the state before closing: a pair stopped or exited on this bar
+            # does not re-enter until the next one, as in ``decide``
+            enter = ~in_pos & allow & (absz > cfg.ENTRY_Z)
+            if enter.any():
+                ei = np.flatnonzero(enter)
+                ei = ei[np.argsort(-absz[ei], kind="stable")]
+                k = len(ei)
+                value = cash + _marks(side, n, eY, eX, y, x).sum()
+                gross = np.sum(n * (y + x))
+                per = cfg.INVEST * value / (np.count_nonzero(side) + k)
+                room = max(cfg.GROSS_CAP * value - gross, 0.0) / k
+
+                ye, xe, be = y[ei], x[ei], beta[ei]
+                m = np.floor(np.minimum(per / (np.abs(ye) + np.abs(be * xe)),
+                                        room / (np.abs(ye) + np.abs(xe))))
+                s = np.where(z[ei] > 0, -1, 1).astype(np.int8)
+                pl = np.where(s == 1, ye, xe)
+                ps = np.where(s == 1, xe, ye)
+                need = m * pl + m * ps * COM
+                ok = (m > 0) & (np.cumsum(need * (m > 0)) <= cash)
+                ei, s, m, pl, ps, need = ei[ok], s[ok], m[ok], pl[ok], ps[ok], need[ok]
+
+                cash -= float(need.sum())
+                side[ei] = s
+                n[ei] = m
+                eY[ei] = y[ei]
+                eX[ei] = x[ei]
+                entry_t[ei] = t
+                basis[ei] = m * pl
+                realized[ei] -= m * ps * COM
+                commission[ei] += m * (pl + ps) * COM
+
+        contrib = _marks(side, n, eY, eX, y, x)
+        equity[t] = cash + contrib.sum()
+        pnl[t] = realized + contrib - basis
+
+    labels = [f"{a}/{b}" for a, b in pair_list]
+    last = pnl[-1] if T else np.zeros(P)
+    attribution = pd.DataFrame({
+        'Asset1': [a for a, _ in pair_list],
+        'Asset2': [b for _, b in pair_list],
+        'PnL': last,
+        'Realized PnL': realized,
+        'Unrealized PnL': last - realized,
+        'Borrow Cost': borrow,
+        'Commission Cost': commission,
+        'Trades': round_trips,
+        'Win Rate': np.divide(wins, 2 * round_trips,
+                              out=np.zeros(P), where=round_trips > 0),
+        'Open': side != 0,
+    }, index=labels)
+
+    if closed:
+        ci, s, t0, t1, m, profit = (np.concatenate(c) for c in zip(*closed))
+        trades = pd.DataFrame({
+            'Pair': np.asarray(labels, dtype=object)[ci],
+            'Side': np.where(s == 1, "LONG_SPREAD", "SHORT_SPREAD"),
+            'Entry Date': dates[t0],
+            'Exit Date': dates[t1],
+            'n_shares': m,
+            'PnL': profit,
+        })
+    else:
+        trades = pd.DataFrame(columns=['Pair', 'Side', 'Entry Date',
+                                       'Exit Date', 'n_shares', 'PnL'])
+
+    return (pd.Series(equity, index=dates),
+            attribution,
+            pd.DataFrame(pnl, index=dates, columns=labels),
+            trades)
@@ -0,0 +1,234 @@
+from libraries import *
+import json
+
+
+class PriceStore:
+    """
+    On-disk price matrix memory-mapped as float64 columns with a date index.
+
+    Layout of ``path``: ``index.npy`` (datetime64[ns] timestamps),
+    ``columns.json`` (column names in order) and ``values.f64``, the raw
+    float64 values stored column after column (Fortran order), so each
+    column is one contiguous block of the file. The file is opened once
+    per process with ``np.memmap`` in read-only mode: ``column`` returns
+    zero-copy views whose pages come from the OS page cache, every process
+    opening the store shares that single copy, and a pair worker only pages
+    in the columns it reads.
+
+    A store pickles as its path and reopens the map on unpickling, so it
+    can be handed to process pools.
+
+    Attributes
+    ----------
+    path : str
+        Store directory.
+    index : pd.DatetimeIndex
+        Timestamps of the rows.
+    columns : list
+        Column names.
+    """
+    INDEX = "index.npy"
+    COLUMNS = "columns.json"
+    VALUES = "values.f64"
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, self.COLUMNS)) as f:
+            self.columns = json.load(f)
+        self.index = pd.DatetimeIndex(np.load(os.path.join(path, self.INDEX)))
+        self._pos = {c: k for k, c in enumerate(self.columns)}
+        self._values = None
+
+    def __getstate__(self):
+        return self.path
+
+    def __setstate__(self, path):
+        self.__init__(path)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, column):
+        return column in self._pos
+
+    def __repr__(self):
+        return f"PriceStore({self.path!r}, rows={len(self.index)}, columns={len(self.columns)})"
+
+    @classmethod
+    def write(cls, path: str, prices, index=None) -> "PriceStore":
+        """
+        Write a price matrix to ``path`` (created if needed, existing store
+        files replaced) and open it.
+
+        Parameters
+        ----------
+        path : str
+            Store directory.
+        prices : pd.DataFrame or iterable of (name, array)
+            The price matrix, or its columns one at a time aligned with
+            ``index``, so a universe never has to be in memory at once.
+        index : array-like, optional
+            Row timestamps when ``prices`` is an iterable of columns.
+
+        Returns
+        -------
+        PriceStore
+        """
+        if isinstance(prices, pd.DataFrame):
+            index = prices.index
+            prices = prices.items()
+        elif index is None:
+            raise ValueError("index is required when prices is not a DataFrame")
+        index = pd.DatetimeIndex(index)
+
+        os.makedirs(path, exist_ok=True)
+        names = []
+        with open(os.path.join(path, cls.VALUES), "wb") as f:
+            for name, values in prices:
+                values = np.asarray(values, dtype=np.float64)
+                if values.shape != (len(index),):
+                    raise ValueError(f"column {name!r} does not match the index length")
+                values.tofile(f)
+                names.append(str(name))
+        np.save(os.path.join(path, cls.INDEX), index.to_numpy(dtype="datetime64[ns]"))
+        # written last: a store without columns.json is incomplete
+        with open(os.path.join(path, cls.COLUMNS), "w") as f:
+            json.dump(names, f)
+        return cls(path)
+
+    def append(self, prices) -> "PriceStore":
+        """
+        Add columns at the end of the store, in place.
+
+        Only ``values.f64`` grows (each column is one more block of it) and
+        ``columns.json`` is rewritten last, so the existing columns are never
+        rewritten and an interrupted append leaves the store as it was.
+
+        Parameters
+        ----------
+        prices : pd.DataFrame or iterable of (name, array)
+            New columns aligned with ``index``; a DataFrame must have the
+            store's index.
+
+        Returns
+        -------
+        PriceStore
+            This store, reopened with the new columns.
+        """
+        if isinstance(prices, pd.DataFrame):
+            if not pd.DatetimeIndex(prices.index).equals(self.index):
+                raise ValueError("prices must have the store's index")
+            prices = prices.items()
+
+        names = list(self.columns)
+        with open(os.path.join(self.path, self.VALUES), "r+b") as f:
+            # drop whatever an interrupted append left past the listed columns
+            f.seek(len(self.index) * len(names) * 8)
+            f.truncate()
+            for name, values in prices:
+                values = np.asarray(values, dtype=np.float64)
+                if values.shape != (len(self.index),):
+                    raise ValueError(f"column {name!r} does not match the index length")
+                if str(name) in names:
+                    raise ValueError(f"column {name!r} is already in the store")
+                values.tofile(f)
+                names.append(str(name))
+        with open(os.path.join(self.path, self.COLUMNS), "w") as f:
+            json.dump(names, f)
+        self.__init__(self.path)
+        return self
+
+    @property
+    def shape(self) -> tuple:
+        """(rows, columns)."""
+        return len(self.index), len(self.columns)
+
+    @property
+    def values(self) -> np.ndarray:
+        """Read-only (rows, columns) memory map of the whole matrix."""
+        if self._values is None:
+            if not all(self.shape):
+                self._values = np.zeros(self.shape, order="F")
+            else:
+                self._values = np.memmap(os.path.join(self.path, self.VALUES),
+                                         dtype=np.float64, mode="r",
+                                         shape=self.shape, order="F")
+        return self._values
+
+    def column(self, key) -> np.ndarray:
+        """Zero-copy view of one column, by name or position."""
+        k = self._pos[key] if key in self._pos else key
+        return self.values[:, k]
+
+    def rows(self, start=None, end=None) -> slice:
+        """Row slice of the timestamps in [start, end]."""
+        lo = 0 if start is None else self.index.searchsorted(pd.Timestamp(start), "left")
+        hi = len(self.index) if end is None else \
+            self.index.searchsorted(pd.Timestamp(end), "right")
+        return slice(lo, hi)
+
+    def frame(self, columns=None, start=None, end=None) -> pd.DataFrame:
+        """
+        Copy of a block of the store as a DataFrame (e.g. a selected pair
+        for ``backtest``).
+        """
+        rows = self.rows(start, end)
+        columns = self.columns if columns is None else list(columns)
+        pos = [self._pos[c] for c in columns]
+        return pd.DataFrame(self.values[rows][:, pos], index=self.index[rows],
+                            columns=columns)
+
+    def correlated_pairs(self, threshold: float, block: int = 512) -> list:
+        """
+        Column pairs whose Pearson correlation (over the rows where both
+        are present, like ``DataFrame.corr``) is at least ``threshold``.
+
+        Correlations are computed block against block of ``block`` columns,
+        so the full correlation matrix is never held in memory.
+
+        Returns
+        -------
+        list
+            (i, j, corr) with i < j, in ``combinations`` order.
+        """
+        V = self.values
+        N = V.shape[1]
+        found = []
+        for a0 in range(0, N, block):
+            A = np.array(V[:, a0:a0 + block])
+            for b0 in range(a0, N, block):
+                B = A if b0 == a0 else np.array(V[:, b0:b0 + block])
+                C = _block_corr(A, B)
+                ii, jj = np.nonzero(C >= threshold)
+                ii, jj = ii + a0, jj + b0
+                keep = ii < jj
+                found.extend(zip(ii[keep].tolist(), jj[keep].tolist(),
+                                 C[ii[keep] - a0, jj[keep] - b0].tolist()))
+        found.sort()
+        return found
+
+
+def _block_corr(A: np.ndarray, B: np.ndarray) -> np.ndarray:
+    """
+    Pairwise-complete Pearson correlations between the columns of ``A`` and
+    ``B`` (NaN where fewer than two common rows or zero variance).
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        Ma, Mb = ~np.isnan(A), ~np.isnan(B)
+        if Ma.all() and Mb.all():
+            A0 = A - A.mean(axis=0)
+            B0 = B - B.mean(axis=0)
+            return (A0.T @ B0) / np.sqrt(np.outer((A0 * A0).sum(axis=0),
+                                                  (B0 * B0).sum(axis=0)))
+
+        # shift by the column means for conditioning, zero the gaps
+        A0 = np.where(Ma, A - np.nanmean(A, axis=0), 0.0)
+        B0 = np.where(Mb, B - np.nanmean(B, axis=0), 0.0)
+        Ma, Mb = Ma.astype(np.float64), Mb.astype(np.float64)
+        n = Ma.T @ Mb
+        sa, sb = A0.T @ Mb, Ma.T @ B0
+        cov = A0.T @ B0 - sa * sb / n
+        var_a = (A0 * A0).T @ Mb - sa * sa / n
+        var_b = Ma.T @ (B0 * B0) - sb * sb / n
+        corr = cov / np.sqrt(var_a * var_b)
+        return np.where(n >= 2, corr, np.nan)
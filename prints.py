@@ -104,7 +104,7 @@ def backtest_pair_splits(train, test, val):
 
     plot_single_split(p_val, "Validation Portfolio")
     plot_test_validation(p_test, p_val)
-    plot_trade_returns([p.profit for p in pos_val])
+    plot_trade_returns(pos_val.to_frame()["profit"])
 
     # ===================== FULL BACKTEST =====================
     print("\n=== BACKTEST COMPLETO ===\n")
@@ -0,0 +1,172 @@
+from libraries import *
+from classes import config, coint_config, Signal
+from kalman import KalmanFilter, RollingWindow
+from cointegration import RollingADF
+
+
+def decide(z: float, allow_entries: bool, in_position: bool, cfg=config) -> str:
+    """
+    Map the current z-score and position state to a target action.
+
+    Parameters
+    ----------
+    z : float
+        Z-score of the smoothed spread.
+    allow_entries : bool
+        Whether the stationarity gate allows new entries.
+    in_position : bool
+        Whether a spread position is currently open.
+    cfg : config
+        Thresholds to use (the ``config`` class or an instance).
+
+    Returns
+    -------
+    str
+        One of "STOP", "EXIT", "SHORT_SPREAD", "LONG_SPREAD", "WAIT", "HOLD".
+    """
+    if in_position and abs(z) > cfg.STOP_Z:
+        return "STOP"
+    if in_position and abs(z) < cfg.EXIT_Z:
+        return "EXIT"
+    if allow_entries and not in_position:
+        if z > cfg.ENTRY_Z:
+            return "SHORT_SPREAD"
+        if z < -cfg.ENTRY_Z:
+            return "LONG_SPREAD"
+        return "WAIT"
+    return "HOLD"
+
+
+class PairSignalEngine:
+    """
+    Incremental signal engine for one pair, fed one bar at a time.
+
+    Holds the hedge-ratio and spread Kalman filters, a ring buffer with the
+    last ``window`` smoothed spreads and the stationarity gate, so every
+    update costs constant time and memory. ``backtest`` replays history
+    through this engine, so live and historical signals are identical.
+
+    Attributes
+    ----------
+    window : int
+        Rolling window for the z-score and ADF gate.
+    adf : str
+        "statsmodels" or "rolling" stationarity gate.
+    cfg : config
+        Thresholds and Kalman noise levels (the ``config`` class or an
+        instance).
+    k_hr : KalmanFilter
+        Filter for (intercept, hedge ratio).
+    k_vecm : KalmanFilter
+        Filter smoothing the spread.
+    profiler : StageProfiler or None
+        When set, ``update`` charges its time to the stages "hedge_ratio",
+        "vecm", "rolling_stats", "stationarity" and "decision".
+    """
+
+    def __init__(self, window=None, adf="statsmodels", cfg=config):
+        if adf not in ("statsmodels", "rolling"):
+            raise ValueError("adf must be 'statsmodels' or 'rolling'")
+        self.window = cfg.TDays if window is None else window
+        self.adf = adf
+        self.cfg = cfg
+        self.k_hr = KalmanFilter(n=2, R=cfg.KF_R, Q=np.eye(2) * cfg.KF_Q)
+        self.k_vecm = KalmanFilter(n=1, R=cfg.KF_R, Q=np.eye(1) * cfg.KF_Q)
+        self._spreads = RollingWindow(self.window)
+        self._adf = RollingADF(self.window) if adf == "rolling" else None
+        self.profiler = None
+
+    def update(self, timestamp, y: float, x: float, in_position: bool = False) -> Signal:
+        """
+        Process one bar.
+
+        Parameters
+        ----------
+        timestamp : any
+            Bar timestamp.
+        y : float
+            Price of the dependent asset.
+        x : float
+            Price of the hedge asset.
+        in_position : bool
+            Whether a spread position is currently open.
+
+        Returns
+        -------
+        Signal
+            z-score, hedge ratio, smoothed spread, entry gate and action.
+        """
+        prof = self.profiler
+        if prof is not None:
+            t = prof.start()
+
+        beta = self.k_hr.step((1.0, x), y)[1]
+        if prof is not None:
+            t = prof.add("hedge_ratio", t)
+
+        spread = y - beta * x
+        spr_hat = self.k_vecm.step((1.0,), spread)[0]
+        if prof is not None:
+            t = prof.add("vecm", t)
+
+        self._spreads.push(spr_hat)
+        full = self._spreads.full
+        z = self._spreads.zscore(spr_hat, floor=1e-6) if full else np.nan
+        if prof is not None:
+            t = prof.add("rolling_stats", t)
+
+        if self._adf is not None:
+            _, pvalue = self._adf.push(spr_hat)
+        elif full:
+            adf_stat, pvalue, *_ = adfuller(pd.Series(self._spreads.values))
+        if prof is not None:
+            t = prof.add("stationarity", t)
+
+        if not full:
+            return Signal(timestamp, np.nan, beta, spr_hat, False, "WARMUP")
+
+        allow_entries = pvalue <= coint_config.adf_alpha
+        action = decide(z, allow_entries, in_position, self.cfg)
+        if prof is not None:
+            prof.add("decision", t)
+
+        return Signal(timestamp, z, beta, spr_hat, allow_entries, action)
+
+
+def signal_paths(Y: np.ndarray, X: np.ndarray, adf="statsmodels", cfg=config,
+                 engine: PairSignalEngine = None, profiler=None) -> tuple:
+    """
+    Replay a price history through ``PairSignalEngine`` and collect the
+    position-independent signal paths.
+
+    Parameters
+    ----------
+    Y, X : np.ndarray
+        Prices of the dependent and hedge assets.
+    adf : str
+        Stationarity gate engine.
+    cfg : config
+        Window and Kalman noise levels.
+    engine : PairSignalEngine, optional
+        Engine to continue from (its state is advanced in place).
+    profiler : StageProfiler, optional
+        Records per-stage timings of the engine updates.
+
+    Returns
+    -------
+    tuple
+        (beta, z, allow_entries) arrays; z is NaN during warm-up.
+    """
+    if engine is None:
+        engine = PairSignalEngine(cfg.TDays, adf, cfg)
+    engine.profiler = profiler
+    n = len(Y)
+    beta = np.empty(n)
+    z = np.empty(n)
+    allow = np.zeros(n, dtype=bool)
+    for i, (y, x) in enumerate(zip(np.asarray(Y).tolist(), np.asarray(X).tolist())):
+        s = engine.update(None, y, x)
+        beta[i] = s.beta
+        z[i] = s.z
+        allow[i] = s.allow_entries
+    return beta, z, allow
@@ -0,0 +1,135 @@
+from libraries import *
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from functools import partial
+from dataclasses import fields
+from classes import config
+from signals import signal_paths
+from backtesting import (backtest_signals, numba_signal_paths,
+                         numba_backtest_signals, _resolve_backend)
+from metrics import metrics_batch
+
+SIGNAL_PARAMS = ("TDays", "KF_Q", "KF_R")
+
+
+def _expand_grid(grid: dict) -> list:
+    """
+    Cartesian product of a parameter grid as a list of override dicts.
+    """
+    names = {f.name for f in fields(config)}
+    unknown = set(grid) - names
+    if unknown:
+        raise ValueError(f"Unknown config fields in grid: {sorted(unknown)}")
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in product(*grid.values())]
+
+
+def _sweep_group(Y: np.ndarray, X: np.ndarray, dates, signal_key: dict,
+                 combos: list, adf: str, initial_cash, numba: bool = False,
+                 execution=None) -> list:
+    """
+    Worker task: compute the signal paths once for ``signal_key`` and run
+    the trading loop for every configuration that shares them.
+    """
+    if numba:
+        beta, z, allow = numba_signal_paths(Y, X, config(**signal_key))
+        run = numba_backtest_signals
+    else:
+        beta, z, allow = signal_paths(Y, X, adf, config(**signal_key))
+        run = partial(backtest_signals, execution=execution)
+    curves, periods, rows = [], [], []
+    for idx, combo in combos:
+        cfg = config(**combo)
+        (equity, cash, win_rate, buy, sell, hold, n_closed,
+         _, borrow, comm) = run(Y, X, dates, beta, z, allow, initial_cash, cfg)
+        curves.append(equity.to_numpy())
+        periods.append(cfg.periods_per_year)
+        rows.append((idx, combo, {
+            "Final Value": float(equity.iloc[-1]) if len(equity) else np.nan,
+            "Trades": n_closed,
+            "Trade Win Rate": win_rate,
+            "Total Borrow Cost": borrow,
+            "Total Comission Cost": comm,
+        }))
+
+    # every curve of the group spans the same bars: one batched metrics pass
+    if not curves:
+        return []
+    table = metrics_batch(np.column_stack(curves), np.array(periods)).to_dict("records")
+    return [(idx, {**combo, **m, **stats})
+            for (idx, combo, stats), m in zip(rows, table)]
+
+
+def run_sweep(data: pd.DataFrame, grid: dict, n_jobs: int = 1,
+              adf: str = "rolling", initial_cash=None,
+              backend: str = "python", execution=None) -> pd.DataFrame:
+    """
+    Backtest every combination of a parameter grid, in parallel.
+
+    Configurations are grouped by the parameters that shape the signal
+    paths (``TDays``, ``KF_Q``, ``KF_R``); each group computes the Kalman
+    hedge ratios, z-scores and ADF gate once and replays only the trading
+    loop for every threshold/cost combination in it.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Two-asset price series ordered in time.
+    grid : dict
+        Mapping of ``config`` field name to the list of values to try,
+        e.g. ``{"ENTRY_Z": [1.0, 1.5], "EXIT_Z": [0.25, 0.5]}``.
+    n_jobs : int
+        Worker processes (-1 uses every core).
+    adf : str
+        Stationarity gate engine, see ``backtest``. Defaults to "rolling",
+        unlike ``backtest`` ("statsmodels"), since refitting ``adfuller`` on
+        every bar dominates a sweep; pass ``adf="statsmodels"`` to reproduce
+        ``backtest``'s default runs.
+    initial_cash : float, optional
+        Initial portfolio cash. If None, uses the value defined in config.
+    backend : str
+        "python" or "numba", see ``backtest``.
+    execution : ExecutionModel, optional
+        Fill model for every configuration, see ``backtest`` (python
+        backend only).
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per configuration with its parameters and ``metrics()``
+        outputs, in grid order.
+    """
+    combos = _expand_grid(grid)
+    numba, adf = _resolve_backend(backend, adf)
+    if numba and execution is not None:
+        raise ValueError("execution is only supported by the python backend")
+    Y = np.ascontiguousarray(data.iloc[:, 0].to_numpy(dtype=np.float64))
+    X = np.ascontiguousarray(data.iloc[:, 1].to_numpy(dtype=np.float64))
+    dates = data.index
+
+    groups = {}
+    for idx, combo in enumerate(combos):
+        key = tuple((k, combo[k]) for k in SIGNAL_PARAMS if k in combo)
+        groups.setdefault(key, []).append((idx, combo))
+
+    n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+    per_group = max(1, -(-n_jobs // len(groups))) if groups else 1
+    tasks = []
+    for key, members in groups.items():
+        size = -(-len(members) // per_group)
+        for k in range(0, len(members), size):
+            tasks.append((dict(key), members[k:k + size]))
+
+    if n_jobs <= 1 or len(tasks) < 2:
+        parts = [_sweep_group(Y, X, dates, key, members, adf, initial_cash, numba,
+                              execution)
+                 for key, members in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            futures = [pool.submit(_sweep_group, Y, X, dates, key, members,
+                                   adf, initial_cash, numba, execution)
+                       for key, members in tasks]
+            parts = [f.result() for f in futures]
+
+    rows = sorted((row for part in parts for row in part), key=lambda r: r[0])
+    return pd.DataFrame([row for _, row in rows])
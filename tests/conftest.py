@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import synthetic_pair, synthetic_universe  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def pair_prices() -> pd.DataFrame:
+    return synthetic_pair()
+
+
+@pytest.fixture(scope="session")
+def universe_prices() -> pd.DataFrame:
+    return synthetic_universe(8)
@@ -0,0 +1,254 @@
+import numpy as np
+import pytest
+
+import kernels
+
+from benchmarks import synthetic_pair
+from backtesting import backtest, backtest_signals, backtest_stream
+from classes import config, TradeLedger
+from data_processing import iter_chunks
+from execution import BUY, SELL, OPEN, CLOSE, ExecutionModel, ExecutionSimulator
+from metrics import metrics
+from sweep import run_sweep
+from baseline_backtest import backtest as baseline_backtest
+
+
+def _positions(closed):
+    return np.array([(p.n_shares, p.entry_price, p.exit_price, p.profit) for p in closed])
+
+
+@pytest.fixture(scope="module", params=[0, 1])
+def case(request):
+    prices = synthetic_pair(800, seed=request.param)
+    return prices, baseline_backtest(prices)
+
+
+def test_backtest_matches_baseline_loop(case):
+    prices, ref = case
+    result = backtest(prices)
+
+    assert result[0].index.equals(ref[0].index)
+    np.testing.assert_allclose(result[0].to_numpy(), ref[0].to_numpy(), rtol=0, atol=1e-6)
+    assert result[1] == pytest.approx(ref[1], rel=0, abs=1e-6)
+    assert tuple(result[2:7]) == tuple(ref[2:7])
+    assert result[8] == pytest.approx(ref[8])
+    assert result[9] == pytest.approx(ref[9])
+
+    closed = list(result[7])
+    np.testing.assert_allclose(_positions(closed), _positions(ref[7]), rtol=1e-12)
+    assert [p.ticker for p in closed] == [p.ticker for p in ref[7]]
+    # the baseline stores the entry date in ``type_of_trade``
+    assert [p.entry_date for p in closed] == [p.type_of_trade for p in ref[7]]
+
+
+
+def _trades(closed):
+    return [(p.n_shares, p.ticker, p.entry_price, p.exit_price, p.type_of_trade,
+             p.entry_date, p.exit_date, p.profit) for p in closed]
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_numba_backend_matches_rolling_adf(seed):
+    pytest.importorskip("numba")
+    prices = synthetic_pair(1500, seed=seed)
+    ref = backtest(prices, adf="rolling")
+    result = backtest(prices, backend="numba")
+
+    assert result[0].index.equals(ref[0].index)
+    np.testing.assert_allclose(result[0].to_numpy(), ref[0].to_numpy(), rtol=0, atol=1e-6)
+    assert result[1] == pytest.approx(ref[1], rel=0, abs=1e-6)
+    assert tuple(result[2:7]) == tuple(ref[2:7])
+    assert result[8] == pytest.approx(ref[8])
+    assert result[9] == pytest.approx(ref[9])
+    assert _trades(result[7]) == _trades(ref[7])
+    assert result[7].n_open == ref[7].n_open
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_frictionless_execution_matches_close_price_loop_at_zero_commission(seed):
+    prices = synthetic_pair(1500, seed=seed)
+    cfg = config(COM=0.0)
+    ref = backtest(prices, adf="rolling", cfg=cfg)
+    result = backtest(prices, adf="rolling", cfg=cfg, execution=ExecutionModel())
+
+    np.testing.assert_array_equal(result[0].to_numpy(), ref[0].to_numpy())
+    assert result[1] == ref[1]
+    assert tuple(result[2:7]) == tuple(ref[2:7])
+    assert result[7].to_frame().equals(ref[7].to_frame())
+    assert result[8] == ref[8]
+
+
+def test_execution_charges_the_long_entry_commission():
+    prices = synthetic_pair(1500, seed=0)
+    ref = backtest(prices, adf="rolling")
+    result = backtest(prices, adf="rolling", execution=ExecutionModel())
+
+    # identical until the first entry, then apart by its long-leg commission
+    gap = ref[0].to_numpy() - result[0].to_numpy()
+    first = np.flatnonzero(gap)[0]
+    long_leg = result[7].to_frame().iloc[0]
+    assert long_leg['type_of_trade'] == "LONG"
+    assert long_leg['entry_date'] == prices.index[first]
+    assert gap[first] == pytest.approx(
+        long_leg['n_shares'] * long_leg['entry_price'] * config.COM)
+
+
+def test_delayed_partial_fills_are_requeued():
+    ledger = TradeLedger()
+    sim = ExecutionSimulator(ledger, 10_000.0, ExecutionModel(delay=2, fill_ratio=0.25))
+    sim.submit(TradeLedger.Y, BUY, OPEN, 10, 0)
+
+    filled = []
+    for t in range(8):
+        sim.process(t, (100.0, 50.0))
+        filled.append(ledger.open_legs()[0][2] if ledger.n_open else 0.0)
+    # nothing before the delay, then floor(10 * 0.25) = 2 shares per bar
+    assert filled == [0.0, 0.0, 2.0, 4.0, 6.0, 8.0, 10.0, 10.0]
+    assert sim.n_fills == 5
+    assert not sim.pending()
+    assert sim.cash == pytest.approx(10_000.0 - 10 * 100.0)
+
+
+def test_cancel_drops_the_unfilled_rest():
+    ledger = TradeLedger()
+    sim = ExecutionSimulator(ledger, 10_000.0, ExecutionModel(fill_ratio=0.5))
+    sim.submit(TradeLedger.X, SELL, OPEN, 9, 0)
+    sim.process(0, (100.0, 50.0))
+    assert sim.pending(OPEN)
+    assert sim.cancel(OPEN) == 1
+    sim.process(1, (100.0, 50.0))
+    assert ledger.open_legs() == [(TradeLedger.X, TradeLedger.SHORT, 4.0)]
+    assert not sim.pending()
+
+
+def test_slippage_cash_flows():
+    ledger = TradeLedger()
+    com = 0.001
+    sim = ExecutionSimulator(ledger, 10_000.0, ExecutionModel(slippage_bps=10), com)
+    sim.submit(TradeLedger.Y, BUY, OPEN, 100, 0)
+    sim.submit(TradeLedger.X, SELL, OPEN, 100, 0)
+    sim.process(0, (50.0, 20.0))
+
+    buy_px, short_px = 50.0 * 1.001, 20.0 * 0.999
+    cash = 10_000.0 - 100 * buy_px - 100 * buy_px * com - 100 * short_px * com
+    assert sim.cash == pytest.approx(cash)
+    assert sim.slippage == pytest.approx(100 * 0.05 + 100 * 0.02)
+
+    sim.submit(TradeLedger.Y, SELL, CLOSE, 100, 1)
+    sim.submit(TradeLedger.X, BUY, CLOSE, 100, 1)
+    sim.process(1, (60.0, 18.0))
+
+    sell_px, cover_px = 60.0 * 0.999, 18.0 * 1.001
+    long_profit = (sell_px - buy_px) * 100 - 100 * sell_px * com
+    short_profit = (short_px - cover_px) * 100 - 100 * cover_px * com
+    cash += 100 * sell_px - 100 * sell_px * com + short_profit
+    assert ledger.n_open == 0
+    assert sim.cash == pytest.approx(cash)
+    np.testing.assert_allclose(ledger.profits, [long_profit, short_profit])
+    assert sim.slippage == pytest.approx(100 * (0.05 + 0.02 + 0.06 + 0.018))
+    assert sim.commission == pytest.approx(
+        100 * com * (buy_px + short_px + sell_px + cover_px))
+    assert sim.n_fills == 4
+
+
+@pytest.mark.parametrize("backend", ["python", "numba"])
+@pytest.mark.parametrize("chunksize", [1, 97, None])
+def test_stream_matches_one_backtest(backend, chunksize):
+    if backend == "numba":
+        pytest.importorskip("numba")
+    prices = synthetic_pair(600, seed=4)
+    ref = backtest(prices, adf="rolling", backend=backend)
+    result = backtest_stream(iter_chunks(prices, chunksize or len(prices)),
+                             adf="rolling", backend=backend)
+
+    np.testing.assert_array_equal(result[0].to_numpy(),
+                                  ref[0].loc[result[0].index].to_numpy())
+    assert result[1] == ref[1]
+    assert tuple(result[2:7]) == tuple(ref[2:7])
+    # cost totals are summed per chunk, so only the rounding can differ
+    assert result[8] == pytest.approx(ref[8], rel=1e-12)
+    assert result[9] == pytest.approx(ref[9], rel=1e-12)
+
+    streamed, whole = result[7].to_frame(), ref[7].to_frame()
+    np.testing.assert_array_equal(streamed[list(TradeLedger.FIELDS)].to_numpy(),
+                                  whole[list(TradeLedger.FIELDS)].to_numpy())
+    # the stream ledger counts bars from the first bar of the stream
+    assert (prices.index[streamed['exit_date'].to_numpy()] == whole['exit_date']).all()
+    assert result[7].n_open == ref[7].n_open
+
+    running = result[10].to_dict()
+    for name, value in metrics(ref[0]).items():
+        assert running[name] == pytest.approx(value, rel=1e-9, abs=1e-12)
+
+
+@pytest.mark.parametrize("periods", [252, 98_280])
+def test_borrow_accrues_per_bar(periods):
+    prices = synthetic_pair(50, seed=0)
+    Y, X = prices['Y'].to_numpy(), prices['X'].to_numpy()
+    beta = np.full(len(Y), 1.3)
+    z = np.full(len(Y), 1.5)         # enter short spread on bar 0, then hold
+    z[0] = 2.0
+    allow = np.ones(len(Y), dtype=bool)
+    cfg = config(periods_per_year=periods)
+
+    result = backtest_signals(Y, X, prices.index, beta, z, allow, cfg=cfg)
+    n = result[7].open_legs()[0][2]
+    assert result[3] == 1 and result[5] == len(Y) - 1
+    assert result[8] == pytest.approx(np.sum(n * Y[1:]) * cfg.BR / periods, rel=1e-12)
+
+
+@pytest.mark.parametrize("adf, grid", [
+    ("rolling", {"TDays": [20, 30], "ENTRY_Z": [1.0, 1.5], "COM": [0.00125, 0.0]}),
+    ("statsmodels", {"ENTRY_Z": [1.0, 1.5]}),        # adfuller per bar is slow
+])
+def test_sweep_rows_match_standalone_backtests(adf, grid):
+    prices = synthetic_pair(500, seed=2)
+    table = run_sweep(prices, grid, adf=adf)
+    assert len(table) == np.prod([len(v) for v in grid.values()])
+    for _, row in table.iterrows():
+        combo = {k: row[k] for k in grid}
+        if "TDays" in combo:
+            combo["TDays"] = int(combo["TDays"])
+        result = backtest(prices, adf=adf, cfg=config(**combo))
+        assert row["Final Value"] == result[0].iloc[-1]
+        assert row["Trades"] == result[6]
+        assert row["Trade Win Rate"] == result[2]
+        assert row["Total Borrow Cost"] == result[8]
+        assert row["Total Comission Cost"] == result[9]
+        for name, value in metrics(result[0]).items():
+            assert row[name] == pytest.approx(value, rel=1e-12, nan_ok=True)
+
+
+def test_numba_fallback_warns_and_uses_the_rolling_gate(monkeypatch):
+    prices = synthetic_pair(400, seed=3)
+    expected = backtest(prices, adf="rolling")
+    monkeypatch.setattr(kernels, "HAVE_NUMBA", False)
+    with pytest.warns(UserWarning, match="numba is not installed"):
+        result = backtest(prices, adf="statsmodels", backend="numba")
+    assert result[0].equals(expected[0])
+    assert tuple(result[1:7]) == tuple(expected[1:7])
+    with pytest.warns(UserWarning, match="numba is not installed"):
+        table = run_sweep(prices, {"ENTRY_Z": [1.0]}, adf="statsmodels", backend="numba")
+    assert table.loc[0, "Final Value"] == expected[0].iloc[-1]
+
+
+@pytest.mark.parametrize("backend, stages", [
+    ("python", {"hedge_ratio", "vecm", "rolling_stats", "stationarity", "decision",
+                "borrow", "exits", "entries", "mtm"}),
+    pytest.param("numba", {"signals", "accounting"}, marks=pytest.mark.skipif(
+        not kernels.HAVE_NUMBA, reason="numba is not installed")),
+])
+def test_profile_leaves_results_unchanged(backend, stages):
+    prices = synthetic_pair(400, seed=1)
+    plain = backtest(prices, adf="rolling", backend=backend)
+    *profiled, report = backtest(prices, adf="rolling", backend=backend, profile=True)
+    assert len(profiled) == len(plain)
+    assert profiled[0].equals(plain[0])
+    assert tuple(profiled[1:7]) == tuple(plain[1:7])
+    assert profiled[7].to_frame().equals(plain[7].to_frame())
+    assert tuple(profiled[8:]) == tuple(plain[8:])
+    assert set(report.index) == stages
+    assert list(report.columns) == ["Calls", "Total (s)", "Mean (us)", "Share"]
+    assert (report["Calls"] > 0).all()
+    if backend == "python":
+        assert report.loc["hedge_ratio", "Calls"] == report.loc["mtm", "Calls"] == len(prices)
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from classes import TradeLedger
+
+
+def test_closing_one_of_stacked_shorts_keeps_the_others_basis():
+    ledger = TradeLedger()
+    ledger.open(TradeLedger.Y, TradeLedger.SHORT, 10, 100.0, 0)
+    ledger.open(TradeLedger.Y, TradeLedger.SHORT, 10, 120.0, 0)
+    flow, _, profit = ledger.close(0, 105.0, 1)
+    assert flow == profit == -50.0
+    assert ledger.value(0.0, (105.0, 1.0)) == pytest.approx(150.0)
+
+
+def test_value_matches_the_open_book_under_random_trading():
+    rng = np.random.default_rng(0)
+    ledger = TradeLedger()
+    book = []          # [ticker, side, n, entry] per slot, as the ledger keeps them
+    cash = 0.0
+    for t in range(500):
+        prices = tuple(rng.uniform(50, 150, 2))
+        op = rng.integers(4)
+        if op == 0 or not book:
+            ticker, side = int(rng.integers(2)), int(rng.integers(2))
+            n, px = float(rng.integers(1, 20)), prices[ticker]
+            ledger.open(ticker, side, n, px, t)
+            book.append([ticker, side, n, px])
+        elif op == 1:
+            slot = int(rng.integers(len(book)))
+            ticker, side, n, entry = book[slot]
+            m, px = float(rng.integers(1, 20)), prices[ticker]
+            ledger.add(slot, m, px)
+            book[slot] = [ticker, side, n + m, (entry * n + px * m) / (n + m)]
+        else:
+            slot = int(rng.integers(len(book)))
+            ticker, _, n, _ = book[slot]
+            part = float(rng.integers(1, n + 1)) if op == 2 else None
+            flow, _, _ = ledger.close(slot, prices[ticker], t, 0.001, part)
+            cash += flow
+            if part is not None and part < n:
+                book[slot][2] = n - part
+            else:
+                book[slot] = book[-1]
+                book.pop()
+
+        marks = sum(n * prices[tk] if sd == TradeLedger.LONG else (e - prices[tk]) * n
+                    for tk, sd, n, e in book)
+        assert ledger.value(cash, prices) == pytest.approx(cash + marks, rel=1e-9, abs=1e-6)
+        assert ledger.short_exposure(prices) == pytest.approx(
+            sum(n * prices[tk] for tk, sd, n, _ in book if sd == TradeLedger.SHORT),
+            rel=1e-9, abs=1e-6)
@@ -0,0 +1,134 @@
+from itertools import combinations
+from multiprocessing import shared_memory
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+import statsmodels.api as sm
+from statsmodels.tsa.adfvalues import mackinnonp
+from statsmodels.tsa.stattools import adfuller
+from statsmodels.tsa.vector_ar.vecm import coint_johansen
+
+import cointegration
+from cointegration import (RollingADF, engle_granger_batch, johansen_batch,
+                           mackinnon_pvalue, select_pairs)
+
+
+@pytest.mark.parametrize("maxlag,autolag", [(1, "AIC"), (3, "AIC"), (2, None)])
+def test_engle_granger_batch_matches_ols_and_adfuller(universe_prices, maxlag, autolag):
+    batch = engle_granger_batch(universe_prices, maxlag=maxlag, autolag=autolag)
+    assert list(zip(batch['Asset1'], batch['Asset2'])) == \
+        list(combinations(universe_prices.columns, 2))
+
+    for row in batch.itertuples():
+        y = universe_prices[row.Asset1]
+        fit = sm.OLS(y, sm.add_constant(universe_prices[row.Asset2])).fit()
+        stat, pvalue, *_ = adfuller(fit.resid, maxlag=maxlag, regression='c',
+                                    autolag=autolag)
+        assert row.Intercept == pytest.approx(fit.params.iloc[0], rel=1e-9)
+        assert row.Beta == pytest.approx(fit.params.iloc[1], rel=1e-9)
+        assert row.ADF_stat == pytest.approx(stat, rel=1e-9)
+        assert row.ADF_pvalue == pytest.approx(pvalue, rel=1e-9, abs=1e-12)
+
+
+@pytest.mark.parametrize("det_order,k_ar_diff", [(0, 1), (0, 2), (-1, 1), (0, 0)])
+def test_johansen_batch_matches_coint_johansen(universe_prices, det_order, k_ar_diff):
+    pairs = list(combinations(universe_prices.columns, 2))
+    batch = johansen_batch(universe_prices, pairs, det_order, k_ar_diff)
+
+    for k, (a, b) in enumerate(pairs):
+        res = coint_johansen(universe_prices[[a, b]], det_order, k_ar_diff)
+        np.testing.assert_allclose(batch['eigenvalues'][k], res.eig, rtol=1e-9)
+        np.testing.assert_allclose(batch['eigenvectors'][k], res.evec[:, 0], rtol=1e-8)
+        assert batch['trace_stat'][k] == pytest.approx(res.lr1[0], rel=1e-9)
+        np.testing.assert_array_equal(batch['critical_values'], res.cvt[:, 1])
+
+
+def test_select_pairs_batch_agrees_with_exact(universe_prices):
+    exact = select_pairs(universe_prices, 0.5)
+    batch = select_pairs(universe_prices, 0.5, method="batch")
+    assert len(exact)
+    assert set(zip(exact['Asset1'], exact['Asset2'])) == \
+        set(zip(batch['Asset1'], batch['Asset2']))
+
+    both = exact.merge(batch, on=['Asset1', 'Asset2'], suffixes=('', '_batch'))
+    for col in ['Correlation', 'Johansen_stat', 'Eigenvector_1', 'Eigenvector_2']:
+        np.testing.assert_allclose(both[col], both[col + '_batch'], rtol=1e-9)
+    # the batch ADF searches fewer lags than adfuller's default
+    np.testing.assert_allclose(both['ADF_pvalue'], both['ADF_pvalue_batch'], atol=1e-3)
+
+
+def test_select_pairs_batch_uses_complete_rows(universe_prices):
+    prices = universe_prices.copy()
+    prices.iloc[::50, 2] = np.nan
+    batch = select_pairs(prices, 0.5, method="batch")
+    complete = select_pairs(prices.dropna(), 0.5, method="batch")
+    # correlations stay pairwise-complete, as in the exact screen
+    pd.testing.assert_frame_equal(batch.drop(columns='Correlation'),
+                                  complete.drop(columns='Correlation'))
+
+
+@pytest.mark.parametrize("window", [20, 60])
+def test_rolling_adf_matches_adfuller(window):
+    rng = np.random.default_rng(3)
+    x = 50 + 0.3 * np.cumsum(rng.normal(size=600)) + np.sin(np.arange(600) / 5)
+    gate = RollingADF(window, refresh=50)
+    compared = 0
+    for t, v in enumerate(x):
+        stat, pvalue = gate.push(v)
+        if t < window - 1:
+            assert np.isnan(stat) and np.isnan(pvalue)
+            continue
+        ref_stat, ref_p, lag, nobs, *_ = adfuller(x[t - window + 1:t + 1])
+        if nobs - lag - 2 <= 1:
+            continue            # one residual degree of freedom: ill-conditioned
+        assert stat == pytest.approx(ref_stat, rel=1e-7, abs=1e-8)
+        assert pvalue == pytest.approx(ref_p, abs=1e-6)
+        compared += 1
+    # short windows often saturate at the AIC lag; still compare a third
+    assert compared > (len(x) - window) // 3
+
+
+def test_rolling_adf_many_series_matches_adfuller():
+    rng = np.random.default_rng(4)
+    X = np.cumsum(rng.normal(size=(300, 4)), axis=0)
+    gate = RollingADF(40, n_series=4, refresh=25)
+    for t in range(len(X)):
+        stat, pvalue = gate.push(X[t])
+        if t >= 39 and t % 20 == 0:
+            ref = [adfuller(X[t - 39:t + 1, j]) for j in range(4)]
+            np.testing.assert_allclose(stat, [r[0] for r in ref], rtol=1e-8, atol=1e-8)
+            np.testing.assert_allclose(pvalue, [r[1] for r in ref], atol=1e-6)
+
+
+@pytest.mark.parametrize("regression", ["n", "c", "ct", "ctt"])
+def test_mackinnon_pvalue_matches_statsmodels(regression):
+    stats = np.linspace(-20, 3, 461)
+    ref = [mackinnonp(s, regression, 1) for s in stats]
+    np.testing.assert_array_equal(mackinnon_pvalue(stats, regression), ref)
+
+
+def test_parallel_select_pairs_matches_serial(universe_prices):
+    serial = select_pairs(universe_prices, 0.5, n_jobs=1)
+    assert len(serial)
+    assert select_pairs(universe_prices, 0.5, n_jobs=2).equals(serial)
+
+
+def test_shared_prices_are_released_when_a_worker_fails(universe_prices, monkeypatch):
+    created = []
+
+    class Recording(shared_memory.SharedMemory):
+        def __init__(self, name=None, create=False, size=0):
+            super().__init__(name, create, size)
+            if create:
+                created.append(self.name)
+
+    monkeypatch.setattr(cointegration, "shared_memory",
+                        SimpleNamespace(SharedMemory=Recording))
+    # a non-numeric alpha only fails inside the workers' pair tests
+    with pytest.raises(TypeError):
+        select_pairs(universe_prices, 0.5, adf_alpha="0.05", n_jobs=2)
+    assert len(created) == 1
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=created[0])
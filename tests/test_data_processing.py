@@ -0,0 +1,196 @@
+import datetime as dt
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_processing import PriceCache, clean_data, iter_chunks, periods_per_year
+
+
+class MockFetch:
+    """
+    Offline stand-in for the Yahoo download: business-day closes, a log of
+    the requested ranges and optional delays, failures, empty results and
+    None results per ticker.
+    """
+
+    def __init__(self, empty=(), first=None, delay=None, fail=None, none=()):
+        self.calls = []
+        self.empty = set(empty)
+        self.none = set(none)
+        self.first = first
+        self.delay = delay or {}
+        self.fail = dict(fail or {})
+        self.lock = threading.Lock()
+
+    def __call__(self, ticker, start, end):
+        with self.lock:
+            self.calls.append((ticker, start, end))
+            failures = self.fail.get(ticker, 0)
+            if failures:
+                self.fail[ticker] = failures - 1
+        time.sleep(self.delay.get(ticker, 0.0))
+        if failures:
+            raise ConnectionError(f"{ticker} unavailable")
+        if ticker in self.none:
+            return None
+        if ticker in self.empty:
+            return pd.Series(dtype=float, name=ticker)
+        idx = pd.bdate_range(start, end, inclusive="left")
+        if self.first is not None:
+            idx = idx[idx >= pd.Timestamp(self.first)]
+        return pd.Series(idx.dayofyear.to_numpy(dtype=float), index=idx, name=ticker)
+
+
+D0, D1, D2 = dt.date(2020, 1, 1), dt.date(2020, 6, 1), dt.date(2020, 9, 1)
+
+
+def test_cache_reads_disk_and_fetches_only_the_tail(tmp_path):
+    fetch = MockFetch()
+    cache = PriceCache(str(tmp_path), fetch)
+    first = cache.get("AAA", D0, D1)
+    assert len(fetch.calls) == 1
+
+    again = PriceCache(str(tmp_path), fetch).get("AAA", D0, D1)
+    assert len(fetch.calls) == 1
+    pd.testing.assert_series_equal(first, again, check_freq=False, check_names=False)
+
+    longer = cache.get("AAA", D0, D2)
+    assert len(fetch.calls) == 2
+    assert fetch.calls[-1][1] == first.index[-1].date()
+    assert fetch.calls[-1][2] == D2
+    pd.testing.assert_series_equal(longer, fetch("AAA", D0, D2), check_freq=False, check_names=False)
+
+
+def test_empty_fetch_is_not_cached(tmp_path):
+    fetch = MockFetch(empty={"AAA"})
+    cache = PriceCache(str(tmp_path), fetch)
+    assert cache.get("AAA", D0, D1).empty
+    assert cache.get("AAA", D0, D1).empty
+    assert len(fetch.calls) == 2
+
+    fetch.empty.clear()
+    recovered = cache.get("AAA", D0, D1)
+    assert len(fetch.calls) == 3
+    assert len(recovered) == len(pd.bdate_range(D0, D1, inclusive="left"))
+
+
+def test_empty_head_does_not_extend_coverage(tmp_path):
+    fetch = MockFetch(first=D1)
+    cache = PriceCache(str(tmp_path), fetch)
+    cache.get("AAA", D1, D2)
+    cache.get("AAA", D0, D2)
+    cache.get("AAA", D0, D2)
+    # the empty head [D0, D1) is asked for again, never marked as covered
+    assert [c[1:] for c in fetch.calls] == [(D1, D2), (D0, D1), (D0, D1)]
+
+    fetch.first = None
+    data = cache.get("AAA", D0, D2)
+    assert data.index[0] == pd.Timestamp(D0)
+    assert len(data) == len(pd.bdate_range(D0, D2, inclusive="left"))
+
+
+def test_none_fetch_is_treated_as_empty(tmp_path):
+    fetch = MockFetch(none={"AAA"})
+    cache = PriceCache(str(tmp_path), fetch)
+    assert cache.get("AAA", D1, D2).empty
+
+    fetch.none.clear()
+    cached = cache.get("AAA", D1, D2)
+    fetch.none.add("AAA")
+    # neither a None head nor a None tail extends or drops the cached range
+    pd.testing.assert_series_equal(cache.get("AAA", D0, D2), cached, check_names=False,
+                                   check_freq=False)
+    pd.testing.assert_series_equal(cache.get("AAA", D1, dt.date(2020, 12, 1)), cached,
+                                   check_names=False, check_freq=False)
+    assert [c[1:] for c in fetch.calls[2:]] == [(D0, D1), (cached.index[-1].date(),
+                                                          dt.date(2020, 12, 1))]
+
+    fetch.none.clear()
+    assert cache.get("AAA", D0, D2).index[0] == pd.Timestamp(D0)
+
+
+def test_clean_data_fetches_concurrently_in_ticker_order():
+    tickers = ["A", "B", "C", "D", "E", "F"]
+    # later tickers finish first
+    delay = {t: 0.3 - 0.05 * k for k, t in enumerate(tickers)}
+
+    t0 = time.perf_counter()
+    data = clean_data(tickers, "1y", fetch=MockFetch(delay=delay), max_workers=6)
+    elapsed = time.perf_counter() - t0
+
+    assert list(data.columns) == tickers
+    assert elapsed < 0.8 * sum(delay.values())
+    assert data.attrs["skipped"] == {}
+
+
+def test_clean_data_retries_then_succeeds():
+    fetch = MockFetch(fail={"A": 2})
+    data = clean_data(["A", "B"], "1y", fetch=fetch, retries=2, backoff=0.0)
+    assert list(data.columns) == ["A", "B"]
+    assert sum(c[0] == "A" for c in fetch.calls) == 3
+
+
+def test_clean_data_reports_skipped_tickers_with_reason():
+    fetch = MockFetch(empty={"B"}, fail={"C": 10})
+    with pytest.warns(UserWarning, match=r"B \(no data\).*C \(ConnectionError: C unavailable\)"):
+        data = clean_data(["A", "B", "C"], "1y", fetch=fetch, retries=1, backoff=0.0)
+    assert list(data.columns) == ["A"]
+    assert data.attrs["skipped"] == {"B": "no data", "C": "ConnectionError: C unavailable"}
+
+
+def test_clean_data_reports_a_broken_fetcher():
+    def fetch(ticker):
+        return pd.Series(dtype=float)
+
+    with pytest.warns(UserWarning, match="TypeError"):
+        data = clean_data(["A"], "1y", fetch=fetch, retries=0)
+    assert data.empty
+    assert data.attrs["skipped"]["A"].startswith("TypeError")
+
+
+def test_clean_data_with_cache_retries_an_empty_ticker(tmp_path):
+    fetch = MockFetch(empty={"B"})
+    cache = PriceCache(str(tmp_path), fetch)
+    with pytest.warns(UserWarning):
+        first = clean_data(["A", "B"], "1y", cache=cache, retries=1, backoff=0.0)
+    assert list(first.columns) == ["A"]
+    assert sum(c[0] == "B" for c in fetch.calls) == 2
+
+    fetch.empty.clear()
+    data = clean_data(["A", "B"], "1y", cache=cache, backoff=0.0)
+    assert list(data.columns) == ["A", "B"]
+    assert sum(c[0] == "A" for c in fetch.calls) == 1
+
+
+@pytest.mark.parametrize("interval,bars", [
+    ("1m", 252 * 6.5 * 60), ("5m", 252 * 6.5 * 12), ("30m", 252 * 13), ("1h", 252 * 6.5),
+    ("1d", 252), ("1wk", 52), ("1mo", 12), (" 2D ", 126),
+])
+def test_periods_per_year(interval, bars):
+    assert periods_per_year(interval) == pytest.approx(bars)
+
+
+@pytest.mark.parametrize("interval", ["1y", "m", "1min", ""])
+def test_periods_per_year_rejects_unknown_intervals(interval):
+    with pytest.raises(ValueError):
+        periods_per_year(interval)
+
+
+def test_iter_chunks_from_frame_and_csv(tmp_path):
+    idx = pd.date_range("2024-01-02 09:30", periods=250, freq="min")
+    prices = pd.DataFrame({"Y": np.arange(250.0), "X": np.arange(250.0) * 2,
+                           "Z": 1.0}, index=idx)
+    prices.iloc[10, 0] = np.nan
+    expected = prices[["Y", "X"]].dropna()
+
+    path = tmp_path / "bars.csv"
+    prices.to_csv(path)
+    for source in (prices, str(path)):
+        chunks = list(iter_chunks(source, 64, columns=["Y", "X"]))
+        assert all(len(c) <= 64 for c in chunks)
+        assert len(chunks) == 4
+        pd.testing.assert_frame_equal(pd.concat(chunks), expected, check_freq=False,
+                                      check_names=False)
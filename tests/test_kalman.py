@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from kalman import BatchKalmanFilter, KalmanFilter, RollingWindow, compute_zscore
+
+
+def test_rolling_window_matches_compute_zscore():
+    rng = np.random.default_rng(0)
+    values = np.cumsum(rng.normal(size=300)) + 1e4
+    window = RollingWindow(20, refresh=50)
+    for t, v in enumerate(values):
+        window.push(v)
+        expected = compute_zscore(values[:t + 1], 20)
+        got = compute_zscore(window, 20)
+        if expected is None:
+            assert got is None
+        else:
+            assert got == pytest.approx(expected, rel=1e-8, abs=1e-10)
+            assert window.mean() == pytest.approx(np.mean(values[t - 19:t + 1]), rel=1e-12)
+            assert window.std() == pytest.approx(np.std(values[t - 19:t + 1]), rel=1e-8)
+
+
+def test_compute_zscore_rejects_a_window_of_another_size():
+    window = RollingWindow(20)
+    for v in range(30):
+        window.push(v)
+    with pytest.raises(ValueError, match="RollingWindow size"):
+        compute_zscore(window, 10)
+
+
+def _matmul_step(w, P, x, y, F, Q, R, joseph):
+    """Textbook predict + update with full matrix products."""
+    w, P = F @ w, F @ P @ F.T + Q
+    H = np.asarray(x, dtype=float).reshape(1, -1)
+    K = P @ H.T @ np.linalg.inv(H @ P @ H.T + R)
+    w = w + K.flatten() * (y - H @ w).item()
+    A = np.eye(len(w)) - K @ H
+    P = A @ P @ A.T + R * (K @ K.T) if joseph else A @ P
+    return w, P
+
+
+@pytest.mark.parametrize("joseph", [False, True])
+@pytest.mark.parametrize("n, identity_F", [(1, True), (2, True), (2, False), (3, True)])
+def test_kalman_closed_form_matches_matmul(n, identity_F, joseph):
+    rng = np.random.default_rng(n)
+    F = np.eye(n) if identity_F else np.eye(n) + 0.05 * rng.normal(size=(n, n))
+    B = rng.normal(size=(n, n))
+    Q = 1e-3 * (B @ B.T + np.eye(n))
+    kwargs = dict(R=0.7, F=None if identity_F else F, Q=Q,
+                  P0=0.1 * np.eye(n), w0=rng.normal(size=n), joseph=joseph)
+    stepped, updated = KalmanFilter(n, **kwargs), KalmanFilter(n, **kwargs)
+    w, P = stepped.w_t.copy(), stepped.P_t.copy()
+    for _ in range(200):
+        x = rng.normal(size=n) + 1.0
+        y = float(x @ np.arange(1, n + 1) + rng.normal())
+        w, P = _matmul_step(w, P, x, y, F, Q, 0.7, joseph)
+        stepped.step(x.tolist(), y)
+        updated.update(x, y, *updated.predict())
+        for kf in (stepped, updated):
+            np.testing.assert_allclose(kf.w_t, w, rtol=1e-10, atol=1e-12)
+            np.testing.assert_allclose(kf.P_t, P, rtol=1e-10, atol=1e-14)
+
+
+@pytest.mark.parametrize("joseph", [False, True])
+@pytest.mark.parametrize("per_pair", [False, True])
+@pytest.mark.parametrize("identity_F", [True, False])
+def test_batch_kalman_matches_one_filter_per_pair(identity_F, per_pair, joseph):
+    rng = np.random.default_rng(11)
+    n_pairs, n = 5, 2
+    shape = (n_pairs, n, n) if per_pair else (n, n)
+    F = None if identity_F else np.eye(n) + 0.05 * rng.normal(size=shape)
+    B = rng.normal(size=shape)
+    Q = 1e-3 * (B @ np.swapaxes(B, -1, -2) + np.eye(n))
+    R = rng.uniform(0.5, 2.0, n_pairs) if per_pair else 0.8
+    w0 = rng.normal(size=(n_pairs, n))
+
+    batch = BatchKalmanFilter(n_pairs, n, R=R, F=F, Q=Q, w0=w0, joseph=joseph)
+    pick = (lambda a, p: a[p]) if per_pair else (lambda a, p: a)
+    single = [KalmanFilter(n, R=pick(R, p), F=None if F is None else pick(F, p),
+                           Q=pick(Q, p), w0=w0[p], joseph=joseph)
+              for p in range(n_pairs)]
+    for _ in range(150):
+        X = np.column_stack([np.ones(n_pairs), rng.normal(100, 5, n_pairs)])
+        y = 2.0 + 0.5 * X[:, 1] + rng.normal(size=n_pairs)
+        batch.step(X, y)
+        for p, kf in enumerate(single):
+            kf.step(X[p].tolist(), y[p])
+            np.testing.assert_allclose(batch.w_t[p], kf.w_t, rtol=1e-9, atol=1e-12)
+            np.testing.assert_allclose(batch.P_t[p], kf.P_t, rtol=1e-9, atol=1e-15)
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from metrics import METRIC_NAMES, Metrics, RunningMetrics, metrics_batch
+
+
+def _reference(values, periods_per_year=252):
+    s = pd.Series(values, dtype=float)
+    return {
+        "Sharpe Ratio": Metrics.sharpe(s, periods_per_year),
+        "Sortino Ratio": Metrics.sortino(s, periods_per_year),
+        "Maximum Drawdown": Metrics.max_drawdown(s),
+        "Calmar Ratio": Metrics.calmar(s, periods_per_year),
+        "Win Rate": Metrics.win_rate(s),
+    }
+
+
+def _assert_matches(running, values):
+    ref = _reference(values, running.periods_per_year)
+    got = running.to_dict()
+    for name in METRIC_NAMES:
+        assert got[name] == pytest.approx(ref[name], rel=1e-9, abs=1e-12, nan_ok=True), name
+
+
+@pytest.fixture(scope="module")
+def equity():
+    rng = np.random.default_rng(7)
+    r = rng.normal(0.0005, 0.01, 300)
+    r[:3] = [0.01, -0.005, 0.02]        # one losing return: Sortino is NaN
+    r[3:6] = np.abs(r[3:6])
+    r[120:150] = 0.0                    # flat stretch, longer than the window
+    return 1e6 * np.cumprod(1 + np.concatenate(([0.0], r)))
+
+
+def test_update_matches_metrics_on_every_prefix(equity):
+    running = RunningMetrics()
+    for t, value in enumerate(equity):
+        running.update(value)
+        _assert_matches(running, equity[:t + 1])
+    assert np.isnan(_reference(equity[:5])["Sortino Ratio"])
+
+
+@pytest.mark.parametrize("window", [1, 15])
+def test_update_matches_metrics_on_every_trailing_window(equity, window):
+    running = RunningMetrics(window=window)
+    for t, value in enumerate(equity):
+        running.update(value)
+        _assert_matches(running, equity[max(0, t - window):t + 1])
+
+
+@pytest.mark.parametrize("window", [None, 15])
+def test_extend_matches_metrics_after_each_chunk(equity, window):
+    running = RunningMetrics(window=window)
+    bounds = [0, 1, 4, 37, 38, 150, len(equity)]
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        running.extend(np.concatenate((equity[lo:hi], [np.nan])))
+        start = 0 if window is None else max(0, hi - 1 - window)
+        _assert_matches(running, equity[start:hi])
+    assert running.count == len(equity)
+
+
+def test_metrics_batch_matches_metrics_per_curve(equity):
+    rng = np.random.default_rng(8)
+    curves = {
+        "full": equity,
+        "short": equity[:40],                   # NaN-padded below
+        "late": equity[200:],                   # NaN-padded above
+        "flat": np.full(25, 1e6),
+        "one": equity[:1],
+        "other": 1e6 * np.cumprod(1 + rng.normal(0, 0.02, len(equity))),
+    }
+    frame = pd.DataFrame({name: pd.Series(v) for name, v in curves.items()})
+    frame["late"] = frame["late"].shift(len(equity) - len(curves["late"]))
+    ppy = np.array([252, 252, 98_280, 52, 12, 1638], dtype=float)
+
+    for periods_per_year in (None, 1638, ppy):
+        batch = metrics_batch(frame, periods_per_year)
+        assert list(batch.index) == list(curves)
+        assert list(batch.columns) == list(METRIC_NAMES)
+        for k, (name, values) in enumerate(curves.items()):
+            if periods_per_year is None:
+                p = 252
+            else:
+                p = np.broadcast_to(periods_per_year, ppy.shape)[k]
+            ref = _reference(values, p)
+            for metric in METRIC_NAMES:
+                assert batch.loc[name, metric] == pytest.approx(
+                    ref[metric], rel=1e-9, abs=1e-12, nan_ok=True), (name, metric)
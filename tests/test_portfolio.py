@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from benchmarks import synthetic_pair
+from classes import config
+from backtesting import backtest
+from portfolio import backtest_portfolio
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("stop_z", [1.5, 3.5])
+def test_single_pair_matches_backtest(seed, stop_z):
+    # a small STOP_Z makes stops fire often, with no re-entry on the stop bar
+    prices = synthetic_pair(1000, seed=seed)
+    cfg = config(GROSS_CAP=np.inf, STOP_Z=stop_z)
+    equity, attribution, _, trades = backtest_portfolio(prices, [('Y', 'X')], cfg=cfg)
+    ref = backtest(prices, adf="rolling", cfg=cfg)
+
+    np.testing.assert_allclose(equity.to_numpy(), ref[0].to_numpy(), rtol=0, atol=1e-6)
+    assert 2 * attribution['Trades'].iloc[0] == ref[6]
+    assert len(trades) == ref[4] // 2
+    assert attribution['Commission Cost'].iloc[0] == pytest.approx(ref[9])
+    assert attribution['Borrow Cost'].iloc[0] == pytest.approx(ref[8])
+
+
+def test_pnl_attribution_sums_to_equity(universe_prices):
+    pairs = [('A0', 'A3'), ('A1', 'A4'), ('A2', 'A5')]
+    equity, _, pnl, _ = backtest_portfolio(universe_prices, pairs, initial_cash=1e6)
+    np.testing.assert_allclose(pnl.sum(axis=1) + 1e6, equity, rtol=0, atol=1e-6)
@@ -0,0 +1,59 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cointegration import select_pairs
+from price_store import PriceStore
+
+
+def test_write_reopen_and_append(tmp_path, universe_prices):
+    path = str(tmp_path / "store")
+    head, tail = universe_prices.iloc[:, :5], universe_prices.iloc[:, 5:]
+    PriceStore.write(path, head)
+
+    store = PriceStore(path)
+    assert store.shape == head.shape
+    pd.testing.assert_frame_equal(store.frame(), head, check_freq=False)
+    np.testing.assert_array_equal(store.column(head.columns[2]), head.iloc[:, 2])
+
+    # half of the new columns as a DataFrame, the rest one array at a time
+    store.append(tail.iloc[:, :1])
+    store.append((name, tail[name].to_numpy()) for name in tail.columns[1:])
+    pd.testing.assert_frame_equal(store.frame(), universe_prices, check_freq=False)
+    pd.testing.assert_frame_equal(PriceStore(path).frame(), universe_prices,
+                                  check_freq=False)
+    pd.testing.assert_frame_equal(pickle.loads(pickle.dumps(store)).frame(),
+                                  universe_prices, check_freq=False)
+
+    with pytest.raises(ValueError, match="already in the store"):
+        store.append([(head.columns[0], head.iloc[:, 0].to_numpy())])
+    with pytest.raises(ValueError, match="index length"):
+        store.append([("short", np.ones(3))])
+    with pytest.raises(ValueError, match="store's index"):
+        store.append(universe_prices.iloc[1:, :1].rename(columns=lambda c: "new"))
+    pd.testing.assert_frame_equal(PriceStore(path).frame(), universe_prices,
+                                  check_freq=False)
+
+
+def test_write_from_columns(tmp_path, universe_prices):
+    path = str(tmp_path / "store")
+    columns = ((name, universe_prices[name].to_numpy()) for name in universe_prices)
+    with pytest.raises(ValueError, match="index is required"):
+        PriceStore.write(path, columns)
+    store = PriceStore.write(path, columns, index=universe_prices.index)
+    pd.testing.assert_frame_equal(store.frame(), universe_prices, check_freq=False)
+
+
+@pytest.mark.parametrize("method, n_jobs", [("exact", 1), ("exact", 2), ("batch", 1)])
+def test_select_pairs_on_a_store_matches_the_frame(tmp_path, universe_prices, method, n_jobs):
+    prices = universe_prices.copy()
+    prices.iloc[::40, 3] = np.nan
+    store = PriceStore.write(str(tmp_path / "store"), prices)
+    expected = select_pairs(prices, 0.5, method=method)
+    got = select_pairs(store, 0.5, method=method, n_jobs=n_jobs)
+    assert len(expected)
+    pd.testing.assert_frame_equal(got.drop(columns="Correlation"),
+                                  expected.drop(columns="Correlation"))
+    np.testing.assert_allclose(got["Correlation"], expected["Correlation"], rtol=1e-12)
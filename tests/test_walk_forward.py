@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from benchmarks import synthetic_pair
+from backtesting import backtest
+from walk_forward import walk_forward
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_carry_matches_one_backtest_over_the_test_windows(seed):
+    prices = synthetic_pair(1500, seed=seed)
+    summary, equity = walk_forward(prices, 500, 250, carry=True, corr_threshold=0.3)
+    assert set(zip(summary['Asset1'], summary['Asset2'])) == {('Y', 'X')}
+
+    ref = backtest(prices.iloc[500:], adf="rolling")
+    np.testing.assert_allclose(equity.to_numpy(), ref[0].to_numpy(), rtol=0, atol=1e-6)
+    assert summary['Trades'].sum() == ref[6]
+
+
+def test_carry_closes_positions_when_the_pair_changes(universe_prices):
+    summary, _ = walk_forward(universe_prices, 500, 250, carry=True, corr_threshold=0.3)
+    pair = summary['Asset1'] + '/' + summary['Asset2']
+    changed = np.flatnonzero(pair.to_numpy()[1:] != pair.to_numpy()[:-1]) + 1
+    assert len(changed)
+    # a new pair warms up flat, so its first value is the cash left after
+    # closing the old pair (with commission) on the previous fold's last bar
+    for k in changed:
+        assert summary['Start Value'].iloc[k] == summary['Final Value'].iloc[k - 1]
+        assert summary['Trades'].iloc[k - 1] % 2 == 0
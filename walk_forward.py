@@ -0,0 +1,182 @@
+from libraries import *
+from concurrent.futures import ProcessPoolExecutor
+from classes import config, TradeLedger
+from cointegration import select_pairs
+from data_processing import walk_forward_splits
+from signals import PairSignalEngine, signal_paths
+from backtesting import backtest, backtest_signals
+from metrics import metrics
+
+
+def _select_top_pair(train: pd.DataFrame, corr_threshold: float, adf_alpha: float):
+    """
+    Best-ranked pair of a training window, or None if nothing qualifies.
+    """
+    pairs = select_pairs(train, corr_threshold=corr_threshold, adf_alpha=adf_alpha)
+    if pairs.empty:
+        return None
+    return pairs.loc[0, 'Asset1'], pairs.loc[0, 'Asset2']
+
+
+def _run_fold(test: pd.DataFrame, pair, initial_cash, adf: str, cfg, engine=None):
+    """
+    Backtest one out-of-sample window on its selected pair.
+    """
+    if pair is None:
+        cash = cfg.capital if initial_cash is None else initial_cash
+        return pd.Series(cash, index=test.index, dtype=float), 0
+    result = backtest(test[list(pair)].dropna(), initial_cash, adf, cfg, engine)
+    return result[0], result[6]
+
+
+def _carry_fold(test: pd.DataFrame, pair, cash: float, adf: str, cfg,
+                engine: PairSignalEngine, ledger: TradeLedger):
+    """
+    Backtest one out-of-sample window continuing the cash, signal engine
+    and ledger (with its open positions) of the previous fold on the same
+    pair. Ledger bar numbers count from the pair's first traded bar.
+
+    Returns
+    -------
+    tuple
+        (equity, closed positions in this fold, final cash, last prices)
+    """
+    data = test[list(pair)].dropna()
+    if data.empty:
+        return pd.Series(dtype=float), 0, cash, None
+    Y = np.ascontiguousarray(data.iloc[:, 0].to_numpy(dtype=np.float64))
+    X = np.ascontiguousarray(data.iloc[:, 1].to_numpy(dtype=np.float64))
+
+    offset = 0 if ledger.dates is None else len(ledger.dates)
+    ledger.dates = data.index if ledger.dates is None else ledger.dates.append(data.index)
+    n_closed = len(ledger)
+
+    beta, z, allow = signal_paths(Y, X, adf, cfg, engine)
+    equity, cash, *_ = backtest_signals(Y, X, data.index, beta, z, allow, cash, cfg,
+                                        ledger=ledger, offset=offset)
+    return equity, len(ledger) - n_closed, cash, (Y[-1], X[-1])
+
+
+def _liquidate(ledger: TradeLedger, cash: float, prices, cfg) -> tuple:
+    """
+    Close the ledger's open positions at ``prices`` on its last bar, paying
+    commission, when the carried pair is dropped at a fold boundary.
+
+    Returns
+    -------
+    tuple
+        (cash after closing, number of positions closed)
+    """
+    k = ledger.n_open
+    flows, _ = ledger.close_all(prices, len(ledger.dates) - 1, cfg.COM)
+    return cash + float(flows.sum()), k
+
+
+def walk_forward(prices: pd.DataFrame, train_size: int, test_size: int,
+                 anchored: bool = False, step: int = None,
+                 corr_threshold: float = 0.7, adf_alpha: float = 0.05,
+                 n_jobs: int = 1, carry: bool = False, adf: str = "rolling",
+                 cfg=config):
+    """
+    Walk-forward evaluation: re-select the pair on each training window with
+    ``select_pairs`` and backtest it on the following out-of-sample window.
+
+    Pair selection always runs in parallel across folds. Backtests run in
+    parallel too unless ``carry`` is set, in which case folds run in order
+    from the previous fold's cash. While the selected pair stays the same,
+    the Kalman filters, spread window and open positions continue, so
+    consecutive folds trade exactly like one backtest over their windows.
+    When the pair changes, its open positions are closed at the last bar of
+    the fold, with commission, and the new pair starts a fresh engine.
+
+    Parameters
+    ----------
+    prices : pd.DataFrame
+        Aligned price matrix of the universe.
+    train_size, test_size : int
+        Bars in each training and test window.
+    anchored : bool
+        Expanding (anchored) instead of rolling training windows.
+    step : int, optional
+        Bars between folds, defaults to ``test_size``.
+    corr_threshold, adf_alpha : float
+        Pair selection thresholds, see ``select_pairs``.
+    n_jobs : int
+        Worker processes (-1 uses every core).
+    carry : bool
+        Carry cash, Kalman state and open positions across fold boundaries.
+    adf : str
+        Stationarity gate engine, see ``backtest``.
+    cfg : config
+        Strategy parameters.
+
+    Returns
+    -------
+    tuple
+        (summary : pd.DataFrame with one row per fold,
+         equity : pd.Series chaining the out-of-sample equity curves)
+    """
+    folds = walk_forward_splits(prices, train_size, test_size, anchored, step)
+    if not folds:
+        return pd.DataFrame(), pd.Series(dtype=float)
+
+    n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+    trains = [train for train, _ in folds]
+    tests = [test for _, test in folds]
+
+    if n_jobs <= 1 or len(folds) < 2:
+        pairs = [_select_top_pair(t, corr_threshold, adf_alpha) for t in trains]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            pairs = list(pool.map(_select_top_pair, trains,
+                                  [corr_threshold] * len(folds),
+                                  [adf_alpha] * len(folds)))
+
+    if carry:
+        results = []
+        cash = cfg.capital
+        engine = ledger = prev = last = None
+        for test, pair in zip(tests, pairs):
+            if pair is None or pair != prev:
+                if ledger is not None and ledger.n_open:
+                    cash, k = _liquidate(ledger, cash, last, cfg)
+                    equity, trades = results[-1]
+                    if len(equity):
+                        equity.iloc[-1] = cash
+                    results[-1] = (equity, trades + k)
+                engine = PairSignalEngine(cfg.TDays, adf, cfg) if pair else None
+                ledger = TradeLedger() if pair else None
+            if pair is None:
+                equity, trades = _run_fold(test, None, cash, adf, cfg)
+            else:
+                equity, trades, cash, bar = _carry_fold(test, pair, cash, adf, cfg,
+                                                        engine, ledger)
+                last = bar if bar is not None else last
+            results.append((equity, trades))
+            prev = pair
+    elif n_jobs <= 1 or len(folds) < 2:
+        results = [_run_fold(test, pair, None, adf, cfg)
+                   for test, pair in zip(tests, pairs)]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            results = list(pool.map(_run_fold, tests, pairs,
+                                    [None] * len(folds), [adf] * len(folds),
+                                    [cfg] * len(folds)))
+
+    rows = []
+    for k, ((train, test), pair, (equity, trades)) in enumerate(zip(folds, pairs, results)):
+        rows.append({
+            'Fold': k,
+            'Train start': train.index[0],
+            'Train end': train.index[-1],
+            'Test start': test.index[0],
+            'Test end': test.index[-1],
+            'Asset1': pair[0] if pair else None,
+            'Asset2': pair[1] if pair else None,
+            **metrics(equity, cfg.periods_per_year),
+            'Start Value': float(equity.iloc[0]) if len(equity) else np.nan,
+            'Final Value': float(equity.iloc[-1]) if len(equity) else np.nan,
+            'Trades': trades,
+        })
+
+    return pd.DataFrame(rows), pd.concat([equity for equity, _ in results])